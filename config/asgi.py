@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving the site through this application (e.g. with uvicorn) enables the
+live update stream at /api/events/ used by the approvals and bills pages.
+Under WSGI that endpoint answers 204 and the pages work without live updates.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.roles.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,6 +67,8 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.context_processors.approval_counts",
+                "core.context_processors.roles",
             ],
         },
     },
@@ -130,6 +134,57 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Allow iframe embedding for PDF preview
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# How uploaded transaction CSVs are imported: 'thread' runs the import in a
+# background thread of the web process, 'worker' leaves it queued for
+# `python manage.py process_transaction_imports`. Either way, an import whose
+# process exits mid-run is marked failed once it stops reporting progress
+TRANSACTION_IMPORT_MODE = 'thread'
+
+# Bill/transaction match suggestions scoring at or above this (0-1) are
+# accepted automatically when auto-matching is run with auto-accept
+MATCH_AUTO_ACCEPT_THRESHOLD = 0.9
+
+# Also auto-accept matches for newly imported transactions; when False the
+# import only creates suggestions for review on the bills page
+MATCH_AUTO_ACCEPT_ON_IMPORT = False
+
+# QuickBooks accounts used for the bills export (IIF format)
+QUICKBOOKS_AP_ACCOUNT = 'Accounts Payable'
+QUICKBOOKS_EXPENSE_ACCOUNT = 'Job Materials'
+
+# How often (seconds) live update streams on the approvals and bills pages
+# check for new changes; streams are only served through config/asgi.py
+LIVE_UPDATE_POLL_SECONDS = 2
+
+# Cache for page payloads, lookups and user roles (see core/caching.py).
+# 'locmem' keeps a separate cache in each process, which is only right for a
+# single worker; 'file' shares one cache between the workers of a server
+# through CACHE_DIR; 'redis' shares it between servers (needs the redis
+# package and CACHE_URL). Set with the CACHE_BACKEND environment variable.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smartrenamer',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'smartrenamer',
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -47,6 +47,12 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 FILE_UPLOAD_PERMISSIONS = 0o644
 
+# Gunicorn runs several workers, which must share one cache
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -3,6 +3,7 @@ Simple production settings for SmartRenamerCloud
 Copy this to settings.py and make minimal changes for production
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,6 +35,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.roles.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -50,6 +52,8 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.context_processors.approval_counts",
+                "core.context_processors.roles",
             ],
         },
     },
@@ -102,9 +106,52 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Allow iframe embedding for PDF preview
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# Import uploaded transaction CSVs in a background thread of the web process
+TRANSACTION_IMPORT_MODE = 'thread'
+
+# Minimum match score for automatically accepting bill/transaction matches
+MATCH_AUTO_ACCEPT_THRESHOLD = 0.9
+MATCH_AUTO_ACCEPT_ON_IMPORT = False
+
+# QuickBooks accounts used for the bills export (IIF format)
+QUICKBOOKS_AP_ACCOUNT = 'Accounts Payable'
+QUICKBOOKS_EXPENSE_ACCOUNT = 'Job Materials'
+
+# Poll interval (seconds) for the live update streams
+LIVE_UPDATE_POLL_SECONDS = 2
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Cache for page payloads, lookups and user roles (see core/caching.py).
+# 'locmem' keeps a separate cache in each process, which is only right for a
+# single worker; 'file' shares one cache between the workers of a server
+# through CACHE_DIR; 'redis' shares it between servers (needs the redis
+# package and CACHE_URL). Set with the CACHE_BACKEND environment variable.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smartrenamer',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'smartrenamer',
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
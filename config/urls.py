@@ -67,6 +67,7 @@ urlpatterns = [
     path("vendors/update/<int:vendor_id>/", views.update_vendor, name="update_vendor"),
     path("vendors/delete/<int:vendor_id>/", views.delete_vendor, name="delete_vendor"),
     path("api/vendors/update-classes/", views.update_vendor_classes, name="update_vendor_classes"),
+    path("api/vendors/bulk-assign-classes/", views.bulk_assign_vendor_classes, name="bulk_assign_vendor_classes"),
     
     # Autocomplete APIs
     path("api/autocomplete/projects/", views.autocomplete_projects, name="autocomplete_projects"),
@@ -80,13 +81,23 @@ urlpatterns = [
     path("api/transactions/clear-all/", views.clear_all_transactions, name="clear_all_transactions"),
     path("api/transactions/clear-matches/", views.clear_all_matches, name="clear_all_matches"),
     path("api/transactions/upload-csv/", views.upload_csv_transactions, name="upload_csv_transactions"),
+    path("api/transactions/imports/", views.import_batches_list, name="import_batches_list"),
+    path("api/transactions/imports/<int:batch_id>/progress/", views.import_batch_progress, name="import_batch_progress"),
+    path("api/transactions/imports/<int:batch_id>/rollback/", views.rollback_import_batch, name="rollback_import_batch"),
     
     # Bills
     path("bills/", views.bills_list, name="bills_list"),
+    path("api/bills/", views.bills_api, name="bills_api"),
+    path("api/bills/export/", views.export_bills, name="export_bills"),
     path("api/bills/matching-transactions/", views.get_matching_transactions, name="get_matching_transactions"),
     path("api/bills/create/", views.create_bill, name="create_bill"),
+    path("api/bills/bulk-create/", views.bulk_create_bills, name="bulk_create_bills"),
     path("api/bills/unmatch/", views.unmatch_transaction, name="unmatch_transaction"),
     path("api/bills/send-back-for-review/", views.send_back_for_review, name="send_back_for_review"),
+    path("api/bills/auto-match/", views.run_bill_matching, name="run_bill_matching"),
+    path("api/bills/match-suggestions/", views.match_suggestions_list, name="match_suggestions_list"),
+    path("api/bills/match-suggestions/accept/", views.accept_match_suggestion, name="accept_match_suggestion"),
+    path("api/bills/match-suggestions/reject/", views.reject_match_suggestion, name="reject_match_suggestion"),
     
     # Users (Admin only)
     path("users/", views.users_list, name="users_list"),
@@ -104,13 +115,18 @@ urlpatterns = [
     path("api/classes/create/", views.create_class, name="create_class"),
     path("api/classes/update/", views.update_class, name="update_class"),
     path("api/classes/delete/", views.delete_class, name="delete_class"),
+    path("api/classes/rollup/", views.class_spend_rollup, name="class_spend_rollup"),
     
     # Settings (Admin only)
     path("settings/", views.settings_list, name="settings_list"),
+    path("api/cache/stats/", views.cache_stats, name="cache_stats"),
+    path("api/cache/stats/reset/", views.reset_cache_stats, name="reset_cache_stats"),
     
     # Approvals
     path("approvals/", views.approvals_list, name="approvals_list"),
     path("api/approvals/update/", views.update_file_approval, name="update_file_approval"),
+    path("api/events/", views.live_updates, name="live_updates"),
+    path("api/approvals/bulk-update/", views.bulk_update_file_approval, name="bulk_update_file_approval"),
 
     path("healthz", healthz),
 ]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import File, Project, Vendor, Transaction
+from .models import File, Project, Vendor, Transaction, ImportBatch, MatchSuggestion, BillPayment
 
 @admin.register(File)
 class FileAdmin(admin.ModelAdmin):
@@ -33,3 +33,26 @@ class TransactionAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     ordering = ['-date', '-created_at']
     date_hierarchy = 'date'
+
+@admin.register(ImportBatch)
+class ImportBatchAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'status', 'total_rows', 'inserted_count', 'skipped_count', 'error_count', 'uploaded_by', 'started_at']
+    list_filter = ['status', 'started_at']
+    search_fields = ['file_name', 'file_hash']
+    readonly_fields = ['file_hash', 'started_at', 'finished_at', 'rolled_back_at']
+    ordering = ['-started_at']
+
+@admin.register(MatchSuggestion)
+class MatchSuggestionAdmin(admin.ModelAdmin):
+    list_display = ['file', 'transaction', 'score', 'status', 'group_key', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['file__name', 'file__vendor', 'transaction__description']
+    readonly_fields = ['score', 'details', 'created_at', 'updated_at']
+    ordering = ['-score']
+
+@admin.register(BillPayment)
+class BillPaymentAdmin(admin.ModelAdmin):
+    list_display = ['file', 'transaction', 'amount', 'created_at']
+    search_fields = ['file__name', 'file__vendor', 'transaction__description']
+    readonly_fields = ['created_at']
+    ordering = ['-created_at']
@@ -0,0 +1,118 @@
+"""QuickBooks bill export.
+
+Approved bills that have not been exported yet are claimed with a single
+UPDATE that stamps them with an export batch, then streamed out as an IIF or
+CSV bill import file. Project addresses for bill numbers are joined in
+through File.project_ref.
+"""
+import csv
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import File, BillSummary, Class
+
+# Directional words dropped from project addresses in bill numbers
+DIRECTIONAL_WORDS = {
+    'N', 'S', 'E', 'W', 'NE', 'NW', 'SE', 'SW',
+    'NORTH', 'SOUTH', 'EAST', 'WEST', 'NORTHEAST', 'NORTHWEST', 'SOUTHEAST', 'SOUTHWEST',
+}
+
+CSV_COLUMNS = ['Bill No', 'Vendor', 'Bill Date', 'Amount', 'Class', 'Project', 'Invoice Number', 'Memo']
+
+
+def clean_address(address):
+    """Drop directional indicators (N, SE, North, ...) and extra spaces from an address"""
+    return ' '.join(word for word in address.split() if word.upper() not in DIRECTIONAL_WORDS)
+
+
+def generate_bill_number(file_obj):
+    """Generate bill number from the invoice number and the address of the file's project.
+
+    Uses the resolved project_ref, so load files with
+    select_related('project_ref') when numbering many bills.
+    """
+    # Fall back to the project name if the project is not found
+    address = file_obj.project_ref.address if file_obj.project_ref else file_obj.project
+    
+    # Create bill number: invoice_number - address
+    return f"{file_obj.invoice_number} - {clean_address(address)}"
+
+
+def exportable_bills():
+    """Approved bills with a valid amount that have not been exported yet"""
+    return BillSummary.source_files().filter(exported_at__isnull=True, amount__isnull=False)
+
+
+def claim_export_batch():
+    """Stamp every exportable bill with a new export batch in one UPDATE and return the batch key and count"""
+    export_batch = uuid.uuid4().hex
+    count = exportable_bills().update(export_batch=export_batch, exported_at=timezone.now())
+    return export_batch, count
+
+
+def batch_bills(export_batch):
+    return File.objects.filter(export_batch=export_batch).select_related('project_ref').order_by('invoice_date', 'id')
+
+
+def class_paths():
+    """QuickBooks class name for each class id, with sub-classes written as Parent:Child:Grandchild"""
+    tree = Class.cached_tree()
+    names = {node['id']: node['name'] for node in tree}
+    return {node['id']: ':'.join(names[class_id] for class_id in Class.path_ids(node['path'])) for node in tree}
+
+
+def bill_rows(export_batch):
+    """Yield one dict per bill in the export batch, reading the bills in chunks"""
+    paths = class_paths()
+    for file_obj in batch_bills(export_batch).iterator(chunk_size=500):
+        bill_date = file_obj.invoice_date or file_obj.approved_at or file_obj.uploaded_at
+        yield {
+            'bill_number': generate_bill_number(file_obj),
+            'vendor': file_obj.vendor,
+            'date': bill_date.strftime('%m/%d/%Y'),
+            'amount': file_obj.amount,
+            'class': paths.get(file_obj.selected_class_id, ''),
+            'project': file_obj.project,
+            'invoice_number': file_obj.invoice_number,
+            'memo': f"{file_obj.project} - Invoice {file_obj.invoice_number}",
+        }
+
+
+class Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(export_batch):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in bill_rows(export_batch):
+        yield writer.writerow([
+            row['bill_number'], row['vendor'], row['date'], f"{row['amount']:.2f}",
+            row['class'], row['project'], row['invoice_number'], row['memo']
+        ])
+
+
+def _iif_field(value):
+    # IIF is tab separated, so tabs and line breaks inside values would break the row
+    return ' '.join(str(value).split())
+
+
+def iter_iif(export_batch):
+    """Yield an IIF bill import: each bill is a TRNS line on Accounts Payable and one expense SPL line"""
+    ap_account = getattr(settings, 'QUICKBOOKS_AP_ACCOUNT', 'Accounts Payable')
+    expense_account = getattr(settings, 'QUICKBOOKS_EXPENSE_ACCOUNT', 'Job Materials')
+    
+    yield '!TRNS\tTRNSTYPE\tDATE\tACCNT\tNAME\tCLASS\tAMOUNT\tDOCNUM\tMEMO\r\n'
+    yield '!SPL\tTRNSTYPE\tDATE\tACCNT\tNAME\tCLASS\tAMOUNT\tDOCNUM\tMEMO\r\n'
+    yield '!ENDTRNS\r\n'
+    for row in bill_rows(export_batch):
+        fields = [_iif_field(row[key]) for key in ('date', 'vendor', 'class', 'bill_number', 'memo')]
+        date, vendor, class_name, bill_number, memo = fields
+        yield f"TRNS\tBILL\t{date}\t{ap_account}\t{vendor}\t{class_name}\t{-row['amount']:.2f}\t{bill_number}\t{memo}\r\n"
+        yield f"SPL\tBILL\t{date}\t{expense_account}\t{vendor}\t{class_name}\t{row['amount']:.2f}\t{bill_number}\t{memo}\r\n"
+        yield 'ENDTRNS\r\n'
@@ -0,0 +1,127 @@
+"""Bulk inserts and updates for the JSON importers.
+
+An importer describes each incoming record as a dict of field values, keyed
+by the record's natural key (a name, a username, a user id). upsert() loads
+the existing rows for those keys in one query per batch, compares a content
+hash of the imported fields so unchanged rows are skipped, and writes the
+rest with bulk_create and bulk_update. With dry_run it computes the same
+diff and returns it without writing anything.
+
+bulk_create and bulk_update do not call save() or send post_save, so callers
+are responsible for whatever those would have done (cache invalidation,
+class paths).
+"""
+import hashlib
+import json
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+# Keys looked up, rows inserted and rows updated per query
+UPSERT_BATCH_SIZE = 500
+
+# objects maps every incoming key to its saved (or, in a dry run, unsaved) instance.
+# changes lists (action, key, {field: (old, new)}) for each created or updated record.
+UpsertResult = namedtuple('UpsertResult', ['created', 'updated', 'unchanged', 'changes', 'objects'])
+
+
+def normalize_value(field, value):
+    """Convert an imported or stored value to the form it is compared and hashed in"""
+    value = field.to_python(value)
+    if isinstance(value, Decimal) and field.get_internal_type() == 'DecimalField':
+        value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+    return value
+
+
+def content_hash(values):
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def upsert(model, key_field, records, defaults=None, dry_run=False, batch_size=UPSERT_BATCH_SIZE):
+    """Insert or update one row per record and return an UpsertResult.
+
+    records maps each natural key to a dict of field values; a record only
+    changes the fields it contains. defaults are applied to new rows only,
+    and may be a callable taking the key. Foreign keys are given by attname
+    (e.g. parent_id).
+    """
+    opts = model._meta
+    keys = list(records)
+    existing = {}
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        for obj in model.objects.filter(**{f'{key_field}__in': batch}):
+            existing[getattr(obj, key_field)] = obj
+
+    to_create = []
+    to_update = []
+    update_fields = set()
+    changes = []
+    objects = {}
+    unchanged_count = 0
+
+    for key, values in records.items():
+        fields = {name: opts.get_field(name) for name in values}
+        incoming = {name: normalize_value(fields[name], value) for name, value in values.items()}
+        obj = existing.get(key)
+
+        if obj is None:
+            row_defaults = defaults(key) if callable(defaults) else (defaults or {})
+            obj = model(**{key_field: key, **row_defaults, **incoming})
+            to_create.append(obj)
+            changes.append(('create', key, {name: (None, value) for name, value in incoming.items()}))
+        else:
+            current = {name: normalize_value(field, getattr(obj, field.attname)) for name, field in fields.items()}
+            if content_hash(current) == content_hash(incoming):
+                unchanged_count += 1
+            else:
+                diff = {name: (current[name], value) for name, value in incoming.items() if current[name] != value}
+                for name, (old, new) in diff.items():
+                    setattr(obj, fields[name].attname, new)
+                update_fields.update(diff)
+                to_update.append(obj)
+                changes.append(('update', key, diff))
+        objects[key] = obj
+
+    if not dry_run:
+        # bulk_update skips pre_save, so auto_now timestamps are set here
+        auto_now_fields = [field.name for field in opts.concrete_fields if getattr(field, 'auto_now', False)]
+        if to_update and auto_now_fields:
+            now = timezone.now()
+            for obj in to_update:
+                for name in auto_now_fields:
+                    setattr(obj, name, now)
+            update_fields.update(auto_now_fields)
+
+        with db_transaction.atomic():
+            model.objects.bulk_create(to_create, batch_size=batch_size)
+            if to_update:
+                model.objects.bulk_update(to_update, sorted(update_fields), batch_size=batch_size)
+
+        # Backends that cannot return ids from bulk_create get them from one more lookup
+        missing_pks = [getattr(obj, key_field) for obj in to_create if obj.pk is None]
+        if missing_pks:
+            for obj in model.objects.filter(**{f'{key_field}__in': missing_pks}):
+                objects[getattr(obj, key_field)] = obj
+
+    return UpsertResult(len(to_create), len(to_update), unchanged_count, changes, objects)
+
+
+def write_report(stdout, label, result, dry_run=False, limit=20):
+    """Write the counts of an upsert, and in a dry run each record that would be created or updated.
+
+    limit caps the listed records; pass None to list them all.
+    """
+    if not dry_run:
+        stdout.write(f'{label}: {result.created} created, {result.updated} updated, {result.unchanged} unchanged')
+        return
+    stdout.write(f'{label} (dry run): {result.created} to create, {result.updated} to update, {result.unchanged} unchanged')
+    for action, key, diff in result.changes[:limit]:
+        if action == 'create':
+            stdout.write(f'  + {key}')
+        else:
+            stdout.write(f'  ~ {key}: ' + ', '.join(f'{name} {old!r} -> {new!r}' for name, (old, new) in diff.items()))
+    if limit and len(result.changes) > limit:
+        stdout.write(f'  ... and {len(result.changes) - limit} more (use -v 2 to list all)')
@@ -0,0 +1,152 @@
+"""Versioned cache keys and counted cached reads.
+
+Cached data is grouped into namespaces named after what it is built from
+('files', 'projects', 'vendors', 'transactions', 'classes', 'roles',
+'approvals'). Each namespace has a version stored in the cache.
+versioned_key() puts the current version of every namespace a payload
+depends on into its key, and bump() replaces versions, so every process
+stops reading the old entries at once; they are left to expire. The signal
+receivers in models.py bump the namespace of a model whenever one of its
+rows is saved or deleted; code that writes with bulk_create, bulk_update or
+update() bumps explicitly.
+
+CachedRead is one cached payload (a page's JSON, a tree, a count) with hit
+and miss counters, which read_stats() reports for the settings page and
+the cache stats API. Counts are kept per process and added to shared
+counters in the cache every STATS_FLUSH_SECONDS, so counting costs no cache
+writes on most reads.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.core.cache import cache, caches
+
+# Seconds a cached read is kept when it does not set its own timeout
+DEFAULT_READ_TIMEOUT = 3600
+
+NAMESPACE_VERSION_KEY = 'cache:version:{}'
+STATS_KEY = 'cache:stats:{}:{}'
+
+# Longest time a process keeps hit and miss counts before adding them to the shared counters
+STATS_FLUSH_SECONDS = 10
+
+_missing = object()
+
+
+def namespace_versions(namespaces):
+    """Return the current version of each namespace, creating missing ones"""
+    keys = [NAMESPACE_VERSION_KEY.format(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex[:12], None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def versioned_key(prefix, namespaces, *parts):
+    """Cache key for data built from the given namespaces, e.g. versioned_key('vendors_page', ['vendors'], search)"""
+    key = ':'.join([prefix, *namespace_versions(namespaces)])
+    if parts:
+        # Parts may be user input (search text), so they are hashed into a safe, bounded key
+        key += ':' + hashlib.md5(json.dumps(parts, default=str).encode()).hexdigest()
+    return key
+
+
+def bump(*namespaces):
+    """Retire every cached entry built from these namespaces"""
+    cache.set_many({NAMESPACE_VERSION_KEY.format(namespace): uuid.uuid4().hex[:12] for namespace in namespaces}, None)
+
+
+_pending_counts = Counter()
+_stats_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def count(name, outcome):
+    with _stats_lock:
+        _pending_counts[(name, outcome)] += 1
+    if time.monotonic() - _last_flush >= STATS_FLUSH_SECONDS:
+        flush_stats()
+
+
+def flush_stats():
+    """Add this process's pending hit and miss counts to the shared counters"""
+    global _last_flush
+    with _stats_lock:
+        pending = dict(_pending_counts)
+        _pending_counts.clear()
+        _last_flush = time.monotonic()
+    for (name, outcome), delta in pending.items():
+        key = STATS_KEY.format(name, outcome)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, None):
+                cache.incr(key, delta)
+
+
+class CachedRead:
+    """A cached payload that depends on some namespaces, with hit and miss counters"""
+    registry = {}
+
+    def __init__(self, name, namespaces, timeout=DEFAULT_READ_TIMEOUT):
+        self.name = name
+        self.namespaces = list(namespaces)
+        self.timeout = timeout
+        CachedRead.registry[name] = self
+
+    def key(self, *parts):
+        return versioned_key(self.name, self.namespaces, *parts)
+
+    def get(self, build, *parts):
+        """Return the cached payload for parts, calling build() on a miss"""
+        key = self.key(*parts)
+        value = cache.get(key, _missing)
+        if value is _missing:
+            count(self.name, 'misses')
+            value = build()
+            cache.set(key, value, self.timeout)
+        else:
+            count(self.name, 'hits')
+        return value
+
+    def invalidate(self, *parts):
+        """Drop the one entry for parts; bump() the namespaces to drop them all"""
+        cache.delete(self.key(*parts))
+
+
+def read_stats():
+    """Hits, misses and hit rate of every registered cached read, by name"""
+    flush_stats()
+    keys = [STATS_KEY.format(name, outcome) for name in CachedRead.registry for outcome in ('hits', 'misses')]
+    counts = cache.get_many(keys)
+    stats = {}
+    for name, read in sorted(CachedRead.registry.items()):
+        hits = counts.get(STATS_KEY.format(name, 'hits'), 0)
+        misses = counts.get(STATS_KEY.format(name, 'misses'), 0)
+        stats[name] = {
+            'namespaces': read.namespaces,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _pending_counts.clear()
+    cache.delete_many([STATS_KEY.format(name, outcome) for name in CachedRead.registry for outcome in ('hits', 'misses')])
+
+
+def backend_name():
+    """Class name of the configured cache backend, e.g. LocMemCache"""
+    return type(caches['default']).__name__
@@ -0,0 +1,13 @@
+from .models import ApprovalInboxEntry
+
+
+def approval_counts(request):
+    """Number of files waiting in the user's approval inbox, for the sidebar badge"""
+    if not request.user.is_authenticated:
+        return {}
+    return {'pending_approval_count': ApprovalInboxEntry.pending_count(request.user)}
+
+
+def roles(request):
+    """The user's cached roles as {{ roles }}, e.g. {% if roles.is_superintendent %}"""
+    return {'roles': getattr(request, 'roles', None)}
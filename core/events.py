@@ -0,0 +1,91 @@
+"""Live updates for the approvals and bills pages.
+
+Views send ``files_changed`` after they change files (approved, sent back,
+matched, paid, ...). The receiver records a ChangeEvent row once the
+database transaction commits, and the server-sent event stream served by
+``event_stream`` polls those rows, so events reach clients connected to any
+web process. Streams need an async server (config/asgi.py); under WSGI the
+endpoint answers 204 and pages simply keep their server-rendered data.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import File, ChangeEvent
+
+# Sent with kind (a ChangeEvent kind) and file_ids
+files_changed = Signal()
+
+# Events older than this are pruned; a client that was away longer reloads
+EVENT_RETENTION = timedelta(hours=1)
+
+# Streams end after this long and the browser reconnects with Last-Event-ID,
+# which keeps connections from piling up behind proxies
+STREAM_LIFETIME_SECONDS = 300
+
+KEEPALIVE_SECONDS = 15
+
+
+@receiver(files_changed)
+def record_change_events(sender, kind, file_ids, **kwargs):
+    file_ids = list(file_ids)
+    if not file_ids:
+        return
+
+    def publish():
+        ChangeEvent.objects.bulk_create([ChangeEvent(kind=kind, file_id=file_id) for file_id in file_ids])
+        ChangeEvent.objects.filter(created_at__lt=timezone.now() - EVENT_RETENTION).delete()
+
+    db_transaction.on_commit(publish)
+
+
+@receiver(post_delete, sender=File)
+def file_deleted(sender, instance, **kwargs):
+    files_changed.send(sender=File, kind='deleted', file_ids=[instance.id])
+
+
+def latest_event_id():
+    return ChangeEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def events_after(event_id, limit=200):
+    return list(ChangeEvent.objects.filter(id__gt=event_id).order_by('id')[:limit])
+
+
+def format_event(event_id, data):
+    return f"id: {event_id}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(last_event_id, serialize_events):
+    """Yield server-sent events for ChangeEvents after last_event_id.
+
+    serialize_events is a synchronous callable that turns a list of
+    ChangeEvents into (event, data) pairs shaped for this client's page.
+    """
+    poll_interval = getattr(settings, 'LIVE_UPDATE_POLL_SECONDS', 2)
+    started = time.monotonic()
+    last_sent = started
+
+    # Tell the browser how soon to reconnect after the stream ends
+    yield f"retry: {int(poll_interval * 1000)}\n\n"
+
+    while time.monotonic() - started < STREAM_LIFETIME_SECONDS:
+        events = await sync_to_async(events_after)(last_event_id)
+        if events:
+            for event, data in await sync_to_async(serialize_events)(events):
+                yield format_event(event.id, data)
+            last_event_id = events[-1].id
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        if not events:
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,66 @@
+from collections import Counter
+from django.core.management.base import BaseCommand
+from core.models import File, BillSummary
+from core.caching import bump
+
+
+class Command(BaseCommand):
+    help = 'Parse the free-form invoice date of files into the indexed invoice_date column'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-parse every file, not just those without an invoice date'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of files updated per query'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        
+        files = File.objects.exclude(date='').only('id', 'name', 'date', 'invoice_date').order_by('id')
+        if not options['all']:
+            files = files.filter(invoice_date__isnull=True)
+        
+        updated_count = 0
+        unparseable = []
+        batch = []
+        
+        def save_batch(batch):
+            # bulk_update sends no signals, so the bills read model is refreshed here
+            File.objects.bulk_update(batch, ['invoice_date'])
+            BillSummary.refresh_files([file_obj.id for file_obj in batch])
+            return len(batch)
+        
+        for file_obj in files.iterator(chunk_size=batch_size):
+            invoice_date = File.parse_date(file_obj.date)
+            if invoice_date is None:
+                unparseable.append(file_obj)
+                continue
+            if invoice_date != file_obj.invoice_date:
+                file_obj.invoice_date = invoice_date
+                batch.append(file_obj)
+            
+            if len(batch) >= batch_size:
+                updated_count += save_batch(batch)
+                batch = []
+        
+        if batch:
+            updated_count += save_batch(batch)
+        if updated_count:
+            bump('files')
+        
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated_count} files'))
+        
+        if unparseable:
+            self.stdout.write(self.style.WARNING(f'{len(unparseable)} files have a date that could not be parsed:'))
+            for value, count in Counter(file_obj.date for file_obj in unparseable).most_common():
+                self.stdout.write(f'  "{value}" ({count} file{"s" if count != 1 else ""})')
+            if options['verbosity'] > 1:
+                for file_obj in unparseable:
+                    self.stdout.write(f'  #{file_obj.id} {file_obj.name}: "{file_obj.date}"')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from core.models import File, ApprovalInboxEntry
+
+
+class Command(BaseCommand):
+    help = 'Resolve the project and vendor text of files to Project and Vendor records'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-resolve every file, not just those missing a project or vendor reference'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of files updated per query'
+        )
+
+    def handle(self, *args, **options):
+        files = File.objects.order_by('id')
+        if not options['all']:
+            files = files.filter(project_ref__isnull=True) | files.filter(vendor_ref__isnull=True)
+        
+        updated_count, unresolved = File.resolve_all_references(files, batch_size=options['batch_size'])
+        if updated_count:
+            ApprovalInboxEntry.rebuild()
+        
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated_count} files'))
+        
+        for field, counts in unresolved.items():
+            if not counts:
+                continue
+            self.stdout.write(self.style.WARNING(
+                f'{sum(counts.values())} files have a {field} that matches no {field} record:'
+            ))
+            limit = None if options['verbosity'] > 1 else 20
+            for value, count in counts.most_common(limit):
+                self.stdout.write(f'  "{value}" ({count} file{"s" if count != 1 else ""})')
+            if limit and len(counts) > limit:
+                self.stdout.write(f'  ... and {len(counts) - limit} more (use -v 2 to list all)')
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from core.models import Transaction, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Parse card last-4 digits from transaction descriptions and link them to card holders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-resolve every transaction, not just those without a card number'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of transactions updated per query'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        
+        UserProfile.invalidate_card_map()
+        card_map = UserProfile.card_user_map()
+        
+        transactions = Transaction.objects.only('id', 'description', 'card_last4', 'card_user_id').order_by('id')
+        if not options['all']:
+            transactions = transactions.filter(card_last4__isnull=True)
+        
+        updated_count = 0
+        resolved_count = 0
+        batch = []
+        for transaction in transactions.iterator(chunk_size=batch_size):
+            old_values = (transaction.card_last4, transaction.card_user_id)
+            transaction.assign_card(card_map)
+            if transaction.card_user_id:
+                resolved_count += 1
+            if (transaction.card_last4, transaction.card_user_id) != old_values:
+                batch.append(transaction)
+            
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_update(batch, ['card_last4', 'card_user'])
+                updated_count += len(batch)
+                batch = []
+        
+        if batch:
+            Transaction.objects.bulk_update(batch, ['card_last4', 'card_user'])
+            updated_count += len(batch)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Updated {updated_count} transactions ({resolved_count} linked to a card holder)'
+            )
+        )
@@ -0,0 +1,59 @@
+import json
+import os
+from django.core.management.base import BaseCommand
+from core.models import Project, Vendor, File, ApprovalInboxEntry
+from core.bulk_upsert import write_report
+
+
+class Command(BaseCommand):
+    help = 'Create or update projects and vendors from projects.json and vendors.json files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--projects',
+            type=str,
+            help='Path to a projects JSON file ({"projects": [...]})'
+        )
+        parser.add_argument(
+            '--vendors',
+            type=str,
+            help='Path to a vendors JSON file ({"vendors": [...]})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the records that would be created or updated without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        limit = None if options['verbosity'] > 1 else 20
+        sources = [(Project, 'Projects', options['projects']), (Vendor, 'Vendors', options['vendors'])]
+
+        if not any(path for _, _, path in sources):
+            self.stdout.write(self.style.ERROR('Pass --projects and/or --vendors'))
+            return
+
+        changed = {}
+        for model, label, file_path in sources:
+            if not file_path:
+                continue
+            if not os.path.exists(file_path):
+                self.stdout.write(self.style.ERROR(f'File not found: {file_path}'))
+                continue
+            try:
+                result = model.import_from_json(file_path, dry_run=dry_run)
+            except json.JSONDecodeError as e:
+                self.stdout.write(self.style.ERROR(f'Invalid JSON file {file_path}: {e}'))
+                continue
+            write_report(self.stdout, label, result, dry_run=dry_run, limit=limit)
+            changed[model] = result.created + result.updated
+
+        if dry_run or not any(changed.values()):
+            return
+
+        # New names and aliases may match file text that matched nothing before
+        updated_count, _ = File.resolve_all_references()
+        if changed.get(Project) or updated_count:
+            ApprovalInboxEntry.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Import completed. Re-resolved references on {updated_count} files.'))
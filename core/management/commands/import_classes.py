@@ -3,6 +3,7 @@ from django.db import transaction
 import json
 import os
 from core.models import Class
+from core.bulk_upsert import upsert, write_report
 
 class Command(BaseCommand):
     help = 'Import classes from classes.json file'
@@ -19,10 +20,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing classes before importing'
         )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show which classes would be created or moved without changing anything'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file']
         clear_existing = options['clear']
+        dry_run = options['dry_run']
         
         # Check if file exists
         if not os.path.exists(file_path):
@@ -40,86 +47,103 @@ class Command(BaseCommand):
             )
             return
         
-        with transaction.atomic():
-            # Clear existing classes if requested
-            if clear_existing:
-                deleted_count = Class.objects.count()
-                Class.objects.all().delete()
-                self.stdout.write(
-                    self.style.WARNING(f'Deleted {deleted_count} existing classes')
-                )
-            
-            # Define colors for parent categories
-            parent_colors = {
-                'GENERAL SERVICES': '#3B82F6',  # Blue
-                'SITE SERVICES': '#10B981',     # Green
-                'FRAMING': '#F59E0B',           # Yellow
-                'WINDOWS/EXTERIOR DOORS': '#8B5CF6',  # Purple
-                'PLUMBING': '#06B6D4',          # Cyan
-                'ELECTRICAL': '#F97316',        # Orange
-                'UTILITY CO. FEES': '#84CC16',  # Lime
-                'CONCRETE': '#6B7280',          # Gray
-                'FIRE SAFETY': '#EF4444',       # Red
-                'HVAC': '#14B8A6',              # Teal
-                'FINISHES': '#EC4899',          # Pink
-                'EXTERIOR SITE WORK': '#8B5A2B', # Brown
-                'SPECIALTY': '#6366F1'          # Indigo
-            }
-            
-            # Child color (slightly lighter than parent)
-            child_color = '#E5E7EB'  # Light gray
-            
-            created_parents = 0
-            created_children = 0
-            
-            # Create parent classes first
-            for parent_name, children in data.items():
-                # Create or get parent class
-                parent_class, parent_created = Class.objects.get_or_create(
-                    name=parent_name,
-                    defaults={
+        # Define colors for parent categories
+        parent_colors = {
+            'GENERAL SERVICES': '#3B82F6',  # Blue
+            'SITE SERVICES': '#10B981',     # Green
+            'FRAMING': '#F59E0B',           # Yellow
+            'WINDOWS/EXTERIOR DOORS': '#8B5CF6',  # Purple
+            'PLUMBING': '#06B6D4',          # Cyan
+            'ELECTRICAL': '#F97316',        # Orange
+            'UTILITY CO. FEES': '#84CC16',  # Lime
+            'CONCRETE': '#6B7280',          # Gray
+            'FIRE SAFETY': '#EF4444',       # Red
+            'HVAC': '#14B8A6',              # Teal
+            'FINISHES': '#EC4899',          # Pink
+            'EXTERIOR SITE WORK': '#8B5A2B', # Brown
+            'SPECIALTY': '#6366F1'          # Indigo
+        }
+        
+        # Child color (slightly lighter than parent)
+        child_color = '#E5E7EB'  # Light gray
+        
+        # Description and color are only set on new classes; the file decides the hierarchy
+        child_parents = {child_name: parent_name for parent_name, children in data.items() for child_name in children}
+        limit = None if options['verbosity'] > 1 else 20
+        
+        try:
+            with transaction.atomic():
+                # Clear existing classes if requested; a dry run deletes them too and rolls back at the end
+                if clear_existing:
+                    deleted_count = Class.objects.count()
+                    Class.objects.all().delete()
+                    self.stdout.write(
+                        self.style.WARNING(f'{"Would delete" if dry_run else "Deleted"} {deleted_count} existing classes')
+                    )
+                
+                # Create parent classes first, so children can point at them
+                parents = upsert(
+                    Class, 'name',
+                    {parent_name: {'parent_id': None} for parent_name in data},
+                    defaults=lambda parent_name: {
                         'description': f'Parent category for {parent_name.lower()}',
                         'color': parent_colors.get(parent_name, '#3B82F6'),
-                        'parent': None,
                         'is_active': True
-                    }
+                    },
+                    dry_run=dry_run
                 )
+                write_report(self.stdout, 'Parent classes', parents, dry_run=dry_run, limit=limit)
                 
-                if parent_created:
-                    created_parents += 1
-                    self.stdout.write(f'Created parent class: {parent_name}')
-                else:
-                    self.stdout.write(f'Parent class already exists: {parent_name}')
+                if dry_run:
+                    # New parents have no id yet; stand-in ids keep the children's diff right
+                    new_parents = [parent for parent in parents.objects.values() if parent.pk is None]
+                    for stand_in, parent in enumerate(new_parents, start=1):
+                        parent.pk = -stand_in
                 
-                # Create child classes
-                for child_name in children:
-                    child_class, child_created = Class.objects.get_or_create(
-                        name=child_name,
-                        defaults={
-                            'description': f'Child class under {parent_name}',
-                            'color': child_color,
-                            'parent': parent_class,
-                            'is_active': True
-                        }
-                    )
-                    
-                    if child_created:
-                        created_children += 1
-                        self.stdout.write(f'  Created child class: {child_name}')
-                    else:
-                        self.stdout.write(f'  Child class already exists: {child_name}')
-            
-            success_message = (
-                f'Import completed successfully!\n'
-                f'Created {created_parents} parent classes\n'
-                f'Created {created_children} child classes\n'
-                f'Total classes: {Class.objects.count()}'
-            )
-            
-            self.stdout.write(self.style.SUCCESS(success_message))
+                children = upsert(
+                    Class, 'name',
+                    {child_name: {'parent_id': parents.objects[parent_name].pk} for child_name, parent_name in child_parents.items()},
+                    defaults=lambda child_name: {
+                        'description': f'Child class under {child_parents[child_name]}',
+                        'color': child_color,
+                        'is_active': True
+                    },
+                    dry_run=dry_run
+                )
+                if dry_run:
+                    children = self.name_parents(children, parents)
+                write_report(self.stdout, 'Child classes', children, dry_run=dry_run, limit=limit)
+                
+                if dry_run:
+                    transaction.set_rollback(True)
+                else:
+                    # Bulk writes skip Class.save(), which maintains paths and the cached tree
+                    Class.rebuild_paths()
             
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Error importing classes: {e}')
             )
             raise
+        
+        if not dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'Import completed successfully!\n'
+                f'Created {parents.created} parent classes\n'
+                f'Created {children.created} child classes\n'
+                f'Total classes: {Class.objects.count()}'
+            ))
+
+    def name_parents(self, children, parents):
+        """Show the children's parent_id changes as parent class names, for the dry-run report"""
+        names = {parent.pk: name for name, parent in parents.objects.items()}
+        old_ids = {diff['parent_id'][0] for _, _, diff in children.changes if 'parent_id' in diff}
+        names.update(Class.objects.filter(pk__in=old_ids - set(names)).values_list('pk', 'name'))
+        changes = []
+        for action, key, diff in children.changes:
+            diff = dict(diff)
+            if 'parent_id' in diff:
+                old, new = diff.pop('parent_id')
+                diff['parent'] = (names.get(old), names.get(new))
+            changes.append((action, key, diff))
+        return children._replace(changes=changes)
@@ -1,9 +1,13 @@
 import json
 import os
+from collections import defaultdict
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User, Group
 from django.db import transaction
-from core.models import UserProfile
+from core.models import UserProfile, Transaction
+from core.bulk_upsert import upsert, write_report
+from core.roles import invalidate_all_roles
 
 
 class Command(BaseCommand):
@@ -63,8 +67,7 @@ class Command(BaseCommand):
             'Contractor': 'Designer',  # External contractors get limited access
         }
         
-        created_count = 0
-        updated_count = 0
+        members = {}
         skipped_count = 0
         
         self.stdout.write(f'Processing {len(team_members)} team members...')
@@ -91,85 +94,92 @@ class Command(BaseCommand):
             if not email:
                 email = f"{username}@davidelliot.la"
             
-            # Determine group based on title
-            group_name = title_to_group.get(title, 'Designer')  # Default to Designer
+            members[username] = {
+                'user': {
+                    'email': email,
+                    'first_name': name.split()[0] if name.split() else '',
+                    'last_name': ' '.join(name.split()[1:]) if len(name.split()) > 1 else '',
+                    'is_staff': title in ['Owner', 'Manager', 'Superintendant']
+                },
+                'card_number': card_last_four,
+                # Determine group based on title
+                'group_name': title_to_group.get(title, 'Designer')  # Default to Designer
+            }
+        
+        limit = None if options['verbosity'] > 1 else 20
+        
+        with transaction.atomic():
+            users = upsert(
+                User, 'username',
+                {username: member['user'] for username, member in members.items()},
+                # Users will need to reset the temporary password; hashing it once keeps large imports fast
+                defaults={'is_active': True, 'password': make_password('temp_password_123')},
+                dry_run=dry_run
+            )
+            write_report(self.stdout, 'Users', users, dry_run=dry_run, limit=limit)
             
-            if dry_run:
-                self.stdout.write(
-                    f'Would create: {name} ({username}) - {email} - Card: {card_last_four} - Group: {group_name}'
-                )
-                continue
+            # New users have no id in a dry run, and cannot have a profile yet anyway
+            profiles = upsert(
+                UserProfile, 'user_id',
+                {
+                    users.objects[username].pk: {'card_number': member['card_number']} if member['card_number'] else {}
+                    for username, member in members.items() if users.objects[username].pk
+                },
+                dry_run=dry_run
+            )
+            write_report(self.stdout, 'Profiles', profiles, dry_run=dry_run, limit=limit)
             
-            try:
-                with transaction.atomic():
-                    # Check if user already exists
-                    user, created = User.objects.get_or_create(
-                        username=username,
-                        defaults={
-                            'email': email,
-                            'first_name': name.split()[0] if name.split() else '',
-                            'last_name': ' '.join(name.split()[1:]) if len(name.split()) > 1 else '',
-                            'is_active': True,
-                            'is_staff': title in ['Owner', 'Manager', 'Superintendant']
-                        }
-                    )
-                    
-                    if created:
-                        # Set password (users will need to reset it)
-                        user.set_password('temp_password_123')
-                        user.save()
-                        created_count += 1
-                        self.stdout.write(
-                            self.style.SUCCESS(f'Created user: {name} ({username})')
-                        )
-                    else:
-                        # Update existing user
-                        user.email = email
-                        user.first_name = name.split()[0] if name.split() else ''
-                        user.last_name = ' '.join(name.split()[1:]) if len(name.split()) > 1 else ''
-                        user.is_staff = title in ['Owner', 'Manager', 'Superintendant']
-                        user.save()
-                        updated_count += 1
-                        self.stdout.write(
-                            self.style.WARNING(f'Updated user: {name} ({username})')
-                        )
-                    
-                    # Get or create user profile
-                    profile, profile_created = UserProfile.objects.get_or_create(
-                        user=user,
-                        defaults={'card_number': card_last_four}
-                    )
-                    
-                    if not profile_created and card_last_four:
-                        profile.card_number = card_last_four
-                        profile.save()
-                    
-                    # Assign group
-                    try:
-                        group = Group.objects.get(name=group_name)
-                        user.groups.clear()
-                        user.groups.add(group)
-                        self.stdout.write(f'  Assigned to group: {group_name}')
-                    except Group.DoesNotExist:
-                        self.stdout.write(
-                            self.style.ERROR(f'  Group not found: {group_name}')
-                        )
-                    
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error processing {name}: {str(e)}')
-                )
-                skipped_count += 1
+            group_count = self.sync_groups(members, users.objects, dry_run)
+            self.stdout.write(f'Group assignments {"to change" if dry_run else "changed"}: {group_count}')
+            
+            if not dry_run:
+                # Transactions charged to a card follow the card to its new owner
+                for action, user_id, diff in profiles.changes:
+                    old_card, new_card = diff.get('card_number', (None, None))
+                    if old_card:
+                        Transaction.reassign_card_user(old_card, None)
+                    if new_card:
+                        Transaction.reassign_card_user(new_card, user_id)
         
         if not dry_run:
+            # Bulk writes send no signals, so the cached card map, users page and roles are dropped here
+            UserProfile.invalidate_card_map()
+            UserProfile.invalidate_user_list()
+            invalidate_all_roles()
             self.stdout.write('\n' + '='*50)
             self.stdout.write(
                 self.style.SUCCESS(f'Import completed!')
             )
-            self.stdout.write(f'Created: {created_count} users')
-            self.stdout.write(f'Updated: {updated_count} users')
+            self.stdout.write(f'Created: {users.created} users')
+            self.stdout.write(f'Updated: {users.updated} users')
+            self.stdout.write(f'Unchanged: {users.unchanged} users')
             self.stdout.write(f'Skipped: {skipped_count} users')
             self.stdout.write('\nNote: All users have temporary password "temp_password_123"')
             self.stdout.write('Users should reset their passwords on first login.')
         else:
-            self.stdout.write(f'\nDry run completed. Would process {len(team_members)} members.')
+            self.stdout.write(f'\nDry run completed. Would process {len(members)} members.')
+    
+    def sync_groups(self, members, users, dry_run):
+        """Put each member in exactly their title's group, returning how many memberships change"""
+        groups = {group.name: group for group in Group.objects.filter(name__in={member['group_name'] for member in members.values()})}
+        for group_name in sorted({member['group_name'] for member in members.values()} - set(groups)):
+            self.stdout.write(
+                self.style.ERROR(f'  Group not found: {group_name}')
+            )
+        
+        Membership = User.groups.through
+        current = defaultdict(set)
+        for user_id, group_id in Membership.objects.filter(user_id__in=[user.pk for user in users.values() if user.pk]).values_list('user_id', 'group_id'):
+            current[user_id].add(group_id)
+        
+        changed = {}
+        for username, member in members.items():
+            group = groups.get(member['group_name'])
+            user = users[username]
+            if group and (not user.pk or current[user.pk] != {group.id}):
+                changed[username] = Membership(user_id=user.pk, group_id=group.id)
+        
+        if changed and not dry_run:
+            Membership.objects.filter(user_id__in=[membership.user_id for membership in changed.values()]).delete()
+            Membership.objects.bulk_create(changed.values())
+        return len(changed)
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from core.matching import run_matching, group_candidates, get_auto_accept_threshold
+from core.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Match approved bills to unmatched card transactions and store ranked suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--auto-accept',
+            action='store_true',
+            help='Attach transactions to bills for matches scoring at or above the threshold'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=None,
+            help='Auto-accept threshold between 0 and 1 (defaults to MATCH_AUTO_ACCEPT_THRESHOLD)'
+        )
+        parser.add_argument(
+            '--splits',
+            action='store_true',
+            help='Also look for one charge paying several bills, or one bill paid by several charges'
+        )
+        parser.add_argument(
+            '--vendor',
+            type=str,
+            default=None,
+            help='Limit the split search to one vendor'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the matches without saving anything'
+        )
+
+    def handle(self, *args, **options):
+        threshold = None
+        if options['auto_accept']:
+            threshold = options['threshold'] if options['threshold'] is not None else get_auto_accept_threshold()
+        
+        result = run_matching(
+            auto_accept_threshold=threshold,
+            dry_run=options['dry_run'],
+            include_splits=options['splits'],
+            vendor=options['vendor']
+        )
+        
+        for group in group_candidates(result.suggestions):
+            accepted = threshold is not None and group[0].score >= threshold
+            file_names = ', '.join(dict.fromkeys(c.file.name for c in group))
+            transactions = ', '.join(dict.fromkeys(
+                f'{c.transaction.date} {c.transaction.amount_display} {c.transaction.description[:40]}' for c in group
+            ))
+            self.stdout.write(
+                f'{"ACCEPT" if accepted else "SUGGEST"} {group[0].score:.0%}  '
+                f'{"[split] " if group[0].group_key else ""}{file_names} -> {transactions}'
+            )
+        
+        if result.accepted_count and not options['dry_run']:
+            Transaction.invalidate_stats()
+        
+        if result.timed_out:
+            self.stdout.write(self.style.WARNING('Split search stopped at its time limit; some split payments may be missing'))
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{len(group_candidates(result.suggestions))} matches ({result.split_count} split) for {result.bill_count} open bills and '
+                f'{result.transaction_count} unmatched transactions, {result.accepted_count} accepted '
+                f'in {result.elapsed_seconds:.2f}s' + (' (dry run)' if options['dry_run'] else '')
+            )
+        )
@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from core.transaction_import import claim_next_batch, recover_stale_imports, run_import
+
+
+class Command(BaseCommand):
+    help = 'Process queued transaction CSV imports (used when TRANSACTION_IMPORT_MODE is "worker")'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the current queue and exit instead of polling'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        once = options['once']
+        interval = options['interval']
+        
+        self.stdout.write('Waiting for transaction imports...' if not once else 'Processing queued transaction imports...')
+        
+        while True:
+            failed_count = recover_stale_imports()
+            if failed_count:
+                self.stdout.write(self.style.WARNING(f'Marked {failed_count} abandoned imports as failed'))
+            import_batch = claim_next_batch()
+            
+            if import_batch is None:
+                if once:
+                    break
+                time.sleep(interval)
+                continue
+            
+            self.stdout.write(f'Importing {import_batch.file_name} (batch {import_batch.id})')
+            import_batch = run_import(import_batch)
+            
+            if import_batch.status == 'completed':
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'  {import_batch.inserted_count} inserted, {import_batch.skipped_count} skipped, '
+                        f'{import_batch.error_count} errors in {import_batch.duration_seconds:.1f}s'
+                    )
+                )
+            else:
+                self.stdout.write(
+                    self.style.ERROR(f'  {import_batch.errors[0] if import_batch.errors else "Import failed"}')
+                )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.models import ApprovalInboxEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every superintendent approval inbox from the pending files and project assignments'
+
+    def handle(self, *args, **options):
+        ApprovalInboxEntry.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt approval inboxes: {ApprovalInboxEntry.objects.count()} entries'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.models import BillSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the BillSummary rows behind the bills page from the current files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of summary rows inserted per query'
+        )
+
+    def handle(self, *args, **options):
+        BillSummary.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {BillSummary.objects.count()} bill summaries'))
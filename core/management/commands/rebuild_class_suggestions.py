@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.models import ClassSuggestion
+
+
+class Command(BaseCommand):
+    help = 'Recount the approval class suggestions from the classes of approved files'
+
+    def handle(self, *args, **options):
+        ClassSuggestion.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt class suggestions: {ClassSuggestion.objects.count()} vendor/project/class counts'))
@@ -0,0 +1,629 @@
+"""Batch matching of approved bills to card transactions.
+
+Open bills and unmatched charges are loaded once and charges are indexed by
+amount in cents, so each bill only probes the few charges in its own bucket.
+Candidate pairs are scored on amount, date proximity, vendor name and card
+holder, then assigned globally so no transaction is proposed for two bills.
+
+In split mode, whatever is left over is searched for one charge paying
+several bills of the same vendor, or one bill paid by several charges.
+"""
+import re
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction as db_transaction
+from django.db.models.functions import Lower
+
+from .models import File, Transaction, Vendor, Project, MatchSuggestion, BillPayment, BillSummary
+from .events import files_changed
+
+# Signal weights for the overall score (they sum to 1)
+AMOUNT_WEIGHT = 0.4
+DATE_WEIGHT = 0.25
+VENDOR_WEIGHT = 0.25
+CARD_HOLDER_WEIGHT = 0.1
+
+# Amounts further apart than this (in cents) are never matched
+AMOUNT_TOLERANCE_CENTS = 1
+
+# Charges more than twice this many days from the invoice date are ignored
+MATCH_DATE_WINDOW_DAYS = 30
+
+# Pairs scoring below this are not suggested at all
+MIN_SUGGESTION_SCORE = 0.5
+
+# Components with at most this many bills or transactions on the smaller side
+# are solved exactly; larger ones fall back to greedy assignment
+EXACT_ASSIGNMENT_LIMIT = 10
+
+# Split matching: at most this many bills or charges are considered per target,
+# combinations use at most this many parts, and the whole search stops after
+# the time budget (seconds)
+SPLIT_MATCH_MAX_ITEMS = 20
+SPLIT_MATCH_MAX_PARTS = 6
+SPLIT_MATCH_TIME_BUDGET = 5.0
+
+# group_key is empty for one-to-one matches and shared by the pairs of a split match
+Candidate = namedtuple('Candidate', ['file', 'transaction', 'score', 'details', 'group_key'], defaults=[''])
+MatchResult = namedtuple('MatchResult', ['suggestions', 'accepted_count', 'bill_count', 'transaction_count', 'elapsed_seconds', 'split_count', 'timed_out'], defaults=[0, False])
+
+
+class SplitMatchTimeout(Exception):
+    """Raised when the split search runs past its time budget"""
+
+
+def get_auto_accept_threshold():
+    """Return the confidence above which suggestions may be accepted automatically"""
+    return getattr(settings, 'MATCH_AUTO_ACCEPT_THRESHOLD', 0.9)
+
+
+def get_import_auto_accept_threshold():
+    """Return the auto-accept threshold for matching during CSV imports, or None to only suggest"""
+    if getattr(settings, 'MATCH_AUTO_ACCEPT_ON_IMPORT', False):
+        return get_auto_accept_threshold()
+    return None
+
+
+def normalize_text(value):
+    """Uppercase and reduce to alphanumeric words for loose name comparison"""
+    return ' '.join(re.findall(r'[A-Z0-9]+', (value or '').upper()))
+
+
+def to_cents(amount):
+    return int((amount * 100).to_integral_value())
+
+
+class MatchContext:
+    """Lookup tables loaded once per matching run.
+
+    With ``bills``, only the vendors and projects of those bills are loaded,
+    so matching a few new transactions does not read the whole catalog.
+    """
+
+    def __init__(self, transaction_ids=None, bills=None):
+        vendors = Vendor.objects.all()
+        projects = Project.objects.all()
+        if bills is not None:
+            vendor_texts = {file_obj.vendor.lower() for file_obj in bills if file_obj.vendor}
+            vendors = vendors.annotate(lower_name=Lower('name')).filter(
+                models.Q(id__in={file_obj.vendor_ref_id for file_obj in bills if file_obj.vendor_ref_id}) |
+                models.Q(lower_name__in=vendor_texts)
+            )
+            projects = projects.filter(name__in={file_obj.project for file_obj in bills if file_obj.project})
+
+        # Vendor names and aliases, keyed by normalized vendor name
+        self.vendor_names = {}
+        for name, aliases in vendors.values_list('name', 'aliases'):
+            names = [normalize_text(name)] + [normalize_text(alias) for alias in (aliases or []) if isinstance(alias, str)]
+            self.vendor_names[normalize_text(name)] = [n for n in names if n]
+
+        # Superintendent ids per project name
+        self.project_superintendents = defaultdict(set)
+        for name, user_id in projects.filter(superintendents__isnull=False).values_list('name', 'superintendents'):
+            self.project_superintendents[name].add(user_id)
+
+        # Pairs a user already rejected are never proposed again
+        rejected = MatchSuggestion.objects.filter(status='rejected')
+        if transaction_ids is not None:
+            rejected = rejected.filter(transaction_id__in=transaction_ids)
+        self.rejected_pairs = set(rejected.values_list('file_id', 'transaction_id'))
+
+    def vendor_score(self, vendor, description):
+        normalized_vendor = normalize_text(vendor)
+        if not normalized_vendor:
+            return 0.0
+        normalized_description = f' {normalize_text(description)} '
+        for name in self.vendor_names.get(normalized_vendor, [normalized_vendor]):
+            if f' {name} ' in normalized_description:
+                return 1.0
+        # Partial credit when the first significant word of the vendor appears
+        words = [word for word in normalized_vendor.split() if len(word) >= 3]
+        if words and f' {words[0]} ' in normalized_description:
+            return 0.5
+        return 0.0
+
+    def card_holder_score(self, file_obj, transaction):
+        if not transaction.card_user_id:
+            return 0.25
+        if transaction.card_user_id == file_obj.uploaded_by_id:
+            return 1.0
+        if transaction.card_user_id in self.project_superintendents.get(file_obj.project, ()):
+            return 1.0
+        return 0.5
+
+
+def score_pair(context, file_obj, bill_cents, bill_date, transaction):
+    """Return (score, details) for a bill/transaction pair, or None if they cannot match"""
+    if (file_obj.id, transaction.id) in context.rejected_pairs:
+        return None
+
+    amount_diff = abs(to_cents(transaction.amount) - bill_cents)
+    amount_score = 1.0 if amount_diff == 0 else 0.8
+
+    if bill_date:
+        days = abs((transaction.date - bill_date).days)
+        if days > MATCH_DATE_WINDOW_DAYS * 2:
+            return None
+        date_score = max(0.0, 1 - days / MATCH_DATE_WINDOW_DAYS)
+    else:
+        days = None
+        date_score = 0.5
+
+    vendor_score = context.vendor_score(file_obj.vendor, transaction.description)
+    card_holder_score = context.card_holder_score(file_obj, transaction)
+
+    score = (
+        AMOUNT_WEIGHT * amount_score +
+        DATE_WEIGHT * date_score +
+        VENDOR_WEIGHT * vendor_score +
+        CARD_HOLDER_WEIGHT * card_holder_score
+    )
+    details = {
+        'amount': round(amount_score, 3),
+        'date': round(date_score, 3),
+        'days_apart': days,
+        'vendor': round(vendor_score, 3),
+        'card_holder': round(card_holder_score, 3),
+    }
+    return round(score, 4), details
+
+
+def build_amount_index(transactions):
+    """Group transactions into buckets keyed by amount in cents"""
+    index = defaultdict(list)
+    for transaction in transactions:
+        index[to_cents(transaction.amount)].append(transaction)
+    return index
+
+
+def find_candidates(context, bills, amount_index):
+    """Score every bill against the transactions in its amount buckets"""
+    candidates = []
+    for file_obj in bills:
+        if file_obj.amount is None or file_obj.amount <= 0:
+            continue
+        bill_cents = to_cents(file_obj.amount)
+        bill_date = file_obj.invoice_date
+
+        for cents in range(bill_cents - AMOUNT_TOLERANCE_CENTS, bill_cents + AMOUNT_TOLERANCE_CENTS + 1):
+            for transaction in amount_index.get(cents, ()):
+                scored = score_pair(context, file_obj, bill_cents, bill_date, transaction)
+                if scored and scored[0] >= MIN_SUGGESTION_SCORE:
+                    candidates.append(Candidate(file_obj, transaction, scored[0], scored[1]))
+    return candidates
+
+
+def _connected_components(candidates):
+    """Split candidates into groups that share no bill or transaction"""
+    parent = {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for candidate in candidates:
+        parent[find(('f', candidate.file.id))] = find(('t', candidate.transaction.id))
+
+    components = defaultdict(list)
+    for candidate in candidates:
+        components[find(('f', candidate.file.id))].append(candidate)
+    return list(components.values())
+
+
+def _exact_assignment(component):
+    """Maximum-score assignment by dynamic programming over subsets of the smaller side"""
+    file_ids = sorted({c.file.id for c in component})
+    transaction_ids = sorted({c.transaction.id for c in component})
+
+    # Iterate over the larger side and track used nodes of the smaller side in a bitmask
+    if len(file_ids) >= len(transaction_ids):
+        row_ids, column_ids = file_ids, transaction_ids
+        row_of, column_of = (lambda c: c.file.id), (lambda c: c.transaction.id)
+    else:
+        row_ids, column_ids = transaction_ids, file_ids
+        row_of, column_of = (lambda c: c.transaction.id), (lambda c: c.file.id)
+
+    column_bit = {column_id: 1 << i for i, column_id in enumerate(column_ids)}
+    edges_by_row = defaultdict(list)
+    for candidate in component:
+        edges_by_row[row_of(candidate)].append(candidate)
+
+    best = {0: (0.0, ())}
+    for row_id in row_ids:
+        updated = dict(best)
+        for mask, (score, chosen) in best.items():
+            for candidate in edges_by_row[row_id]:
+                bit = column_bit[column_of(candidate)]
+                if mask & bit:
+                    continue
+                new_mask = mask | bit
+                new_score = score + candidate.score
+                if new_mask not in updated or new_score > updated[new_mask][0]:
+                    updated[new_mask] = (new_score, chosen + (candidate,))
+        best = updated
+
+    return list(max(best.values(), key=lambda value: value[0])[1])
+
+
+def _greedy_assignment(component):
+    chosen = []
+    used_files, used_transactions = set(), set()
+    for candidate in sorted(component, key=lambda c: c.score, reverse=True):
+        if candidate.file.id in used_files or candidate.transaction.id in used_transactions:
+            continue
+        chosen.append(candidate)
+        used_files.add(candidate.file.id)
+        used_transactions.add(candidate.transaction.id)
+    return chosen
+
+
+def assign_candidates(candidates):
+    """Pick at most one transaction per bill and one bill per transaction, maximizing total score"""
+    assigned = []
+    for component in _connected_components(candidates):
+        smaller_side = min(len({c.file.id for c in component}), len({c.transaction.id for c in component}))
+        if smaller_side <= EXACT_ASSIGNMENT_LIMIT:
+            assigned.extend(_exact_assignment(component))
+        else:
+            assigned.extend(_greedy_assignment(component))
+    return sorted(assigned, key=lambda c: c.score, reverse=True)
+
+
+def find_subset_sum(amounts, target, tolerance=AMOUNT_TOLERANCE_CENTS, deadline=None, max_parts=SPLIT_MATCH_MAX_PARTS):
+    """Return the indices of two or more amounts (in cents) that add up to target within tolerance.
+
+    Meet in the middle: the subset sums of each half are enumerated as a dict
+    keyed by sum (so equal sums collapse, as in the DP formulation), sums over
+    the target are pruned, and the halves are joined by binary search. The
+    closest total wins, then the fewest parts. Returns None if nothing fits.
+    Raises SplitMatchTimeout once ``deadline`` (a time.monotonic() value) passes.
+    """
+    items = [(amount, index) for index, amount in enumerate(amounts) if 0 < amount <= target + tolerance]
+    items.sort(reverse=True)
+
+    def subset_sums(part):
+        sums = {0: ()}
+        for amount, index in part:
+            if deadline is not None and time.monotonic() > deadline:
+                raise SplitMatchTimeout()
+            for subtotal, combo in list(sums.items()):
+                new_total = subtotal + amount
+                if new_total > target + tolerance or len(combo) >= max_parts:
+                    continue
+                if new_total not in sums or len(combo) + 1 < len(sums[new_total]):
+                    sums[new_total] = combo + (index,)
+        return sums
+
+    half = len(items) // 2
+    left = subset_sums(items[:half])
+    right = subset_sums(items[half:])
+    right_totals = sorted(right)
+
+    best = None
+    for left_total, left_combo in left.items():
+        if deadline is not None and time.monotonic() > deadline:
+            raise SplitMatchTimeout()
+        low = bisect_left(right_totals, target - tolerance - left_total)
+        high = bisect_right(right_totals, target + tolerance - left_total)
+        for right_total in right_totals[low:high]:
+            combo = left_combo + right[right_total]
+            if len(combo) < 2 or len(combo) > max_parts:
+                continue
+            key = (abs(left_total + right_total - target), len(combo))
+            if best is None or key < best[0]:
+                best = (key, combo)
+
+    return sorted(best[1]) if best else None
+
+
+def score_split(context, bills, transactions, total_diff_cents):
+    """Score a split match by averaging the pair signals over every bill/charge in it"""
+    amount_score = 1.0 if total_diff_cents == 0 else 0.8
+    date_scores, card_holder_scores = [], []
+    for file_obj, bill_date in bills:
+        for transaction in transactions:
+            if bill_date:
+                date_scores.append(max(0.0, 1 - abs((transaction.date - bill_date).days) / MATCH_DATE_WINDOW_DAYS))
+            else:
+                date_scores.append(0.5)
+            card_holder_scores.append(context.card_holder_score(file_obj, transaction))
+    date_score = sum(date_scores) / len(date_scores)
+    card_holder_score = sum(card_holder_scores) / len(card_holder_scores)
+
+    # Split matches always require the vendor to appear on the charge
+    score = (
+        AMOUNT_WEIGHT * amount_score +
+        DATE_WEIGHT * date_score +
+        VENDOR_WEIGHT * 1.0 +
+        CARD_HOLDER_WEIGHT * card_holder_score
+    )
+    details = {
+        'amount': amount_score,
+        'date': round(date_score, 3),
+        'vendor': 1.0,
+        'card_holder': round(card_holder_score, 3),
+        'split': f'{len(bills)} bill(s) / {len(transactions)} charge(s)',
+    }
+    return round(score, 4), details
+
+
+def split_candidates(context, file_objs, bill_date_map, transactions):
+    """Build one Candidate per bill/charge pair of a split match, all sharing a group key"""
+    bills = [(file_obj, bill_date_map[file_obj.id]) for file_obj in file_objs]
+    bill_total = sum(to_cents(file_obj.amount) for file_obj in file_objs)
+    transaction_total = sum(to_cents(transaction.amount) for transaction in transactions)
+    score, details = score_split(context, bills, transactions, abs(bill_total - transaction_total))
+    group_key = uuid.uuid4().hex
+    return [
+        Candidate(file_obj, transaction, score, details, group_key)
+        for file_obj in file_objs
+        for transaction in transactions
+    ]
+
+
+def find_split_matches(context, bills, transactions, vendor=None, date_window_days=MATCH_DATE_WINDOW_DAYS, time_budget=SPLIT_MATCH_TIME_BUDGET):
+    """Find charges that pay several bills of one vendor, and bills paid by several charges.
+
+    Only bills and charges of the same vendor (the vendor name or an alias
+    appears on the charge) within ``date_window_days`` of each other are
+    combined. Returns (candidates, timed_out); each bill and charge is used
+    in at most one split match.
+    """
+    deadline = time.monotonic() + time_budget
+    matches = []
+    used_files, used_transactions = set(), set()
+
+    bills_by_vendor = defaultdict(list)
+    bill_dates = {}
+    for file_obj in bills:
+        if file_obj.amount is None or file_obj.amount <= 0:
+            continue
+        normalized_vendor = normalize_text(file_obj.vendor)
+        if not normalized_vendor or (vendor and normalized_vendor != normalize_text(vendor)):
+            continue
+        bills_by_vendor[normalized_vendor].append(file_obj)
+        bill_dates[file_obj.id] = file_obj.invoice_date
+
+    def within_window(bill_date, transaction):
+        return bill_date is None or abs((transaction.date - bill_date).days) <= date_window_days
+
+    def nearest(items, anchor_date, item_date):
+        # Keep the search bounded: only the items closest in date to the target are tried
+        return sorted(items, key=lambda item: abs((item_date(item) - anchor_date).days) if anchor_date and item_date(item) else 0)[:SPLIT_MATCH_MAX_ITEMS]
+
+    try:
+        for normalized_vendor, vendor_bills in bills_by_vendor.items():
+            vendor_transactions = [
+                transaction for transaction in transactions
+                if context.vendor_score(normalized_vendor, transaction.description) == 1.0
+            ]
+            if not vendor_transactions:
+                continue
+
+            # One charge covering several bills
+            for transaction in vendor_transactions:
+                if transaction.id in used_transactions:
+                    continue
+                pool = [
+                    file_obj for file_obj in vendor_bills
+                    if file_obj.id not in used_files and within_window(bill_dates[file_obj.id], transaction)
+                ]
+                pool = nearest(pool, transaction.date, lambda file_obj: bill_dates[file_obj.id])
+                if len(pool) < 2:
+                    continue
+                combo = find_subset_sum(
+                    [to_cents(file_obj.amount) for file_obj in pool],
+                    to_cents(transaction.amount),
+                    deadline=deadline
+                )
+                if combo:
+                    file_objs = [pool[i] for i in combo]
+                    matches.extend(split_candidates(context, file_objs, bill_dates, [transaction]))
+                    used_transactions.add(transaction.id)
+                    used_files.update(file_obj.id for file_obj in file_objs)
+
+            # One bill paid by several charges
+            for file_obj in vendor_bills:
+                if file_obj.id in used_files:
+                    continue
+                bill_date = bill_dates[file_obj.id]
+                pool = [
+                    transaction for transaction in vendor_transactions
+                    if transaction.id not in used_transactions and within_window(bill_date, transaction)
+                ]
+                pool = nearest(pool, bill_date, lambda transaction: transaction.date)
+                if len(pool) < 2:
+                    continue
+                combo = find_subset_sum(
+                    [to_cents(transaction.amount) for transaction in pool],
+                    to_cents(file_obj.amount),
+                    deadline=deadline
+                )
+                if combo:
+                    split_transactions = [pool[i] for i in combo]
+                    matches.extend(split_candidates(context, [file_obj], bill_dates, split_transactions))
+                    used_files.add(file_obj.id)
+                    used_transactions.update(transaction.id for transaction in split_transactions)
+    except SplitMatchTimeout:
+        return [c for c in matches if c.score >= MIN_SUGGESTION_SCORE], True
+
+    return [c for c in matches if c.score >= MIN_SUGGESTION_SCORE], False
+
+
+def open_bills():
+    """Approved bills that are not yet linked to a transaction or paid by check"""
+    return File.objects.filter(
+        approval_status='approved',
+        attached_transaction__isnull=True,
+        payments__isnull=True,
+        amount__gt=0
+    ).exclude(is_paid=True, payment_method='check')
+
+
+def unmatched_transactions():
+    """Charges that are not matched to any bill yet"""
+    return Transaction.objects.filter(
+        status='UNMATCHED',
+        transaction_type='CHARGE',
+        attached_files__isnull=True,
+        bill_payments__isnull=True
+    )
+
+
+def accept_candidates(accepted):
+    """Link each accepted transaction to its bill using set-based writes.
+
+    Every pair becomes a BillPayment for the smaller of the bill and charge
+    amounts. ``File.attached_transaction`` points at the bill's largest
+    charge so single-transaction views keep working for split payments.
+    """
+    if not accepted:
+        return
+    files = {}
+    payments = []
+    for candidate in sorted(accepted, key=lambda c: c.transaction.amount, reverse=True):
+        if candidate.file.id not in files:
+            candidate.file.attached_transaction = candidate.transaction
+            files[candidate.file.id] = candidate.file
+        bill_amount = candidate.file.amount
+        amount = candidate.transaction.amount if bill_amount is None else min(bill_amount, candidate.transaction.amount)
+        payments.append(BillPayment(file=candidate.file, transaction=candidate.transaction, amount=amount))
+    File.objects.bulk_update(list(files.values()), ['attached_transaction'])
+    BillPayment.objects.bulk_create(payments, ignore_conflicts=True)
+    Transaction.objects.filter(id__in=[c.transaction.id for c in accepted]).update(status='MATCHED')
+    BillSummary.refresh_files(files.keys())
+    files_changed.send(sender=File, kind='matched', file_ids=files.keys())
+
+
+def group_candidates(candidates):
+    """Group candidates into acceptance units: each split match is one unit, other pairs are their own"""
+    units = {}
+    for candidate in candidates:
+        key = candidate.group_key or (candidate.file.id, candidate.transaction.id)
+        units.setdefault(key, []).append(candidate)
+    return list(units.values())
+
+
+def save_suggestions(suggestions, accepted, replace_pending=False):
+    """Store suggestions and apply the accepted ones in one transaction"""
+    accepted_pairs = {(c.file.id, c.transaction.id) for c in accepted}
+    with db_transaction.atomic():
+        if replace_pending:
+            MatchSuggestion.objects.filter(status='suggested').delete()
+        MatchSuggestion.objects.bulk_create([
+            MatchSuggestion(
+                file=c.file,
+                transaction=c.transaction,
+                score=c.score,
+                details=c.details,
+                group_key=c.group_key,
+                status='accepted' if (c.file.id, c.transaction.id) in accepted_pairs else 'suggested'
+            )
+            for c in suggestions
+        ], ignore_conflicts=True)
+        accept_candidates(accepted)
+
+
+def run_matching(auto_accept_threshold=None, dry_run=False, include_splits=False, vendor=None):
+    """Match every open bill against unmatched transactions in one pass.
+
+    Replaces previous pending suggestions with the new ranked set. When
+    ``auto_accept_threshold`` is given, suggestions scoring at or above it are
+    applied straight away. With ``include_splits`` the bills and charges left
+    unassigned are also searched for split payments, optionally for one
+    ``vendor`` only.
+    """
+    started = time.monotonic()
+
+    bills = list(open_bills())
+    transactions = list(unmatched_transactions())
+
+    context = MatchContext()
+    candidates = find_candidates(context, bills, build_amount_index(transactions))
+    suggestions = assign_candidates(candidates)
+
+    split_count = 0
+    timed_out = False
+    if include_splits:
+        assigned_files = {c.file.id for c in suggestions}
+        assigned_transactions = {c.transaction.id for c in suggestions}
+        split_suggestions, timed_out = find_split_matches(
+            context,
+            [file_obj for file_obj in bills if file_obj.id not in assigned_files],
+            [transaction for transaction in transactions if transaction.id not in assigned_transactions],
+            vendor=vendor
+        )
+        split_count = len({c.group_key for c in split_suggestions})
+        suggestions = sorted(suggestions + split_suggestions, key=lambda c: c.score, reverse=True)
+
+    accepted = []
+    if auto_accept_threshold is not None:
+        accepted = [c for c in suggestions if c.score >= auto_accept_threshold]
+
+    if not dry_run:
+        save_suggestions(suggestions, accepted, replace_pending=True)
+
+    return MatchResult(
+        suggestions=suggestions,
+        accepted_count=len(group_candidates(accepted)),
+        bill_count=len(bills),
+        transaction_count=len(transactions),
+        elapsed_seconds=time.monotonic() - started,
+        split_count=split_count,
+        timed_out=timed_out
+    )
+
+
+def match_new_transactions(transaction_ids, auto_accept_threshold=None):
+    """Match just-imported transactions against the open bills in their amount buckets.
+
+    Only bills whose total falls in one of the new transactions' buckets are
+    loaded, so the cost follows the number of new transactions rather than
+    the number of bills. Existing suggestions are left alone; new ones are
+    added, and those at or above ``auto_accept_threshold`` are applied.
+    """
+    started = time.monotonic()
+
+    transactions = list(unmatched_transactions().filter(id__in=transaction_ids))
+    if not transactions:
+        return MatchResult([], 0, 0, 0, time.monotonic() - started)
+
+    amount_index = build_amount_index(transactions)
+    probe_cents = {
+        cents + offset
+        for cents in amount_index
+        for offset in range(-AMOUNT_TOLERANCE_CENTS, AMOUNT_TOLERANCE_CENTS + 1)
+    }
+    # Bills outside the scoring date window can never match, so leave them in the database
+    window = timedelta(days=MATCH_DATE_WINDOW_DAYS * 2)
+    bills = list(open_bills().filter(
+        models.Q(invoice_date__isnull=True) |
+        models.Q(invoice_date__range=(min(t.date for t in transactions) - window, max(t.date for t in transactions) + window)),
+        amount__in=[Decimal(cents) / 100 for cents in probe_cents]
+    ))
+
+    context = MatchContext(transaction_ids=[transaction.id for transaction in transactions], bills=bills)
+    suggestions = assign_candidates(find_candidates(context, bills, amount_index))
+
+    accepted = []
+    if auto_accept_threshold is not None:
+        accepted = [c for c in suggestions if c.score >= auto_accept_threshold]
+
+    if suggestions:
+        save_suggestions(suggestions, accepted)
+
+    return MatchResult(
+        suggestions=suggestions,
+        accepted_count=len(accepted),
+        bill_count=len(bills),
+        transaction_count=len(transactions),
+        elapsed_seconds=time.monotonic() - started
+    )
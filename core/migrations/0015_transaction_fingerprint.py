@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:29
+
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """Fingerprint existing rows so re-uploading an old statement is detected"""
+    Transaction = apps.get_model('core', 'Transaction')
+    
+    seen = {}
+    to_update = []
+    for transaction in Transaction.objects.order_by('id').iterator():
+        parts = [
+            transaction.date.isoformat(),
+            str(Decimal(transaction.amount).quantize(Decimal('0.01'))),
+            ' '.join((transaction.description or '').split()).upper(),
+            ' '.join((transaction.card_holder or '').split()).upper(),
+            (transaction.transaction_type or '').upper(),
+        ]
+        key = '|'.join(parts)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        
+        payload = '|'.join(parts + [str(occurrence)])
+        transaction.fingerprint = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        to_update.append(transaction)
+    
+    Transaction.objects.bulk_update(to_update, ['fingerprint'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alter_class_options_class_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_started_at(apps, schema_editor):
+    """Imports recorded so far ran inline, so they were queued when they started"""
+    ImportBatch = apps.get_model('core', 'ImportBatch')
+    ImportBatch.objects.update(created_at=models.F('started_at'), processed_rows=models.F('total_rows'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_importbatch'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='importbatch',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddField(
+            model_name='importbatch',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='importbatch',
+            name='processed_rows',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importbatch',
+            name='source_file',
+            field=models.FileField(blank=True, help_text='Uploaded CSV the import reads from', upload_to='imports/'),
+        ),
+        migrations.AlterField(
+            model_name='importbatch',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='importbatch',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('rolled_back', 'Rolled Back')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.RunPython(copy_started_at, migrations.RunPython.noop),
+    ]
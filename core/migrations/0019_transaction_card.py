@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_transaction_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='card_last4',
+            field=models.CharField(blank=True, db_index=True, max_length=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='card_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='card_transactions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
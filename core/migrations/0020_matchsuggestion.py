@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_transaction_card'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Overall confidence between 0 and 1')),
+                ('details', models.JSONField(blank=True, default=dict, help_text='Per-signal scores that make up the total')),
+                ('status', models.CharField(choices=[('suggested', 'Suggested'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], default='suggested', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_suggestions', to='core.file')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_suggestions', to='core.transaction')),
+            ],
+            options={
+                'ordering': ['-score', '-created_at'],
+                'indexes': [models.Index(fields=['status', '-score'], name='match_status_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('file', 'transaction'), name='unique_match_suggestion')],
+            },
+        ),
+    ]
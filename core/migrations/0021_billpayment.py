@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:42
+
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_attached_transactions(apps, schema_editor):
+    """Create a payment link for every bill already attached to a transaction"""
+    File = apps.get_model('core', 'File')
+    BillPayment = apps.get_model('core', 'BillPayment')
+    
+    payments = []
+    for file_obj in File.objects.filter(attached_transaction__isnull=False).select_related('attached_transaction').iterator():
+        amount = file_obj.attached_transaction.amount
+        try:
+            amount = min(amount, Decimal((file_obj.total or '').replace('$', '').replace(',', '').strip()))
+        except (InvalidOperation, ValueError):
+            pass
+        payments.append(BillPayment(file=file_obj, transaction=file_obj.attached_transaction, amount=amount))
+    
+    BillPayment.objects.bulk_create(payments, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_matchsuggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchsuggestion',
+            name='group_key',
+            field=models.CharField(blank=True, db_index=True, help_text='Shared by the pairs of a split match, which are accepted or rejected together', max_length=32),
+        ),
+        migrations.CreateModel(
+            name='BillPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Portion of the transaction applied to this bill', max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='core.file')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bill_payments', to='core.transaction')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='transactions',
+            field=models.ManyToManyField(blank=True, related_name='bills', through='core.BillPayment', to='core.transaction'),
+        ),
+        migrations.AddConstraint(
+            model_name='billpayment',
+            constraint=models.UniqueConstraint(fields=('file', 'transaction'), name='unique_bill_payment'),
+        ),
+        migrations.RunPython(link_attached_transactions, migrations.RunPython.noop),
+    ]
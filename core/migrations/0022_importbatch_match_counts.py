@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_billpayment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importbatch',
+            name='matched_count',
+            field=models.IntegerField(default=0, help_text='Transactions matched to a bill automatically'),
+        ),
+        migrations.AddField(
+            model_name='importbatch',
+            name='suggested_count',
+            field=models.IntegerField(default=0, help_text='Bill match suggestions created for review'),
+        ),
+    ]
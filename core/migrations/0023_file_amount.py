@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:46
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+
+def backfill_amounts(apps, schema_editor):
+    """Parse the display total of existing files into the numeric amount column"""
+    File = apps.get_model('core', 'File')
+    
+    to_update = []
+    for file_obj in File.objects.only('id', 'total').iterator():
+        try:
+            amount = Decimal((file_obj.total or '').replace('$', '').replace(',', '').strip())
+        except (InvalidOperation, ValueError):
+            continue
+        if not amount.is_finite() or abs(amount) >= 10 ** 10:
+            continue
+        file_obj.amount = amount.quantize(Decimal('0.01'))
+        to_update.append(file_obj)
+    
+    File.objects.bulk_update(to_update, ['amount'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_importbatch_match_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='amount',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, help_text='Numeric value of total, for filtering, sorting and matching', max_digits=12, null=True),
+        ),
+        migrations.RunPython(backfill_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_file_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='invoice_date',
+            field=models.DateField(blank=True, db_index=True, help_text='Parsed value of date, for range queries and matching', null=True),
+        ),
+    ]
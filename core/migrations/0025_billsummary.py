@@ -0,0 +1,107 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def size_display(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
+
+
+def build_bill_summaries(apps, schema_editor):
+    """Create a summary row for every bill that is already approved"""
+    File = apps.get_model('core', 'File')
+    BillSummary = apps.get_model('core', 'BillSummary')
+    
+    files = File.objects.filter(approval_status='approved').exclude(
+        project='', vendor='', invoice_number='', total='$0.00'
+    ).select_related('attached_transaction', 'selected_class')
+    
+    rows = []
+    for file_obj in files.iterator():
+        transaction = file_obj.attached_transaction
+        matched_transaction = None
+        if transaction:
+            amount = f"+${transaction.amount:,.2f}" if transaction.amount >= 0 else f"-${abs(transaction.amount):,.2f}"
+            matched_transaction = {
+                'id': transaction.id,
+                'date': transaction.date.strftime('%m/%d/%Y'),
+                'amount': amount,
+                'description': transaction.description,
+                'card_holder': transaction.card_holder,
+                'status': transaction.status
+            }
+        selected_class = file_obj.selected_class
+        rows.append(BillSummary(
+            file=file_obj,
+            name=file_obj.name,
+            file_path=file_obj.file.name if file_obj.file else '',
+            file_type=file_obj.file_type,
+            file_size_display=size_display(file_obj.size),
+            uploaded_at=file_obj.uploaded_at,
+            description=file_obj.description or '',
+            project=file_obj.project or '',
+            vendor=file_obj.vendor or '',
+            date=file_obj.date or '',
+            invoice_number=file_obj.invoice_number or '',
+            total=file_obj.total or '$0.00',
+            amount=file_obj.amount,
+            invoice_date=file_obj.invoice_date,
+            is_paid=file_obj.is_paid,
+            payment_method=file_obj.payment_method or '',
+            paid_at=file_obj.paid_at,
+            is_matched=transaction is not None,
+            matched_transaction=matched_transaction,
+            selected_class=selected_class,
+            class_name=selected_class.name if selected_class else '',
+            class_color=selected_class.color if selected_class else ''
+        ))
+    
+    BillSummary.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_file_invoice_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillSummary',
+            fields=[
+                ('file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='bill_summary', serialize=False, to='core.file')),
+                ('name', models.CharField(max_length=255)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('file_type', models.CharField(blank=True, max_length=50)),
+                ('file_size_display', models.CharField(blank=True, max_length=20)),
+                ('uploaded_at', models.DateTimeField()),
+                ('description', models.TextField(blank=True)),
+                ('project', models.CharField(blank=True, max_length=255)),
+                ('vendor', models.CharField(blank=True, max_length=255)),
+                ('date', models.CharField(blank=True, max_length=20)),
+                ('invoice_number', models.CharField(blank=True, max_length=50)),
+                ('total', models.CharField(blank=True, max_length=20)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('invoice_date', models.DateField(blank=True, null=True)),
+                ('is_paid', models.BooleanField(default=False)),
+                ('payment_method', models.CharField(blank=True, max_length=20)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('is_matched', models.BooleanField(default=False)),
+                ('matched_transaction', models.JSONField(blank=True, help_text='Date, amount, description and card holder of the attached transaction', null=True)),
+                ('class_name', models.CharField(blank=True, max_length=100)),
+                ('class_color', models.CharField(blank=True, max_length=7)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('selected_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.class')),
+            ],
+            options={
+                'ordering': ['-uploaded_at'],
+                'indexes': [models.Index(fields=['-uploaded_at', 'file'], name='bill_uploaded_idx'), models.Index(fields=['is_paid', '-uploaded_at'], name='bill_paid_uploaded_idx'), models.Index(fields=['is_matched', '-uploaded_at'], name='bill_matched_uploaded_idx'), models.Index(fields=['amount'], name='bill_amount_idx'), models.Index(fields=['invoice_date'], name='bill_invoice_date_idx'), models.Index(fields=['vendor'], name='bill_vendor_idx')],
+            },
+        ),
+        migrations.RunPython(build_bill_summaries, migrations.RunPython.noop),
+    ]
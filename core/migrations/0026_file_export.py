@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_billsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='export_batch',
+            field=models.CharField(blank=True, db_index=True, help_text='Export download this bill was included in', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='exported_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
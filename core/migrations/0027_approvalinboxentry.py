@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def match_project(name, projects):
+    """Same matching as Project.match_name: exact, case-insensitive, then partial name or alias"""
+    if not name or not name.strip():
+        return None
+    for project in projects:
+        if project.name == name:
+            return project
+    lowered = name.lower()
+    for project in projects:
+        if project.name.lower() == lowered:
+            return project
+    for project in projects:
+        if lowered in project.name.lower() or any(lowered in str(alias).lower() for alias in project.aliases or []):
+            return project
+    return None
+
+
+def build_inboxes(apps, schema_editor):
+    """Fill the approval inboxes from the files that are already pending"""
+    File = apps.get_model('core', 'File')
+    Project = apps.get_model('core', 'Project')
+    ApprovalInboxEntry = apps.get_model('core', 'ApprovalInboxEntry')
+    
+    projects = list(Project.objects.order_by('-last_used', '-updated_at', 'name'))
+    superintendent_ids = {}
+    for project_id, user_id in Project.superintendents.through.objects.values_list('project_id', 'user_id'):
+        superintendent_ids.setdefault(project_id, []).append(user_id)
+    
+    files = File.objects.filter(approval_status='pending').exclude(
+        project='', vendor='', invoice_number='', total='$0.00'
+    )
+    entries = []
+    for file_id, project_name in files.values_list('id', 'project'):
+        project = match_project(project_name, projects)
+        if project:
+            entries.extend(
+                ApprovalInboxEntry(user_id=user_id, file_id=file_id, project_id=project.id)
+                for user_id in superintendent_ids.get(project.id, [])
+            )
+    ApprovalInboxEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_file_export'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApprovalInboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='core.file')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approval_inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'file'), name='unique_inbox_entry')],
+            },
+        ),
+        migrations.RunPython(build_inboxes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def match_by_name(name, candidates, partial=False):
+    """Same resolution as core.models.match_by_name"""
+    if not name or not name.strip():
+        return None
+    for candidate in candidates:
+        if candidate.name == name:
+            return candidate
+    lowered = name.strip().lower()
+    for candidate in candidates:
+        if candidate.name.lower() == lowered or any(str(alias).strip().lower() == lowered for alias in candidate.aliases or []):
+            return candidate
+    if partial:
+        for candidate in candidates:
+            if lowered in candidate.name.lower() or any(lowered in str(alias).lower() for alias in candidate.aliases or []):
+                return candidate
+    return None
+
+
+def resolve_references(apps, schema_editor):
+    """Point existing files at the projects and vendors their text refers to"""
+    File = apps.get_model('core', 'File')
+    Project = apps.get_model('core', 'Project')
+    Vendor = apps.get_model('core', 'Vendor')
+    
+    projects = list(Project.objects.order_by('-last_used', '-updated_at', 'name'))
+    vendors = list(Vendor.objects.order_by('-last_used', '-updated_at', 'name'))
+    changed = []
+    for file_obj in File.objects.only('id', 'project', 'vendor').iterator():
+        project = match_by_name(file_obj.project, projects, partial=True)
+        vendor = match_by_name(file_obj.vendor, vendors)
+        if project or vendor:
+            file_obj.project_ref_id = project.id if project else None
+            file_obj.vendor_ref_id = vendor.id if vendor else None
+            changed.append(file_obj)
+    File.objects.bulk_update(changed, ['project_ref', 'vendor_ref'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_approvalinboxentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='project_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='core.project'),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='vendor_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='core.vendor'),
+        ),
+        migrations.RunPython(resolve_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_file_references'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('updated', 'Updated'), ('pending', 'Pending approval'), ('approved', 'Approved'), ('on_hold', 'On hold'), ('rejected', 'Rejected'), ('sent_back', 'Sent back for review'), ('matched', 'Matched'), ('unmatched', 'Unmatched'), ('paid', 'Paid'), ('deleted', 'Deleted')], max_length=20)),
+                ('file_id', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
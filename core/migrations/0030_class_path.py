@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:06
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    """Give every existing class its materialized path and depth, parents first"""
+    Class = apps.get_model('core', 'Class')
+    
+    parents = dict(Class.objects.values_list('id', 'parent_id'))
+    paths = {}
+    
+    def path_for(class_id):
+        if class_id not in paths:
+            parent_id = parents[class_id]
+            paths[class_id] = (path_for(parent_id) if parent_id else '') + f"{class_id:08d}/"
+        return paths[class_id]
+    
+    classes = list(Class.objects.all())
+    for class_obj in classes:
+        class_obj.path = path_for(class_obj.id)
+        class_obj.depth = class_obj.path.count('/') - 1
+    Class.objects.bulk_update(classes, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_changeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Number of ancestors; 0 for top-level classes'),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def count_approved_classes(apps, schema_editor):
+    """Seed suggestions from the classes of files approved so far"""
+    File = apps.get_model('core', 'File')
+    ClassSuggestion = apps.get_model('core', 'ClassSuggestion')
+    
+    rows = File.objects.filter(
+        approval_status='approved', vendor_ref__isnull=False, selected_class__isnull=False
+    ).values('vendor_ref_id', 'project_ref_id', 'selected_class_id').annotate(
+        total=models.Count('id'), latest=models.Max('approved_at')
+    ).order_by()
+    ClassSuggestion.objects.bulk_create([
+        ClassSuggestion(
+            vendor_id=row['vendor_ref_id'],
+            project_id=row['project_ref_id'],
+            selected_class_id=row['selected_class_id'],
+            count=row['total'],
+            last_used=row['latest'] or timezone.now()
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_class_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_used', models.DateTimeField()),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+                ('selected_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.class')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_suggestions', to='core.vendor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'project', 'selected_class'), name='unique_class_suggestion')],
+            },
+        ),
+        migrations.RunPython(count_approved_classes, migrations.RunPython.noop),
+    ]
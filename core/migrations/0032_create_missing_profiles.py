@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:15
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    """Give every existing user a profile; new users get one from a post_save signal"""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('core', 'UserProfile')
+
+    UserProfile.objects.bulk_create([
+        UserProfile(user_id=user_id)
+        for user_id in User.objects.filter(profile__isnull=True).values_list('id', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_classsuggestion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
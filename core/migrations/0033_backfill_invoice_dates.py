@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:10
+
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import migrations
+
+# File.DATE_FORMATS when invoice_date was added
+DATE_FORMATS = ['%m-%d-%Y', '%m-%d-%y', '%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%m.%d.%Y', '%m.%d.%y', '%b %d, %Y', '%B %d, %Y']
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def backfill_invoice_dates(apps, schema_editor):
+    """Parse the date text of files added before invoice_date existed, and copy it to their bill summaries"""
+    File = apps.get_model('core', 'File')
+    BillSummary = apps.get_model('core', 'BillSummary')
+    
+    to_update = []
+    for file_obj in File.objects.filter(invoice_date__isnull=True).exclude(date='').only('id', 'date').iterator():
+        invoice_date = parse_date(file_obj.date)
+        if invoice_date is not None:
+            file_obj.invoice_date = invoice_date
+            to_update.append(file_obj)
+    
+    File.objects.bulk_update(to_update, ['invoice_date'], batch_size=500)
+    file_ids_by_date = defaultdict(list)
+    for file_obj in to_update:
+        file_ids_by_date[file_obj.invoice_date].append(file_obj.id)
+    for invoice_date, file_ids in file_ids_by_date.items():
+        BillSummary.objects.filter(file_id__in=file_ids).update(invoice_date=invoice_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_create_missing_profiles'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_invoice_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:25
+
+from django.db import migrations
+
+
+def match_project(name, projects):
+    """Exact name, then a single case-insensitive name or alias match"""
+    if not name or not name.strip():
+        return None
+    for project in projects:
+        if project.name == name:
+            return project.id
+    lowered = name.strip().lower()
+    matches = [
+        project.id for project in projects
+        if project.name.lower() == lowered or any(str(alias).strip().lower() == lowered for alias in project.aliases or [])
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def resolve_projects_exactly(apps, schema_editor):
+    """Re-resolve project refs that were set by a partial name match, and recompute those files' approval inboxes"""
+    File = apps.get_model('core', 'File')
+    Project = apps.get_model('core', 'Project')
+    ApprovalInboxEntry = apps.get_model('core', 'ApprovalInboxEntry')
+    
+    projects = list(Project.objects.all())
+    changed = []
+    for file_obj in File.objects.filter(project_ref__isnull=False).only('id', 'project', 'project_ref', 'approval_status').iterator():
+        project_id = match_project(file_obj.project, projects)
+        if project_id != file_obj.project_ref_id:
+            file_obj.project_ref_id = project_id
+            changed.append(file_obj)
+    if not changed:
+        return
+    File.objects.bulk_update(changed, ['project_ref'], batch_size=500)
+    
+    superintendent_ids = {}
+    for project_id, user_id in Project.superintendents.through.objects.values_list('project_id', 'user_id'):
+        superintendent_ids.setdefault(project_id, []).append(user_id)
+    ApprovalInboxEntry.objects.filter(file_id__in=[file_obj.id for file_obj in changed]).delete()
+    ApprovalInboxEntry.objects.bulk_create([
+        ApprovalInboxEntry(user_id=user_id, file_id=file_obj.id, project_id=file_obj.project_ref_id)
+        for file_obj in changed
+        if file_obj.project_ref_id and file_obj.approval_status == 'pending'
+        for user_id in superintendent_ids.get(file_obj.project_ref_id, [])
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_backfill_invoice_dates'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_projects_exactly, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_resolve_projects_exactly'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importbatch',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress report from the running import', null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:50
+
+from django.db import migrations, models
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    """Fold duplicate vendor/class rows without a project into one, adding up their counts"""
+    ClassSuggestion = apps.get_model('core', 'ClassSuggestion')
+
+    kept = {}
+    for suggestion in ClassSuggestion.objects.filter(project__isnull=True).order_by('id'):
+        key = (suggestion.vendor_id, suggestion.selected_class_id)
+        first = kept.get(key)
+        if first is None:
+            kept[key] = suggestion
+            continue
+        first.count += suggestion.count
+        first.last_used = max(first.last_used, suggestion.last_used)
+        first.save(update_fields=['count', 'last_used'])
+        suggestion.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_import_batch_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='classsuggestion',
+            constraint=models.UniqueConstraint(condition=models.Q(('project__isnull', True)), fields=('vendor', 'selected_class'), name='unique_class_suggestion_no_project'),
+        ),
+    ]
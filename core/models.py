@@ -1,12 +1,28 @@
-from django.db import models
-from django.contrib.auth.models import User
+from django.db import models, transaction as db_transaction
+from django.contrib.auth.models import User, Group
 from django.core.validators import MinValueValidator, RegexValidator
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce, Concat, Left, Length, Lower, Substr, Trim
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
 import os
+import re
 import json
-from decimal import Decimal
+import hashlib
+from collections import Counter, defaultdict
+from decimal import Decimal, InvalidOperation
+from datetime import datetime
+
+from .bulk_upsert import upsert
+from .caching import CachedRead, bump
 
 class UserProfile(models.Model):
     """Extended user profile with card number information"""
+    CARD_MAP_CACHE_KEY = 'userprofile:card_map'
+    USER_LIST_CACHE_KEY = 'userprofile:user_list'
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     card_number = models.CharField(
         max_length=4,
@@ -32,17 +48,88 @@ class UserProfile(models.Model):
     @property
     def primary_role(self):
         """Return the user's primary role/group"""
-        groups = self.user.groups.all()
-        if groups.exists():
-            return groups.first().name
-        return 'No Role'
+        roles = self.all_roles
+        return roles[0] if roles else 'No Role'
     
     @property
     def all_roles(self):
-        """Return all user roles/groups"""
-        return [group.name for group in self.user.groups.all()]
+        """Return all user roles/groups, oldest group first; uses prefetched groups when present"""
+        return [group.name for group in sorted(self.user.groups.all(), key=lambda group: group.pk)]
+    
+    @classmethod
+    def user_list(cls):
+        """Return the cached users page payload: one dict per user with profile and roles.
+
+        Built from one query for users with their profiles plus one for their
+        groups, and dropped by invalidate_user_list() when users, profiles or
+        group memberships change.
+        """
+        user_list = cache.get(cls.USER_LIST_CACHE_KEY)
+        if user_list is None:
+            user_list = []
+            for user in User.objects.select_related('profile').prefetch_related('groups').order_by('username'):
+                profile = getattr(user, 'profile', None)
+                roles = [group.name for group in sorted(user.groups.all(), key=lambda group: group.pk)]
+                user_list.append({
+                    'id': user.id,
+                    'username': user.username,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name,
+                    'full_name': user.get_full_name(),
+                    'email': user.email,
+                    'is_staff': user.is_staff,
+                    'is_superuser': user.is_superuser,
+                    'is_active': user.is_active,
+                    'date_joined': user.date_joined.strftime('%Y-%m-%d'),
+                    'last_login': user.last_login,
+                    'card_number': profile.card_number or '' if profile else '',
+                    'profile_id': profile.id if profile else None,
+                    'primary_role': roles[0] if roles else 'No Role',
+                    'all_roles': roles
+                })
+            cache.set(cls.USER_LIST_CACHE_KEY, user_list, 3600)
+        return user_list
+    
+    @classmethod
+    def invalidate_user_list(cls):
+        cache.delete(cls.USER_LIST_CACHE_KEY)
+    
+    @classmethod
+    def card_user_map(cls):
+        """Return a cached {card_number: user_id} map of every profile with a card"""
+        card_map = cache.get(cls.CARD_MAP_CACHE_KEY)
+        if card_map is None:
+            card_map = dict(
+                cls.objects.exclude(card_number__isnull=True).exclude(card_number='')
+                .values_list('card_number', 'user_id')
+            )
+            cache.set(cls.CARD_MAP_CACHE_KEY, card_map, 3600)
+        return card_map
+    
+    @classmethod
+    def invalidate_card_map(cls):
+        """Drop the cached card map after card numbers or users change"""
+        cache.delete(cls.CARD_MAP_CACHE_KEY)
+
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    """Every user has a profile, so read paths never have to create one"""
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+@receiver([post_save, post_delete], sender=Group)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_list(sender, **kwargs):
+    UserProfile.invalidate_user_list()
 
 class File(models.Model):
+    # Invoice date formats seen in file names, e.g. 08-26-2025 and 07-28-25
+    DATE_FORMATS = ['%m-%d-%Y', '%m-%d-%y', '%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%m.%d.%Y', '%m.%d.%y', '%b %d, %Y', '%B %d, %Y']
+    
     name = models.CharField(max_length=255)
     file = models.FileField(upload_to='files/')
     file_type = models.CharField(max_length=50, blank=True)
@@ -57,14 +144,26 @@ class File(models.Model):
     date = models.CharField(max_length=20, blank=True)
     invoice_number = models.CharField(max_length=50, blank=True)
     total = models.CharField(max_length=20, blank=True, default='$0.00')
+    amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, db_index=True, help_text="Numeric value of total, for filtering, sorting and matching")
+    invoice_date = models.DateField(null=True, blank=True, db_index=True, help_text="Parsed value of date, for range queries and matching")
     
     # Payment tracking
     is_paid = models.BooleanField(default=False)
     payment_method = models.CharField(max_length=20, blank=True)  # 'check' or 'credit_card'
     paid_at = models.DateTimeField(null=True, blank=True)
     
+    # Project and vendor records the free-text fields above resolve to
+    project_ref = models.ForeignKey('Project', on_delete=models.SET_NULL, null=True, blank=True, related_name='files')
+    vendor_ref = models.ForeignKey('Vendor', on_delete=models.SET_NULL, null=True, blank=True, related_name='files')
+    
+    # QuickBooks export
+    exported_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    export_batch = models.CharField(max_length=32, blank=True, db_index=True, help_text="Export download this bill was included in")
+    
     # Transaction attachment
     attached_transaction = models.ForeignKey('Transaction', on_delete=models.SET_NULL, null=True, blank=True, related_name='attached_files')
+    # Every transaction paying this bill; a bill can be split across charges and a charge can cover several bills
+    transactions = models.ManyToManyField('Transaction', through='BillPayment', blank=True, related_name='bills')
     
     # Approval workflow
     approval_status = models.CharField(
@@ -98,6 +197,84 @@ class File(models.Model):
             self.file_type = ext.lower() if ext else 'unknown'
         super().save(*args, **kwargs)
     
+    def resolve_references(self, projects=None, vendors=None):
+        """Point project_ref and vendor_ref at the records the project and vendor text refer to"""
+        self.project_ref = Project.match_name(self.project, projects)
+        self.vendor_ref = Vendor.match_name(self.vendor, vendors)
+    
+    @classmethod
+    def resolve_references_for_names(cls, field, names, ref=None):
+        """Re-resolve only the files a project or vendor change can affect, returning their ids.
+
+        field is 'project' or 'vendor'; names are the record's names and
+        aliases from before and after the change. Files whose text matches
+        one of them case-insensitively, plus the files pointing at ref, are
+        re-resolved; no other file's resolution can change.
+        """
+        keys = {str(name).strip().lower() for name in names if name and str(name).strip()}
+        query = models.Q(reference_key__in=keys)
+        if ref is not None:
+            query |= models.Q(**{f'{field}_ref': ref})
+        file_ids = list(cls.objects.annotate(reference_key=Lower(Trim(field))).filter(query).values_list('id', flat=True))
+        if file_ids:
+            cls.resolve_all_references(cls.objects.filter(id__in=file_ids))
+        return file_ids
+    
+    @classmethod
+    def resolve_all_references(cls, files=None, batch_size=500):
+        """Re-resolve project_ref and vendor_ref for many files, saving only the ones that changed.
+
+        Returns (updated_count, unresolved) where unresolved holds a Counter
+        of the project and vendor strings that matched no record.
+        """
+        if files is None:
+            files = cls.objects.all()
+        projects = list(Project.objects.all())
+        vendors = list(Vendor.objects.all())
+        
+        updated_count = 0
+        unresolved = {'project': Counter(), 'vendor': Counter()}
+        changed = []
+        for file_obj in files.only('id', 'project', 'vendor', 'project_ref', 'vendor_ref').iterator(chunk_size=batch_size):
+            old_refs = (file_obj.project_ref_id, file_obj.vendor_ref_id)
+            file_obj.resolve_references(projects, vendors)
+            if file_obj.project and not file_obj.project_ref_id:
+                unresolved['project'][file_obj.project] += 1
+            if file_obj.vendor and not file_obj.vendor_ref_id:
+                unresolved['vendor'][file_obj.vendor] += 1
+            if (file_obj.project_ref_id, file_obj.vendor_ref_id) != old_refs:
+                changed.append(file_obj)
+            if len(changed) >= batch_size:
+                cls.objects.bulk_update(changed, ['project_ref', 'vendor_ref'])
+                updated_count += len(changed)
+                changed = []
+        if changed:
+            cls.objects.bulk_update(changed, ['project_ref', 'vendor_ref'])
+            updated_count += len(changed)
+        return updated_count, unresolved
+    
+    @classmethod
+    def parse_date(cls, value):
+        """Parse an invoice date in any of the known formats, or None if it is not recognized"""
+        value = (value or '').strip()
+        for date_format in cls.DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        return None
+    
+    @staticmethod
+    def parse_amount(total):
+        """Parse a display total like '$1,234.56' into a Decimal, or None if it is not a number"""
+        try:
+            amount = Decimal((total or '').replace('$', '').replace(',', '').strip())
+        except (InvalidOperation, ValueError):
+            return None
+        if not amount.is_finite() or abs(amount) >= 10 ** 10:
+            return None
+        return amount.quantize(Decimal('0.01'))
+    
     @property
     def file_size_display(self):
         """Return human readable file size"""
@@ -108,7 +285,29 @@ class File(models.Model):
             size /= 1024.0
         return f"{size:.1f} TB"
 
+def match_by_name(name, candidates):
+    """Find the project or vendor a free-text name refers to.
+
+    Tries an exact name match, then a case-insensitive name or alias match.
+    Returns None when the text matches nothing, or when the case-insensitive
+    step matches more than one candidate, rather than guessing.
+    """
+    if not name or not name.strip():
+        return None
+    for candidate in candidates:
+        if candidate.name == name:
+            return candidate
+    lowered = name.strip().lower()
+    matches = [
+        candidate for candidate in candidates
+        if candidate.name.lower() == lowered or any(str(alias).strip().lower() == lowered for alias in candidate.aliases or [])
+    ]
+    return matches[0] if len(matches) == 1 else None
+
 class Project(models.Model):
+    # Fields import_from_json reads from each record
+    IMPORT_FIELDS = ['address', 'aliases', 'builders_fee', 'usage_count']
+    
     name = models.CharField(max_length=255, unique=True)
     address = models.CharField(max_length=255, blank=True)
     aliases = models.JSONField(default=list, blank=True)
@@ -133,41 +332,43 @@ class Project(models.Model):
         return self.superintendents.all()
     
     @classmethod
-    def import_from_json(cls, json_file_path):
-        """Import projects from JSON file"""
+    def match_name(cls, name, projects=None):
+        """Find the project a file's project text refers to by exact name or alias.
+
+        project_ref decides which superintendents may approve a file and the
+        address on its bill number, so text that only partly matches a
+        project is left unresolved. Pass a list of projects to match many
+        names without querying for each.
+        """
+        if projects is None:
+            projects = list(cls.objects.all())
+        return match_by_name(name, projects)
+    
+    @classmethod
+    def import_from_json(cls, json_file_path, dry_run=False):
+        """Create or update projects from a JSON file in bulk, returning an UpsertResult.
+
+        Fields missing from a record keep their current values.
+        """
         with open(json_file_path, 'r') as f:
             data = json.load(f)
         
-        imported_count = 0
-        for project_data in data.get('projects', []):
+        records = {
+            project_data['name']: {field: project_data[field] for field in cls.IMPORT_FIELDS if field in project_data}
+            for project_data in data.get('projects', [])
             # Skip projects without names
-            if not project_data.get('name'):
-                continue
-                
-            # Create or update project
-            project, created = cls.objects.get_or_create(
-                name=project_data['name'],
-                defaults={
-                    'address': project_data.get('address', ''),
-                    'aliases': project_data.get('aliases', []),
-                    'builders_fee': project_data.get('builders_fee'),
-                    'usage_count': project_data.get('usage_count', 0),
-                }
-            )
-            
-            if created:
-                imported_count += 1
-            else:
-                # Update existing project
-                project.address = project_data.get('address', project.address)
-                project.aliases = project_data.get('aliases', project.aliases)
-                project.builders_fee = project_data.get('builders_fee', project.builders_fee)
-                project.usage_count = project_data.get('usage_count', project.usage_count)
-                project.save()
-        
-        return imported_count
+            if project_data.get('name')
+        }
+        result = upsert(cls, 'name', records, dry_run=dry_run)
+        if not dry_run:
+            # Bulk writes send no signals
+            bump('projects')
+        return result
 
 class Vendor(models.Model):
+    # Fields import_from_json reads from each record
+    IMPORT_FIELDS = ['category', 'aliases', 'usage_count', 'source']
+    
     name = models.CharField(max_length=255, unique=True)
     category = models.CharField(max_length=100, default='Other')
     aliases = models.JSONField(default=list, blank=True)
@@ -185,39 +386,56 @@ class Vendor(models.Model):
         return self.name
     
     @classmethod
-    def import_from_json(cls, json_file_path):
-        """Import vendors from JSON file"""
+    def match_name(cls, name, vendors=None):
+        """Find the vendor a file's vendor text refers to by exact name or alias"""
+        if vendors is None:
+            vendors = list(cls.objects.all())
+        return match_by_name(name, vendors)
+    
+    @classmethod
+    def import_from_json(cls, json_file_path, dry_run=False):
+        """Create or update vendors from a JSON file in bulk, returning an UpsertResult.
+
+        Fields missing from a record keep their current values.
+        """
         with open(json_file_path, 'r') as f:
             data = json.load(f)
         
-        imported_count = 0
-        for vendor_data in data.get('vendors', []):
+        records = {
+            vendor_data['name']: {field: vendor_data[field] for field in cls.IMPORT_FIELDS if field in vendor_data}
+            for vendor_data in data.get('vendors', [])
             # Skip vendors without names
-            if not vendor_data.get('name'):
-                continue
-                
-            # Create or update vendor
-            vendor, created = cls.objects.get_or_create(
-                name=vendor_data['name'],
-                defaults={
-                    'category': vendor_data.get('category', 'Other'),
-                    'aliases': vendor_data.get('aliases', []),
-                    'usage_count': vendor_data.get('usage_count', 0),
-                    'source': vendor_data.get('source', 'manual'),
-                }
-            )
-            
-            if created:
-                imported_count += 1
-            else:
-                # Update existing vendor
-                vendor.category = vendor_data.get('category', vendor.category)
-                vendor.aliases = vendor_data.get('aliases', vendor.aliases)
-                vendor.usage_count = vendor_data.get('usage_count', vendor.usage_count)
-                vendor.source = vendor_data.get('source', vendor.source)
-                vendor.save()
-        
-        return imported_count
+            if vendor_data.get('name')
+        }
+        result = upsert(cls, 'name', records, dry_run=dry_run)
+        if not dry_run:
+            # Bulk writes send no signals
+            bump('vendors')
+        return result
+    
+    @classmethod
+    def assign_classes(cls, assignments, replace=True, batch_size=500):
+        """Write class assignments for many vendors in bulk.
+
+        assignments maps vendor ids to the ids of existing classes. With
+        replace each vendor ends up with exactly those classes; otherwise they
+        are added to the ones it has. Each batch of vendors is one DELETE and
+        one INSERT on the through table.
+        """
+        Assignment = cls.classes.through
+        vendor_ids = list(assignments)
+        with db_transaction.atomic():
+            for start in range(0, len(vendor_ids), batch_size):
+                batch = vendor_ids[start:start + batch_size]
+                if replace:
+                    Assignment.objects.filter(vendor_id__in=batch).delete()
+                Assignment.objects.bulk_create(
+                    [Assignment(vendor_id=vendor_id, class_id=class_id) for vendor_id in batch for class_id in set(assignments[vendor_id])],
+                    batch_size=batch_size,
+                    ignore_conflicts=not replace
+                )
+        # Writing the through table directly sends no m2m_changed
+        Class.invalidate_tree()
 
 class Transaction(models.Model):
     TRANSACTION_TYPE_CHOICES = [
@@ -241,15 +459,94 @@ class Transaction(models.Model):
     due_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='UNMATCHED')
     tags = models.JSONField(default=list, blank=True)
+    
+    # Import deduplication - set for rows that came from a CSV upload
+    fingerprint = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    import_batch = models.ForeignKey('ImportBatch', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    
+    # Card resolved from the description when the transaction is imported
+    card_last4 = models.CharField(max_length=4, blank=True, null=True, db_index=True)
+    card_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='card_transactions')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    STATS_READ = CachedRead('transaction_stats', ['transactions'], timeout=600)
+    
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Keyset pagination for each sortable column, with id as tiebreaker
+            models.Index(fields=['date', 'id'], name='txn_date_id_idx'),
+            models.Index(fields=['amount', 'id'], name='txn_amount_id_idx'),
+            models.Index(fields=['transaction_type', 'date', 'id'], name='txn_type_date_idx'),
+            # Equality filters combined with the default date ordering
+            models.Index(fields=['status', 'date', 'id'], name='txn_status_date_idx'),
+            models.Index(fields=['card_holder', 'date', 'id'], name='txn_holder_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.date} - {self.description} - ${self.amount}"
     
+    @classmethod
+    def cached_stats(cls):
+        """Return the total transaction count and distinct card holders, cached between changes"""
+        return cls.STATS_READ.get(lambda: {
+            'total_count': cls.objects.count(),
+            'card_holders': list(cls.objects.order_by('card_holder').values_list('card_holder', flat=True).distinct()),
+        })
+    
+    @classmethod
+    def invalidate_stats(cls):
+        """Drop cached stats after transactions are added or removed in bulk"""
+        bump('transactions')
+    
+    @staticmethod
+    def extract_card_last4(description, card_map):
+        """Return the card last-4 found in a statement description.
+        
+        Prefers a 4-digit group that belongs to a known card; otherwise falls back
+        to the last one, which is where QuickBooks puts the card number.
+        """
+        candidates = re.findall(r'\b\d{4}\b', description or '')
+        for candidate in candidates:
+            if candidate in card_map:
+                return candidate
+        return candidates[-1] if candidates else None
+    
+    def assign_card(self, card_map=None):
+        """Set card_last4 and card_user from the description"""
+        if card_map is None:
+            card_map = UserProfile.card_user_map()
+        self.card_last4 = self.extract_card_last4(self.description, card_map)
+        self.card_user_id = card_map.get(self.card_last4)
+    
+    @classmethod
+    def reassign_card_user(cls, card_number, user):
+        """Point every transaction charged to a card at its current owner (or nobody)"""
+        if not card_number:
+            return 0
+        return cls.objects.filter(card_last4=card_number).update(card_user=user)
+    
+    @staticmethod
+    def compute_fingerprint(date, amount, description, payee, transaction_type, occurrence=0):
+        """Return a stable hash identifying an imported statement row.
+        
+        Values are normalized (ISO date, amount to cents, whitespace-collapsed
+        uppercase text) so the same row exported twice hashes identically.
+        ``occurrence`` distinguishes genuinely repeated rows within one statement
+        (e.g. two identical fuel charges on the same day).
+        """
+        parts = [
+            date.isoformat(),
+            str(Decimal(amount).quantize(Decimal('0.01'))),
+            ' '.join((description or '').split()).upper(),
+            ' '.join((payee or '').split()).upper(),
+            (transaction_type or '').upper(),
+            str(occurrence),
+        ]
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+    
     @property
     def amount_display(self):
         """Return formatted amount with + or - prefix"""
@@ -263,8 +560,405 @@ class Transaction(models.Model):
         """Check if amount is positive"""
         return self.amount >= 0
 
+class ImportBatch(models.Model):
+    """A single CSV upload of transactions, kept so the import can be audited or rolled back"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('rolled_back', 'Rolled Back'),
+    ]
+    # Imports that are no longer inserting rows and can be rolled back
+    FINISHED_STATUSES = ['completed', 'failed']
+    
+    file_name = models.CharField(max_length=255)
+    file_hash = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the uploaded file")
+    source_file = models.FileField(upload_to='imports/', blank=True, help_text="Uploaded CSV the import reads from")
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_batches')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    
+    # Row counts
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    inserted_count = models.IntegerField(default=0)
+    skipped_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="First few row errors for display")
+    
+    # Bill matching run on the imported transactions
+    matched_count = models.IntegerField(default=0, help_text="Transactions matched to a bill automatically")
+    suggested_count = models.IntegerField(default=0, help_text="Bill match suggestions created for review")
+    
+    # Timing
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last progress report from the running import")
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.created_at:%Y-%m-%d %H:%M})"
+    
+    @property
+    def is_finished(self):
+        """Check if the background import is done, successfully or not"""
+        return self.status in ['completed', 'failed', 'rolled_back']
+    
+    @property
+    def duration_seconds(self):
+        """Return how long the import took, or None while it is still running"""
+        if not self.started_at or not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+    
+    @property
+    def rows_per_second(self):
+        """Return import throughput in rows per second"""
+        duration = self.duration_seconds
+        if not duration:
+            return None
+        return self.total_rows / duration
+
+class MatchSuggestion(models.Model):
+    """A proposed bill-to-transaction match produced by the matching engine"""
+    STATUS_CHOICES = [
+        ('suggested', 'Suggested'),
+        ('accepted', 'Accepted'),
+        ('rejected', 'Rejected'),
+    ]
+    
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name='match_suggestions')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='match_suggestions')
+    score = models.FloatField(help_text="Overall confidence between 0 and 1")
+    details = models.JSONField(default=dict, blank=True, help_text="Per-signal scores that make up the total")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='suggested')
+    group_key = models.CharField(max_length=32, blank=True, db_index=True, help_text="Shared by the pairs of a split match, which are accepted or rejected together")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-score', '-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'transaction'], name='unique_match_suggestion'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-score'], name='match_status_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.file} ↔ {self.transaction} ({self.score:.0%})"
+
+class BillPayment(models.Model):
+    """Link between a bill and a transaction that pays all or part of it"""
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name='payments')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='bill_payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Portion of the transaction applied to this bill")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'transaction'], name='unique_bill_payment'),
+        ]
+    
+    def __str__(self):
+        return f"{self.file} ← {self.transaction} (${self.amount:,.2f})"
+
+class BillSummary(models.Model):
+    """Precomputed row for each approved bill, so the bills page reads one table without joins.
+
+    Rows are rebuilt from File with refresh_files() whenever a bill is
+    approved, renamed, matched, paid or sent back.
+    """
+    file = models.OneToOneField(File, on_delete=models.CASCADE, primary_key=True, related_name='bill_summary')
+    name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500, blank=True)
+    file_type = models.CharField(max_length=50, blank=True)
+    file_size_display = models.CharField(max_length=20, blank=True)
+    uploaded_at = models.DateTimeField()
+    description = models.TextField(blank=True)
+    
+    project = models.CharField(max_length=255, blank=True)
+    vendor = models.CharField(max_length=255, blank=True)
+    date = models.CharField(max_length=20, blank=True)
+    invoice_number = models.CharField(max_length=50, blank=True)
+    total = models.CharField(max_length=20, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    invoice_date = models.DateField(null=True, blank=True)
+    
+    is_paid = models.BooleanField(default=False)
+    payment_method = models.CharField(max_length=20, blank=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    
+    is_matched = models.BooleanField(default=False)
+    matched_transaction = models.JSONField(null=True, blank=True, help_text="Date, amount, description and card holder of the attached transaction")
+    
+    selected_class = models.ForeignKey('Class', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    class_name = models.CharField(max_length=100, blank=True)
+    class_color = models.CharField(max_length=7, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['-uploaded_at', 'file'], name='bill_uploaded_idx'),
+            models.Index(fields=['is_paid', '-uploaded_at'], name='bill_paid_uploaded_idx'),
+            models.Index(fields=['is_matched', '-uploaded_at'], name='bill_matched_uploaded_idx'),
+            models.Index(fields=['amount'], name='bill_amount_idx'),
+            models.Index(fields=['invoice_date'], name='bill_invoice_date_idx'),
+            models.Index(fields=['vendor'], name='bill_vendor_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+    
+    @staticmethod
+    def source_files():
+        """Files that appear on the bills page"""
+        return File.objects.filter(
+            project__isnull=False,
+            vendor__isnull=False,
+            invoice_number__isnull=False,
+            total__isnull=False,
+            approval_status='approved'
+        ).exclude(project='', vendor='', invoice_number='', total='$0.00')
+    
+    @classmethod
+    def from_file(cls, file_obj):
+        """Build an unsaved summary row from a file with its transaction and class loaded"""
+        transaction = file_obj.attached_transaction
+        matched_transaction = None
+        if transaction:
+            matched_transaction = {
+                'id': transaction.id,
+                'date': transaction.date.strftime('%m/%d/%Y'),
+                'amount': transaction.amount_display,
+                'description': transaction.description,
+                'card_holder': transaction.card_holder,
+                'status': transaction.status
+            }
+        selected_class = file_obj.selected_class
+        return cls(
+            file=file_obj,
+            name=file_obj.name,
+            file_path=file_obj.file.name if file_obj.file else '',
+            file_type=file_obj.file_type,
+            file_size_display=file_obj.file_size_display,
+            uploaded_at=file_obj.uploaded_at,
+            description=file_obj.description or '',
+            project=file_obj.project or '',
+            vendor=file_obj.vendor or '',
+            date=file_obj.date or '',
+            invoice_number=file_obj.invoice_number or '',
+            total=file_obj.total or '$0.00',
+            amount=file_obj.amount,
+            invoice_date=file_obj.invoice_date,
+            is_paid=file_obj.is_paid,
+            payment_method=file_obj.payment_method or '',
+            paid_at=file_obj.paid_at,
+            is_matched=transaction is not None,
+            matched_transaction=matched_transaction,
+            selected_class=selected_class,
+            class_name=selected_class.name if selected_class else '',
+            class_color=selected_class.color if selected_class else ''
+        )
+    
+    @classmethod
+    def refresh_files(cls, file_ids):
+        """Rebuild the summary rows of the given files, dropping files that are no longer bills"""
+        file_ids = [file_id for file_id in file_ids if file_id]
+        if not file_ids:
+            return
+        files = cls.source_files().filter(id__in=file_ids).select_related('attached_transaction', 'selected_class')
+        rows = [cls.from_file(file_obj) for file_obj in files]
+        with db_transaction.atomic():
+            cls.objects.filter(file_id__in=file_ids).delete()
+            cls.objects.bulk_create(rows)
+    
+    @classmethod
+    def refresh_transactions(cls, transaction_ids):
+        """Rebuild the summary rows of every bill linked to the given transactions"""
+        transaction_ids = list(transaction_ids)
+        cls.refresh_files(set(File.objects.filter(
+            models.Q(attached_transaction_id__in=transaction_ids) |
+            models.Q(payments__transaction_id__in=transaction_ids)
+        ).values_list('id', flat=True)))
+    
+    @classmethod
+    def rebuild(cls, batch_size=500):
+        """Rebuild every summary row from scratch"""
+        with db_transaction.atomic():
+            cls.objects.all().delete()
+            batch = []
+            for file_obj in cls.source_files().select_related('attached_transaction', 'selected_class').iterator(chunk_size=batch_size):
+                batch.append(cls.from_file(file_obj))
+                if len(batch) >= batch_size:
+                    cls.objects.bulk_create(batch)
+                    batch = []
+            cls.objects.bulk_create(batch)
+    
+    def as_json(self):
+        """Return the bill in the shape the bills page JavaScript expects"""
+        return {
+            'id': self.file_id,
+            'name': self.name,
+            'file_type': self.file_type,
+            'file_size_display': self.file_size_display,
+            'uploaded_at': self.uploaded_at.strftime('%b %d, %Y'),
+            'description': self.description,
+            'file': self.file_path,
+            'project': self.project,
+            'vendor': self.vendor,
+            'date': self.date,
+            'invoice_number': self.invoice_number,
+            'total': self.total,
+            'amount': str(self.amount) if self.amount is not None else None,
+            'invoice_date': self.invoice_date.isoformat() if self.invoice_date else None,
+            'is_paid': self.is_paid,
+            'payment_method': self.payment_method,
+            'paid_at': self.paid_at.strftime('%b %d, %Y') if self.paid_at else '',
+            'attached_transaction': self.matched_transaction,
+            'selected_class': {
+                'id': self.selected_class_id,
+                'name': self.class_name,
+                'color': self.class_color
+            } if self.selected_class_id else None
+        }
+
+class ApprovalInboxEntry(models.Model):
+    """A pending file waiting in a superintendent's approval inbox.
+
+    One row per (superintendent, file) for pending files whose resolved
+    project (File.project_ref) the user is assigned to. Rows are rebuilt when a file is renamed, approved or
+    sent back, and when project assignments change. Staff see every pending
+    file and have no rows here.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='approval_inbox')
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name='inbox_entries')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    # Inbox sizes for the sidebar badge, keyed by user id ('staff' for staff)
+    COUNT_READ = CachedRead('approval_count', ['approvals', 'files'], timeout=600)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'file'], name='unique_inbox_entry'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.file}"
+    
+    @staticmethod
+    def pending_files():
+        """Files waiting for approval"""
+        return File.objects.filter(
+            project__isnull=False,
+            vendor__isnull=False,
+            invoice_number__isnull=False,
+            total__isnull=False,
+            approval_status='pending'
+        ).exclude(project='', vendor='', invoice_number='', total='$0.00')
+    
+    @classmethod
+    def files_for(cls, user):
+        """Pending files the user can approve"""
+        if user.is_staff:
+            return cls.pending_files()
+        return File.objects.filter(inbox_entries__user=user)
+    
+    @classmethod
+    def pending_count(cls, user):
+        """Number of files the user can approve, cached until the inboxes or files change"""
+        if user.is_staff:
+            return cls.COUNT_READ.get(lambda: cls.pending_files().count(), 'staff')
+        return cls.COUNT_READ.get(lambda: cls.objects.filter(user=user).count(), user.pk)
+    
+    @classmethod
+    def can_approve(cls, user, file_obj):
+        return user.is_staff or cls.objects.filter(user=user, file=file_obj).exists()
+    
+    @classmethod
+    def approvable_ids(cls, user, file_ids):
+        """The subset of file_ids the user may approve, in one query"""
+        if user.is_staff:
+            return set(cls.pending_files().filter(id__in=file_ids).values_list('id', flat=True))
+        return set(cls.objects.filter(user=user, file_id__in=file_ids).values_list('file_id', flat=True))
+    
+    @classmethod
+    def build_entries(cls, files):
+        """Unsaved inbox rows for the given pending files"""
+        superintendent_ids = {}
+        for project_id, user_id in Project.superintendents.through.objects.values_list('project_id', 'user_id'):
+            superintendent_ids.setdefault(project_id, []).append(user_id)
+        
+        entries = []
+        for file_id, project_id in files.filter(project_ref__isnull=False).values_list('id', 'project_ref'):
+            entries.extend(
+                cls(user_id=user_id, file_id=file_id, project_id=project_id)
+                for user_id in superintendent_ids.get(project_id, [])
+            )
+        return entries
+    
+    @classmethod
+    def refresh_files(cls, file_ids):
+        """Recompute the inbox rows of the given files"""
+        with db_transaction.atomic():
+            cls.objects.filter(file_id__in=file_ids).delete()
+            cls.objects.bulk_create(cls.build_entries(cls.pending_files().filter(id__in=file_ids)), batch_size=500)
+        bump('approvals')
+    
+    @classmethod
+    def refresh_project(cls, project):
+        """Recompute the inbox rows of a project's pending files, after its superintendents change"""
+        cls.refresh_files(list(cls.pending_files().filter(project_ref=project).values_list('id', flat=True)))
+    
+    @classmethod
+    def rebuild(cls):
+        """Recompute every inbox, after project names, aliases or assignments change"""
+        with db_transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(cls.build_entries(cls.pending_files()), batch_size=500)
+        bump('approvals')
+
+class ChangeEvent(models.Model):
+    """A change to a file, published to the live update streams.
+
+    Rows act as a small database-backed message queue so every web process
+    sees every event; streams poll for ids above the last one they sent.
+    """
+    KIND_CHOICES = [
+        ('updated', 'Updated'),
+        ('pending', 'Pending approval'),
+        ('approved', 'Approved'),
+        ('on_hold', 'On hold'),
+        ('rejected', 'Rejected'),
+        ('sent_back', 'Sent back for review'),
+        ('matched', 'Matched'),
+        ('unmatched', 'Unmatched'),
+        ('paid', 'Paid'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file_id = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"#{self.id} {self.kind} file {self.file_id}"
+
 class Class(models.Model):
     """Class model for categorizing vendors and invoices with hierarchical structure"""
+    TREE_READ = CachedRead('class_tree', ['classes'], timeout=86400)
+    
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, help_text="Optional description of this class")
     color = models.CharField(
@@ -280,6 +974,10 @@ class Class(models.Model):
         related_name='children',
         help_text="Parent class for hierarchical organization"
     )
+    # Materialized path: the ids of the root, each ancestor and this class, e.g. "00000003/00000012/".
+    # Maintained by save(), so a subtree is one range scan on the path index.
+    path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Number of ancestors; 0 for top-level classes")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -289,9 +987,71 @@ class Class(models.Model):
         verbose_name_plural = 'Classes'
     
     def __str__(self):
-        if self.parent:
-            return f"{self.parent.name} - {self.name}"
-        return self.name
+        return self.full_name
+    
+    @staticmethod
+    def path_segment(class_id):
+        return f"{class_id:08d}/"
+    
+    @staticmethod
+    def path_ids(path):
+        """Class ids in a path, root first"""
+        return [int(segment) for segment in path.split('/')[:-1]]
+    
+    @staticmethod
+    def subtree_filter(path, prefix=''):
+        """Q matching paths under path (inclusive) as a range, which any B-tree index can serve.
+
+        Every path in the subtree starts with path, and "/" sorts just before
+        "0", so the subtree is exactly path <= p < path-without-slash + "0".
+        path may be an expression such as OuterRef('path').
+        """
+        if isinstance(path, str):
+            upper = path[:-1] + '0'
+        else:
+            upper = Concat(Left(path, Length(path) - 1), models.Value('0'))
+        return models.Q(**{f'{prefix}path__gte': path, f'{prefix}path__lt': upper})
+    
+    def save(self, *args, **kwargs):
+        """Save, then rewrite the path of this class and, after a move, of every descendant"""
+        with db_transaction.atomic():
+            # Stored values, since an ancestor may have moved after this instance was loaded
+            stored = Class.objects.filter(pk=self.pk).values_list('path', 'depth').first() if self.pk else None
+            old_path, old_depth = stored or ('', 0)
+            parent_path = ''
+            if self.parent_id:
+                parent_path = Class.objects.filter(pk=self.parent_id).values_list('path', flat=True).get()
+                if old_path and parent_path.startswith(old_path):
+                    raise ValueError("A class cannot be moved under itself or one of its subclasses.")
+            super().save(*args, **kwargs)
+            
+            new_path = parent_path + self.path_segment(self.pk)
+            new_depth = new_path.count('/') - 1
+            if (new_path, new_depth) != (self.path, self.depth) or new_path != old_path:
+                Class.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+                if old_path and new_path != old_path:
+                    Class.objects.filter(self.subtree_filter(old_path)).exclude(pk=self.pk).update(
+                        path=Concat(models.Value(new_path), Substr('path', len(old_path) + 1)),
+                        depth=models.F('depth') + (new_depth - old_depth)
+                    )
+                self.path = new_path
+                self.depth = new_depth
+                Class.invalidate_tree()
+    
+    @property
+    def ancestor_ids(self):
+        """Ids from the root down to this class's parent, read from the path"""
+        return self.path_ids(self.path)[:-1]
+    
+    def ancestors(self):
+        return Class.objects.filter(id__in=self.ancestor_ids).order_by('depth')
+    
+    def subtree(self):
+        """This class and all of its descendants"""
+        return Class.objects.filter(self.subtree_filter(self.path))
+    
+    def descendants(self):
+        return self.subtree().exclude(pk=self.pk)
     
     @property
     def vendor_count(self):
@@ -306,18 +1066,265 @@ class Class(models.Model):
     @property
     def is_child(self):
         """Check if this class has a parent"""
-        return self.parent is not None
+        return self.parent_id is not None
     
     @property
     def full_name(self):
-        """Return the full hierarchical name"""
-        if self.parent:
-            return f"{self.parent.name} - {self.name}"
-        return self.name
+        """Return the full hierarchical name, e.g. ELECTRICAL - Fixtures - Exterior"""
+        if not self.parent_id:
+            return self.name
+        return ' - '.join([*self.ancestors().values_list('name', flat=True), self.name])
     
     @property
     def display_name(self):
         """Return display name with proper indentation for children"""
-        if self.parent:
-            return f"  └─ {self.name}"
-        return self.name
+        return self.indented_name(self.name, self.depth)
+    
+    @staticmethod
+    def indented_name(name, depth):
+        if depth:
+            return f"{'  ' * depth}└─ {name}"
+        return name
+    
+    @classmethod
+    def cached_tree(cls):
+        """Return every class as a JSON-ready dict, built from one query and cached until classes change.
+
+        The cache key includes the 'classes' namespace version, which
+        invalidate_tree() bumps, so every process drops its copy at once.
+        """
+        return cls.TREE_READ.get(cls.build_tree)
+    
+    @classmethod
+    def build_tree(cls):
+        """Build the cached_tree() payload from one query"""
+        rows = list(cls.objects.values(
+            'id', 'name', 'description', 'color', 'is_active', 'created_at', 'updated_at', 'parent_id', 'parent__name', 'path', 'depth'
+        ).annotate(
+            num_vendors=models.Count('vendors', distinct=True),
+            num_children=models.Count('children', distinct=True)
+        ))
+        names = {row['id']: row['name'] for row in rows}
+        return [{
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'color': row['color'],
+            'is_active': row['is_active'],
+            'vendor_count': row['num_vendors'],
+            'created_at': row['created_at'].strftime('%b %d, %Y'),
+            'updated_at': row['updated_at'].strftime('%b %d, %Y'),
+            'parent_id': row['parent_id'],
+            'parent_name': row['parent__name'],
+            'is_parent': row['num_children'] > 0,
+            'is_child': row['parent_id'] is not None,
+            'full_name': ' - '.join(names[class_id] for class_id in cls.path_ids(row['path'])),
+            'display_name': cls.indented_name(row['name'], row['depth']),
+            'children_count': row['num_children'],
+            'path': row['path'],
+            'depth': row['depth']
+        } for row in rows]
+    
+    @classmethod
+    def active_tree(cls):
+        """Cached tree entries of the active classes, for class pickers"""
+        return [node for node in cls.cached_tree() if node['is_active']]
+    
+    @classmethod
+    def rebuild_paths(cls):
+        """Recompute every path and depth from the parent links, after bulk writes that skip save()"""
+        parents = dict(cls.objects.values_list('id', 'parent_id'))
+        paths = {}
+        
+        def path_for(class_id):
+            if class_id not in paths:
+                parent_id = parents[class_id]
+                paths[class_id] = (path_for(parent_id) if parent_id else '') + cls.path_segment(class_id)
+            return paths[class_id]
+        
+        changed = []
+        for class_obj in cls.objects.only('id', 'path', 'depth'):
+            path = path_for(class_obj.id)
+            if class_obj.path != path:
+                class_obj.path = path
+                class_obj.depth = path.count('/') - 1
+                changed.append(class_obj)
+        cls.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+        cls.invalidate_tree()
+        return len(changed)
+    
+    @classmethod
+    def invalidate_tree(cls):
+        """Bump the tree version after classes or vendor class assignments change"""
+        bump('classes')
+    
+    @classmethod
+    def spend_rollup(cls, start=None, end=None, root=None):
+        """Approved bill spend for each class, including all of its subclasses, in one query.
+
+        Each class is annotated with subtree_total and subtree_bills, summed
+        over bills whose class path falls in the class's subtree, and with
+        direct_total for bills assigned to the class itself. start and end
+        bound the invoice date; root limits the result to one subtree.
+        """
+        bills = BillSummary.objects.filter(amount__isnull=False)
+        if start:
+            bills = bills.filter(invoice_date__gte=start)
+        if end:
+            bills = bills.filter(invoice_date__lte=end)
+        
+        # Func rather than Sum keeps the aggregate out of GROUP BY, leaving one scalar per class
+        def scalar(queryset, function, output_field):
+            return Subquery(queryset.order_by().annotate(value=models.Func('amount', function=function)).values('value'), output_field=output_field)
+        
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        subtree_bills = bills.filter(cls.subtree_filter(OuterRef('path'), prefix='selected_class__'))
+        direct_bills = bills.filter(selected_class=OuterRef('pk'))
+        
+        classes = root.subtree() if root else cls.objects.all()
+        return classes.annotate(
+            subtree_total=Coalesce(scalar(subtree_bills, 'SUM', money), models.Value(Decimal('0')), output_field=money),
+            subtree_bills=Coalesce(scalar(subtree_bills, 'COUNT', models.IntegerField()), models.Value(0)),
+            direct_total=Coalesce(scalar(direct_bills, 'SUM', money), models.Value(Decimal('0')), output_field=money)
+        ).order_by('path')
+
+
+@receiver(post_delete, sender=Vendor)
+@receiver(m2m_changed, sender=Vendor.classes.through)
+def invalidate_class_tree(sender, **kwargs):
+    Class.invalidate_tree()
+
+
+# Cache namespaces (core/caching.py) built from each model's rows
+MODEL_CACHE_NAMESPACES = {
+    File: ['files'],
+    Project: ['projects'],
+    Vendor: ['vendors'],
+    Transaction: ['transactions'],
+    Class: ['classes'],
+}
+
+
+@receiver([post_save, post_delete], sender=File)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Vendor)
+@receiver([post_save, post_delete], sender=Transaction)
+@receiver([post_save, post_delete], sender=Class)
+def bump_model_cache_namespaces(sender, raw=False, **kwargs):
+    if not raw:
+        bump(*MODEL_CACHE_NAMESPACES[sender])
+
+
+class ClassSuggestion(models.Model):
+    """How often a class was chosen when approving a vendor's invoices for a project.
+
+    Counts are bumped by record() as files are approved and read by
+    suggest(), which picks the likely class for many pending files at once.
+    project is null for approvals of files with no resolved project.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='class_suggestions')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    selected_class = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    last_used = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'project', 'selected_class'], name='unique_class_suggestion'),
+            # NULLs are distinct in the constraint above, so rows without a project need their own
+            models.UniqueConstraint(
+                fields=['vendor', 'selected_class'], condition=models.Q(project__isnull=True), name='unique_class_suggestion_no_project'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.vendor_id}/{self.project_id} → {self.selected_class_id} ({self.count})"
+    
+    @classmethod
+    def record(cls, files):
+        """Count the classes of files that were just approved; files need vendor_ref_id, project_ref_id and selected_class_id"""
+        counts = Counter(
+            (file_obj.vendor_ref_id, file_obj.project_ref_id, file_obj.selected_class_id)
+            for file_obj in files
+            if file_obj.vendor_ref_id and file_obj.selected_class_id
+        )
+        now = timezone.now()
+        with db_transaction.atomic():
+            for (vendor_id, project_id, class_id), count in counts.items():
+                updated = cls.objects.filter(vendor_id=vendor_id, project_id=project_id, selected_class_id=class_id).update(
+                    count=models.F('count') + count,
+                    last_used=now
+                )
+                if not updated:
+                    cls.objects.create(vendor_id=vendor_id, project_id=project_id, selected_class_id=class_id, count=count, last_used=now)
+    
+    @classmethod
+    def suggest(cls, files):
+        """Return {file id: class id} with the likely class for each file that has a resolved vendor.
+
+        Prefers the class most often approved for the file's vendor and
+        project, then for the vendor on any project, then the vendor's only
+        assigned class. Inactive classes are never suggested. Two queries
+        however many files there are.
+        """
+        files = [file_obj for file_obj in files if file_obj.vendor_ref_id]
+        vendor_ids = {file_obj.vendor_ref_id for file_obj in files}
+        if not vendor_ids:
+            return {}
+        
+        # Rank by count, then by how recently the class was chosen
+        by_project = {}
+        by_vendor = defaultdict(Counter)
+        latest = {}
+        rows = cls.objects.filter(vendor_id__in=vendor_ids, selected_class__is_active=True).values_list(
+            'vendor_id', 'project_id', 'selected_class_id', 'count', 'last_used'
+        )
+        for vendor_id, project_id, class_id, count, last_used in rows:
+            key = (vendor_id, project_id)
+            if key not in by_project or (count, last_used) > by_project[key][0]:
+                by_project[key] = ((count, last_used), class_id)
+            by_vendor[vendor_id][class_id] += count
+            latest[(vendor_id, class_id)] = max(last_used, latest.get((vendor_id, class_id), last_used))
+        vendor_best = {
+            vendor_id: max(counts, key=lambda class_id: (counts[class_id], latest[(vendor_id, class_id)]))
+            for vendor_id, counts in by_vendor.items()
+        }
+        
+        # Vendors with no approval history fall back to their assigned class, when there is exactly one
+        assigned = defaultdict(list)
+        for vendor_id, class_id in Vendor.classes.through.objects.filter(
+            vendor_id__in=vendor_ids - set(vendor_best), class_id__is_active=True
+        ).values_list('vendor_id', 'class_id'):
+            assigned[vendor_id].append(class_id)
+        
+        suggestions = {}
+        for file_obj in files:
+            project_best = by_project.get((file_obj.vendor_ref_id, file_obj.project_ref_id))
+            if project_best:
+                suggestions[file_obj.id] = project_best[1]
+            elif file_obj.vendor_ref_id in vendor_best:
+                suggestions[file_obj.id] = vendor_best[file_obj.vendor_ref_id]
+            elif len(assigned[file_obj.vendor_ref_id]) == 1:
+                suggestions[file_obj.id] = assigned[file_obj.vendor_ref_id][0]
+        return suggestions
+    
+    @classmethod
+    def rebuild(cls):
+        """Recount every suggestion from the approved files"""
+        rows = File.objects.filter(
+            approval_status='approved', vendor_ref__isnull=False, selected_class__isnull=False
+        ).values('vendor_ref_id', 'project_ref_id', 'selected_class_id').annotate(
+            total=models.Count('id'), latest=models.Max('approved_at')
+        ).order_by()
+        with db_transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(
+                    vendor_id=row['vendor_ref_id'],
+                    project_id=row['project_ref_id'],
+                    selected_class_id=row['selected_class_id'],
+                    count=row['total'],
+                    last_used=row['latest'] or timezone.now()
+                )
+                for row in rows
+            ], batch_size=500)
@@ -0,0 +1,136 @@
+"""Cached roles and permissions for the signed-in user.
+
+RolesMiddleware sets ``request.roles``, a Roles object with the user's group
+names, permissions and staff flags, for the access decorators and (through
+the ``roles`` context processor) templates. Roles are resolved from the
+database once and kept in the cache, so checking them costs no queries.
+
+The cached entry for a user is dropped when the user, their groups or their
+permissions change; changes that can touch many users (a group renamed,
+deleted or given new permissions) bump the 'roles' cache namespace, which
+retires every entry.
+"""
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+
+from .caching import CachedRead, bump
+
+# A user's roles, as Roles.as_dict(), keyed by user id
+ROLES_READ = CachedRead('roles', ['roles'], timeout=3600)
+
+
+class Roles:
+    """A user's group names, permission names and account flags"""
+
+    def __init__(self, groups=(), permissions=(), is_staff=False, is_superuser=False, is_active=False, is_authenticated=False):
+        self.groups = list(groups)
+        self.permissions = frozenset(permissions)
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self.is_active = is_active
+        self.is_authenticated = is_authenticated
+
+    def __contains__(self, group_name):
+        return group_name in self.groups
+
+    def __repr__(self):
+        return f"<Roles groups={self.groups} staff={self.is_staff}>"
+
+    @property
+    def is_superintendent(self):
+        return 'Superintendent' in self.groups
+
+    @property
+    def primary_role(self):
+        return self.groups[0] if self.groups else 'No Role'
+
+    def has_perm(self, perm):
+        """Same answer as User.has_perm for the model backend, without the queries"""
+        return self.is_active and (self.is_superuser or perm in self.permissions)
+
+    @classmethod
+    def for_user(cls, user):
+        """Resolve a user's roles from the database"""
+        if not user.is_authenticated:
+            return cls()
+        return cls(
+            groups=user.groups.order_by('pk').values_list('name', flat=True),
+            permissions=user.get_all_permissions(),
+            is_staff=user.is_staff,
+            is_superuser=user.is_superuser,
+            is_active=user.is_active,
+            is_authenticated=True,
+        )
+
+    def as_dict(self):
+        return {
+            'groups': self.groups,
+            'permissions': sorted(self.permissions),
+            'is_staff': self.is_staff,
+            'is_superuser': self.is_superuser,
+            'is_active': self.is_active,
+            'is_authenticated': self.is_authenticated,
+        }
+
+
+def get_roles(user):
+    """Return the cached Roles for a user, resolving them on a miss"""
+    if not user.is_authenticated:
+        return Roles()
+    return Roles(**ROLES_READ.get(lambda: Roles.for_user(user).as_dict(), user.pk))
+
+
+def invalidate_roles(user_id):
+    """Drop one user's cached roles after their account, groups or permissions change"""
+    ROLES_READ.invalidate(user_id)
+
+
+def invalidate_all_roles():
+    """Retire every cached entry after a change that can affect many users"""
+    bump('roles')
+
+
+def set_request_roles(request):
+    """(Re)bind request.roles to request.user, e.g. after login() switches users"""
+    request.roles = SimpleLazyObject(lambda: get_roles(request.user))
+
+
+class RolesMiddleware:
+    """Sets request.roles; must come after AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        set_request_roles(request)
+        return self.get_response(request)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_roles(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_roles(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_membership_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_roles(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...) and friends: pk_set holds the user ids
+        for user_id in pk_set:
+            invalidate_roles(user_id)
+    else:
+        invalidate_all_roles()
+
+
+@receiver([post_save, post_delete], sender=Group)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_roles(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_all_roles()
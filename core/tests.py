@@ -1,3 +1,1367 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import OutputWrapper
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import ApprovalInboxEntry, BillPayment, BillSummary, ChangeEvent, Class, ClassSuggestion, File, ImportBatch, MatchSuggestion, Project, Transaction, UserProfile, Vendor
+from .matching import (
+    Candidate, MatchContext, SplitMatchTimeout, assign_candidates, find_subset_sum, match_new_transactions, run_matching, score_pair
+)
+from .transaction_import import STALE_IMPORT_SECONDS, claim_batch, claim_next_batch, run_import
+from .bill_export import CSV_COLUMNS, generate_bill_number
+from .bulk_upsert import upsert, write_report
+from .caching import CachedRead, bump, read_stats, reset_stats, versioned_key
+from .events import event_stream, files_changed, latest_event_id
+from .roles import get_roles, invalidate_roles
+from .views import keyset_paginate, serialize_bill_events
+
+
+class AdminClientMixin:
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+
+
+class TransactionsListFilterTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Migrations load sample transactions
+        Transaction.objects.all().delete()
+        for day, amount in [(1, '10.00'), (2, '25.50'), (3, '99.99')]:
+            Transaction.objects.create(date=date(2025, 1, day), description=f'Infinity Supply {day}', amount=Decimal(amount))
+
+    def test_non_finite_numbers_are_not_used_as_amounts(self):
+        for params in [
+            {'search': 'inf'}, {'search': 'NaN'}, {'search': 'Infinity'},
+            {'amount_min': 'inf'}, {'amount_min': 'NaN'}, {'amount_max': '-Infinity'},
+            {'sort': 'amount', 'after': 'inf|3'}, {'sort': '-amount', 'after': 'NaN|3'},
+            {'sort': 'amount', 'before': 'sNaN|1'},
+            {'search': '1e30'}, {'amount_max': '1e30'}, {'sort': 'amount', 'after': '1e30|3'},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get('/transactions/', params)
+                self.assertEqual(response.status_code, 200)
+
+    def test_text_search_still_matches_when_query_is_not_a_number(self):
+        response = self.client.get('/transactions/', {'search': 'inf'})
+        self.assertEqual(len(response.context['transactions']), 3)
+
+    def test_bad_amount_cursor_falls_back_to_first_page(self):
+        response = self.client.get('/transactions/', {'sort': 'amount', 'after': 'NaN|3'})
+        self.assertEqual([t.amount for t in response.context['transactions']], [Decimal('10.00'), Decimal('25.50'), Decimal('99.99')])
+
+    def test_numeric_search_and_amount_range(self):
+        response = self.client.get('/transactions/', {'search': '$25.50'})
+        self.assertEqual([t.amount for t in response.context['transactions']], [Decimal('25.50')])
+        response = self.client.get('/transactions/', {'amount_min': '20', 'amount_max': '50'})
+        self.assertEqual([t.amount for t in response.context['transactions']], [Decimal('25.50')])
+
+
+class TransactionCardTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Card numbers are read through a cached map
+        cache.clear()
+        self.holder = User.objects.create_user('holder', password='password')
+        self.holder.profile.card_number = '4321'
+        self.holder.profile.save()
+
+    def test_known_card_is_preferred_over_the_last_digit_group(self):
+        card_map = {'4321': self.holder.id}
+        self.assertEqual(Transaction.extract_card_last4('STORE 4321 REF 9999', card_map), '4321')
+        self.assertEqual(Transaction.extract_card_last4('STORE 1111 REF 9999', card_map), '9999')
+        self.assertIsNone(Transaction.extract_card_last4('STORE 12345', card_map))
+
+    def test_imported_row_is_linked_to_the_card_holder(self):
+        transaction = Transaction(date=date(2025, 1, 1), description='HARDWARE CARD 4321', amount=Decimal('3.00'))
+        transaction.assign_card()
+        self.assertEqual((transaction.card_last4, transaction.card_user), ('4321', self.holder))
+
+    def test_changing_a_card_repoints_its_transactions(self):
+        Transaction.objects.all().delete()
+        transaction = Transaction.objects.create(date=date(2025, 1, 1), description='FUEL 4321', amount=Decimal('3.00'))
+        other = Transaction.objects.create(date=date(2025, 1, 1), description='FUEL 8765', amount=Decimal('3.00'))
+        for t in (transaction, other):
+            t.assign_card()
+            t.save()
+        self.assertEqual(Transaction.objects.get(id=transaction.id).card_user, self.holder)
+
+        response = self.client.post('/api/users/update-card/', {'user_id': self.holder.id, 'card_number': '8765'}, content_type='application/json')
+
+        self.assertTrue(response.json()['success'])
+        self.assertIsNone(Transaction.objects.get(id=transaction.id).card_user)
+        self.assertEqual(Transaction.objects.get(id=other.id).card_user, self.holder)
+        self.assertEqual(UserProfile.card_user_map(), {'8765': self.holder.id})
+
+
+class KeysetPaginationTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Transaction.objects.all().delete()
+        # Repeated amounts and dates, so the id tiebreaker matters
+        for day, amount in [(1, '5.00'), (1, '5.00'), (2, '7.00'), (2, '5.00'), (3, '9.00'), (3, '7.00'), (4, '5.00')]:
+            Transaction.objects.create(date=date(2025, 1, day), description=f'Charge {day}', amount=Decimal(amount))
+
+    def expected(self, *ordering):
+        return list(Transaction.objects.order_by(*ordering).values_list('id', flat=True))
+
+    def walk(self, sort_field, descending):
+        pages, cursor = [], None
+        while True:
+            items, next_cursor, _ = keyset_paginate(Transaction.objects.all(), sort_field, descending, after=cursor, page_size=3)
+            pages.append([item.id for item in items])
+            if not next_cursor:
+                return pages
+            cursor = next_cursor
+
+    def test_forward_pages_cover_every_row_once_in_order(self):
+        for sort_field, descending, ordering in [('amount', False, ('amount', 'id')), ('date', True, ('-date', '-id'))]:
+            with self.subTest(sort_field=sort_field, descending=descending):
+                pages = self.walk(sort_field, descending)
+                self.assertEqual([len(page) for page in pages], [3, 3, 1])
+                self.assertEqual(sum(pages, []), self.expected(*ordering))
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        first, next_cursor, prev_cursor = keyset_paginate(Transaction.objects.all(), 'amount', False, page_size=3)
+        self.assertIsNone(prev_cursor)
+        second, _, prev_cursor = keyset_paginate(Transaction.objects.all(), 'amount', False, after=next_cursor, page_size=3)
+        back, _, _ = keyset_paginate(Transaction.objects.all(), 'amount', False, before=prev_cursor, page_size=3)
+        self.assertEqual(back, first)
+        self.assertNotEqual(second, first)
+
+    def test_list_view_filters_and_links_the_next_page(self):
+        response = self.client.get('/transactions/', {'sort': 'amount', 'amount_min': '6'})
+        self.assertEqual([t.amount for t in response.context['transactions']], [Decimal('7.00'), Decimal('7.00'), Decimal('9.00')])
+        self.assertEqual(response.context['filtered_count'], 3)
+        self.assertEqual(response.context['next_query'], '')
+        response = self.client.get('/transactions/', {'sort': '-date', 'date_from': '2025-01-02'})
+        self.assertEqual(len(response.context['transactions']), 5)
+
+
+class ImportBatchRollbackTests(AdminClientMixin, TestCase):
+    def create_batch(self, status):
+        batch = ImportBatch.objects.create(file_name=f'{status}.csv', file_hash=status, status=status)
+        Transaction.objects.create(date=date(2025, 1, 1), description='Imported row', amount=Decimal('5.00'), import_batch=batch)
+        return batch
+
+    def rollback(self, batch):
+        return self.client.post(f'/api/transactions/imports/{batch.id}/rollback/').json()
+
+    def test_running_imports_cannot_be_rolled_back(self):
+        for status in ['pending', 'processing']:
+            with self.subTest(status=status):
+                batch = self.create_batch(status)
+                result = self.rollback(batch)
+                self.assertFalse(result['success'])
+                self.assertIn('still running', result['message'])
+                batch.refresh_from_db()
+                self.assertEqual(batch.status, status)
+                self.assertTrue(batch.transactions.exists())
+
+    def test_finished_import_is_rolled_back_once(self):
+        batch = self.create_batch('completed')
+        result = self.rollback(batch)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['deleted_count'], 1)
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'rolled_back')
+        self.assertIsNotNone(batch.rolled_back_at)
+        self.assertFalse(self.rollback(batch)['success'])
+
+    def test_abandoned_import_is_failed_and_can_be_rolled_back(self):
+        stale = self.create_batch('processing')
+        running = self.create_batch('processing')
+        ImportBatch.objects.filter(id=stale.id).update(heartbeat_at=timezone.now() - timedelta(seconds=STALE_IMPORT_SECONDS + 1))
+        ImportBatch.objects.filter(id=running.id).update(heartbeat_at=timezone.now())
+        
+        result = self.rollback(stale)
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['deleted_count'], 1)
+        running.refresh_from_db()
+        self.assertEqual(running.status, 'processing')
+
+    def test_rollback_deletes_only_the_batchs_transactions(self):
+        batch = self.create_batch('completed')
+        other = self.create_batch('failed')
+        self.assertTrue(self.rollback(batch)['success'])
+        self.assertFalse(Transaction.objects.filter(import_batch=batch).exists())
+        self.assertEqual(other.transactions.count(), 1)
+
+    def test_split_payments_move_to_a_remaining_transaction(self):
+        Transaction.objects.all().delete()
+        batch = self.create_batch('completed')
+        imported = batch.transactions.get()
+        other = Transaction.objects.create(date=date(2025, 1, 2), description='Other card', amount=Decimal('4.00'), status='MATCHED')
+        split, single = [
+            File.objects.create(
+                name=f'{name}.pdf', uploaded_by=self.admin, project='Oak Street', vendor='Acme', invoice_number=name,
+                total='$9.00', approval_status='approved', attached_transaction=imported
+            )
+            for name in ['split', 'single']
+        ]
+        BillPayment.objects.create(file=split, transaction=imported, amount=Decimal('5.00'))
+        BillPayment.objects.create(file=split, transaction=other, amount=Decimal('4.00'))
+        BillPayment.objects.create(file=single, transaction=imported, amount=Decimal('5.00'))
+        BillSummary.refresh_files([split.id, single.id])
+        
+        result = self.rollback(batch)
+        
+        self.assertEqual(result['unlinked_count'], 1)
+        split.refresh_from_db()
+        self.assertEqual(split.attached_transaction, other)
+        self.assertEqual(BillSummary.objects.get(file=split).matched_transaction['id'], other.id)
+        self.assertFalse(BillSummary.objects.get(file=single).is_matched)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class TransactionImportTests(TestCase):
+    CSV = 'Date,DESCRIPTION,Payee,Categorize or match,SPENT,RECEIVED\n01/05/25,Lumber,Bob,,10.00,\n01/06/25,Nails,Bob,,2.50,\n'
+
+    def import_csv(self, csv_text, file_hash='abc'):
+        batch = ImportBatch.objects.create(file_name='statement.csv', file_hash=file_hash)
+        batch.source_file.save('statement.csv', ContentFile(csv_text.encode()))
+        return run_import(batch)
+
+    def test_reimporting_a_statement_skips_every_row(self):
+        first = self.import_csv(self.CSV)
+        second = self.import_csv(self.CSV)
+        self.assertEqual((first.inserted_count, first.skipped_count), (2, 0))
+        self.assertEqual((second.inserted_count, second.skipped_count), (0, 2))
+        self.assertEqual(second.transactions.count(), 0)
+
+    def test_repeated_rows_in_one_statement_are_kept(self):
+        csv_text = self.CSV + '01/05/25,Lumber,Bob,,10.00,\n'
+        self.assertEqual(self.import_csv(csv_text).inserted_count, 3)
+        # The same statement exported again, with one more identical charge
+        result = self.import_csv(csv_text + '01/05/25,Lumber,Bob,,10.00,\n')
+        self.assertEqual((result.inserted_count, result.skipped_count), (1, 3))
+
+    def test_fingerprint_ignores_case_spacing_and_amount_format(self):
+        fingerprint = Transaction.compute_fingerprint(date(2025, 1, 5), '10', 'Lumber  yard', 'bob', 'charge')
+        self.assertEqual(fingerprint, Transaction.compute_fingerprint(date(2025, 1, 5), Decimal('10.00'), ' LUMBER YARD', 'Bob ', 'CHARGE'))
+        self.assertNotEqual(fingerprint, Transaction.compute_fingerprint(date(2025, 1, 5), '10', 'Lumber yard', 'bob', 'charge', 1))
+
+    def test_rows_taken_by_a_concurrent_import_are_not_counted_as_inserted(self):
+        batch = ImportBatch.objects.create(file_name='statement.csv', file_hash='abc')
+        batch.source_file.save('statement.csv', ContentFile(self.CSV.encode()))
+        other_batch = ImportBatch.objects.create(file_name='statement.csv', file_hash='abc', status='completed')
+        bulk_create = Transaction.objects.bulk_create
+
+        def concurrent_bulk_create(objs, **kwargs):
+            # Another import stores the first row between the duplicate check and the insert
+            first = objs[0]
+            Transaction.objects.create(
+                date=first.date, description=first.description, amount=first.amount,
+                fingerprint=first.fingerprint, import_batch=other_batch
+            )
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Transaction.objects, 'bulk_create', side_effect=concurrent_bulk_create):
+            run_import(batch)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'completed')
+        self.assertEqual(batch.inserted_count, 1)
+        self.assertEqual(batch.skipped_count, 1)
+        self.assertEqual(batch.transactions.count(), 1)
+
+    def test_malformed_amounts_are_row_errors(self):
+        csv_text = self.CSV + '01/07/25,Bad 1,Bob,,NaN,\n01/08/25,Bad 2,Bob,,Infinity,\n01/09/25,Bad 3,Bob,,"1,000,000,000.00",\n'
+        batch = ImportBatch.objects.create(file_name='statement.csv', file_hash='ghi')
+        batch.source_file.save('statement.csv', ContentFile(csv_text.encode()))
+
+        run_import(batch)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'completed')
+        self.assertEqual(batch.inserted_count, 2)
+        self.assertEqual(batch.error_count, 3)
+        self.assertEqual([error.split(':')[0] for error in batch.errors], ['Row 4', 'Row 5', 'Row 6'])
+
+    def test_import_stops_once_it_was_given_up_as_abandoned(self):
+        batch = ImportBatch.objects.create(file_name='statement.csv', file_hash='def')
+        batch.source_file.save('statement.csv', ContentFile(self.CSV.encode()))
+        bulk_create = Transaction.objects.bulk_create
+
+        def slow_bulk_create(objs, **kwargs):
+            ImportBatch.objects.filter(id=batch.id).update(status='failed')
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Transaction.objects, 'bulk_create', side_effect=slow_bulk_create):
+            result = run_import(batch)
+
+        self.assertEqual(result.status, 'failed')
+        self.assertEqual(ImportBatch.objects.get(id=batch.id).status, 'failed')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), TRANSACTION_IMPORT_MODE='worker')
+class BackgroundImportTests(AdminClientMixin, TestCase):
+    CSV = TransactionImportTests.CSV
+
+    def upload(self):
+        csv_file = ContentFile(self.CSV.encode(), name='statement.csv')
+        return self.client.post('/api/transactions/upload-csv/', {'csv_file': csv_file}).json()
+
+    def progress(self, batch_id):
+        return self.client.get(f'/api/transactions/imports/{batch_id}/progress/').json()
+
+    def test_upload_is_queued_and_imported_by_the_worker(self):
+        result = self.upload()
+        self.assertTrue(result['success'])
+        batch_id = result['import_batch_id']
+        self.assertEqual(self.progress(batch_id)['status'], 'pending')
+        self.assertFalse(self.progress(batch_id)['is_finished'])
+
+        call_command('process_transaction_imports', '--once', stdout=StringIO())
+
+        progress = self.progress(batch_id)
+        self.assertEqual(progress['status'], 'completed')
+        self.assertTrue(progress['is_finished'])
+        self.assertEqual((progress['total_rows'], progress['processed_rows'], progress['inserted_count']), (2, 2, 2))
+        self.assertIn('Successfully imported 2 transactions', progress['message'])
+
+    def test_a_batch_is_claimed_once(self):
+        batch_id = self.upload()['import_batch_id']
+        self.assertEqual(claim_next_batch().id, batch_id)
+        self.assertIsNone(claim_next_batch())
+        self.assertFalse(claim_batch(batch_id))
+
+    def test_non_csv_upload_is_refused(self):
+        response = self.client.post('/api/transactions/upload-csv/', {'csv_file': ContentFile(b'x', name='statement.txt')}).json()
+        self.assertFalse(response['success'])
+        self.assertFalse(ImportBatch.objects.exists())
+
+
+class InvoiceDateTests(AdminClientMixin, TestCase):
+    def test_backfill_updates_bill_summary_dates(self):
+        file_obj = File.objects.create(
+            name='invoice.pdf', uploaded_by=self.admin, project='Oak Street', vendor='Acme',
+            invoice_number='INV-1', total='$12.00', date='03-15-2025', approval_status='approved'
+        )
+        # A bill stored before invoice_date existed
+        File.objects.filter(id=file_obj.id).update(invoice_date=None)
+        BillSummary.refresh_files([file_obj.id])
+        self.assertIsNone(BillSummary.objects.get(file_id=file_obj.id).invoice_date)
+
+        call_command('backfill_file_dates', stdout=StringIO())
+
+        self.assertEqual(File.objects.get(id=file_obj.id).invoice_date, date(2025, 3, 15))
+        self.assertEqual(BillSummary.objects.get(file_id=file_obj.id).invoice_date, date(2025, 3, 15))
+        response = self.client.get('/api/bills/', {'date_from': '2025-03-01', 'date_to': '2025-03-31'})
+        self.assertEqual([bill['id'] for bill in response.json()['bills']], [file_obj.id])
+
+    def test_parse_date_accepts_the_known_formats(self):
+        for value in ['08-26-2025', '08-26-25', '08/26/2025', '2025-08-26', 'Aug 26, 2025', 'August 26, 2025']:
+            self.assertEqual(File.parse_date(value), date(2025, 8, 26), value)
+        for value in ['', None, '26.13.2025', 'soon']:
+            self.assertIsNone(File.parse_date(value), value)
+
+    def test_rename_reports_an_unrecognized_date(self):
+        file_obj = File.objects.create(name='invoice.pdf', uploaded_by=self.admin, approval_status='approved')
+        response = self.client.post('/files/rename/', {
+            'file_id': file_obj.id, 'vendor': 'Acme', 'date': 'end of month', 'total': '$5.00'
+        }, content_type='application/json').json()
+        self.assertTrue(response['success'])
+        self.assertFalse(response['date_recognized'])
+        self.assertIn('not recognized', response['message'])
+        self.assertIsNone(File.objects.get(id=file_obj.id).invoice_date)
+
+    def test_bills_sort_by_invoice_date(self):
+        ids = []
+        for invoice_date in ['03-15-2025', '01-02-2025', '02-10-2025']:
+            file_obj = File.objects.create(
+                name='invoice.pdf', uploaded_by=self.admin, vendor='Acme', invoice_number='INV',
+                total='$1.00', date=invoice_date, invoice_date=File.parse_date(invoice_date), approval_status='approved'
+            )
+            ids.append(file_obj.id)
+        BillSummary.refresh_files(ids)
+        response = self.client.get('/api/bills/', {'sort': 'invoice_date'}).json()
+        self.assertEqual([bill['id'] for bill in response['bills']], [ids[1], ids[2], ids[0]])
+
+
+class FileAmountTests(AdminClientMixin, TestCase):
+    def rename(self, total, date='08-26-2025'):
+        file_obj = File.objects.create(name='invoice.pdf', uploaded_by=self.admin, approval_status='approved')
+        response = self.client.post('/files/rename/', {
+            'file_id': file_obj.id, 'project': 'Oak Street', 'vendor': 'Acme', 'date': date,
+            'invoice_number': f'INV-{file_obj.id}', 'total': total
+        }, content_type='application/json').json()
+        self.assertTrue(response['success'])
+        return File.objects.get(id=file_obj.id), response
+
+    def test_parse_amount_accepts_display_totals_only(self):
+        self.assertEqual(File.parse_amount('$1,234.5'), Decimal('1234.50'))
+        self.assertEqual(File.parse_amount(' -12 '), Decimal('-12.00'))
+        for value in ['', None, 'abc', 'NaN', 'Infinity', '1e12']:
+            self.assertIsNone(File.parse_amount(value), value)
+
+    def test_rename_stores_the_amount_used_to_filter_and_sort_bills(self):
+        large, _ = self.rename('$1,250.00')
+        small, _ = self.rename('$80.00')
+        self.assertEqual(large.amount, Decimal('1250.00'))
+
+        response = self.client.get('/api/bills/', {'amount_min': '100'}).json()
+        self.assertEqual([bill['id'] for bill in response['bills']], [large.id])
+        response = self.client.get('/api/bills/', {'sort': 'amount'}).json()
+        self.assertEqual([bill['id'] for bill in response['bills']], [small.id, large.id])
+        response = self.client.get('/bills/', {'amount_max': '$100'})
+        self.assertEqual(response.context['total_amount'], '$80.00')
+
+
+class BillSummaryTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.transaction = Transaction.objects.create(date=date(2025, 4, 2), description='ACME SUPPLY', amount=Decimal('-30.00'))
+        self.matched = File.objects.create(
+            name='matched.pdf', uploaded_by=self.admin, vendor='Acme', invoice_number='1', total='$30.00',
+            amount=Decimal('30.00'), approval_status='approved', attached_transaction=self.transaction
+        )
+        self.paid = File.objects.create(
+            name='paid.pdf', uploaded_by=self.admin, vendor='Bolt', invoice_number='2', total='$20.00',
+            amount=Decimal('20.00'), approval_status='approved', is_paid=True
+        )
+        self.open = File.objects.create(
+            name='open.pdf', uploaded_by=self.admin, vendor='Bolt', invoice_number='3', total='$10.00',
+            amount=Decimal('10.00'), approval_status='approved'
+        )
+        File.objects.create(name='pending.pdf', uploaded_by=self.admin, vendor='Bolt', total='$5.00', approval_status='pending')
+        BillSummary.rebuild()
+
+    def bill_ids(self, **params):
+        response = self.client.get('/api/bills/', params).json()
+        self.assertTrue(response['success'])
+        return [bill['id'] for bill in response['bills']]
+
+    def test_only_approved_bills_are_listed_with_filters_and_pages(self):
+        self.assertEqual(BillSummary.objects.count(), 3)
+        self.assertEqual(self.bill_ids(matched='true'), [self.matched.id])
+        self.assertEqual(self.bill_ids(paid='true'), [self.paid.id])
+        self.assertEqual(self.bill_ids(vendor='Bolt', sort='-amount'), [self.paid.id, self.open.id])
+        response = self.client.get('/api/bills/', {'page_size': 2, 'page': 2, 'sort': 'amount'}).json()
+        self.assertEqual((response['num_pages'], response['total_count']), (2, 3))
+        self.assertEqual([bill['id'] for bill in response['bills']], [self.matched.id])
+
+    def test_summary_follows_transaction_edits_and_send_back(self):
+        response = self.client.post(
+            f'/api/transactions/{self.transaction.id}/update/', {'description': 'ACME SUPPLY CO'}, content_type='application/json'
+        ).json()
+        self.assertTrue(response['success'])
+        self.assertEqual(BillSummary.objects.get(file_id=self.matched.id).matched_transaction['description'], 'ACME SUPPLY CO')
+
+        response = self.client.post('/api/bills/send-back-for-review/', {'file_id': self.open.id}, content_type='application/json').json()
+        self.assertTrue(response['success'])
+        self.assertFalse(BillSummary.objects.filter(file_id=self.open.id).exists())
+
+    def test_class_edit_updates_the_summary_colour(self):
+        class_obj = Class.objects.create(name='Lumber', color='#111111')
+        File.objects.filter(id=self.open.id).update(selected_class=class_obj)
+        BillSummary.refresh_files([self.open.id])
+        response = self.client.post('/api/classes/update/', {
+            'class_id': class_obj.id, 'name': 'Framing', 'color': '#222222'
+        }, content_type='application/json').json()
+        self.assertTrue(response['success'])
+        summary = BillSummary.objects.get(file_id=self.open.id)
+        self.assertEqual((summary.class_name, summary.class_color), ('Framing', '#222222'))
+
+    def test_rebuild_command_restores_missing_rows(self):
+        BillSummary.objects.all().delete()
+        call_command('rebuild_bill_summaries', stdout=StringIO())
+        self.assertEqual(set(BillSummary.objects.values_list('file_id', flat=True)), {self.matched.id, self.paid.id, self.open.id})
+
+class BillExportTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # The class tree is cached under versions the test database reuses
+        cache.clear()
+        self.project = Project.objects.create(name='Oak Street', address='12 N Oak Street')
+        parent = Class.objects.create(name='Materials')
+        self.lumber = Class.objects.create(name='Lumber', parent=parent)
+        self.bill = File.objects.create(
+            name='bill.pdf', uploaded_by=self.admin, project='Oak Street', project_ref=self.project, vendor='Acme\tSupply',
+            invoice_number='INV-7', total='$1,250.00', amount=Decimal('1250.00'), invoice_date=date(2025, 5, 6),
+            selected_class=self.lumber, approval_status='approved'
+        )
+        File.objects.create(name='pending.pdf', uploaded_by=self.admin, total='$5.00', amount=Decimal('5.00'), approval_status='pending')
+
+    def download(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_bill_number_uses_the_project_address_without_directions(self):
+        self.assertEqual(generate_bill_number(self.bill), 'INV-7 - 12 Oak Street')
+        self.bill.project_ref = None
+        self.assertEqual(generate_bill_number(self.bill), 'INV-7 - Oak Street')
+
+    def test_csv_export_claims_bills_once_and_can_be_downloaded_again(self):
+        response = self.client.post('/api/bills/export/', {'format': 'csv'})
+        content = self.download(response)
+        batch = response['X-Export-Batch']
+        self.assertEqual(content.splitlines(), [
+            ','.join(CSV_COLUMNS),
+            'INV-7 - 12 Oak Street,Acme\tSupply,05/06/2025,1250.00,Materials:Lumber,Oak Street,INV-7,Oak Street - Invoice INV-7',
+        ])
+        self.assertEqual(File.objects.get(id=self.bill.id).export_batch, batch)
+
+        # Nothing new to claim, but the batch can be fetched again
+        self.assertRedirects(self.client.post('/api/bills/export/', {'format': 'csv'}), '/bills/', fetch_redirect_response=False)
+        self.assertEqual(self.download(self.client.get('/api/bills/export/', {'format': 'csv', 'batch': batch})), content)
+        self.assertEqual(self.client.get('/api/bills/export/', {'batch': 'missing'}).status_code, 404)
+
+    def test_iif_export_balances_each_bill_and_strips_tabs_from_values(self):
+        lines = self.download(self.client.post('/api/bills/export/', {'format': 'iif'})).split('\r\n')
+        self.assertEqual(lines[3:6], [
+            'TRNS\tBILL\t05/06/2025\tAccounts Payable\tAcme Supply\tMaterials:Lumber\t-1250.00\tINV-7 - 12 Oak Street\tOak Street - Invoice INV-7',
+            'SPL\tBILL\t05/06/2025\tJob Materials\tAcme Supply\tMaterials:Lumber\t1250.00\tINV-7 - 12 Oak Street\tOak Street - Invoice INV-7',
+            'ENDTRNS',
+        ])
+
+class ProjectResolutionTests(TestCase):
+    def setUp(self):
+        Project.objects.all().delete()
+        self.oak_street = Project.objects.create(name='Oak Street', aliases=['Oak St'])
+        self.oak_avenue = Project.objects.create(name='Oak Avenue', aliases=['oak st'])
+        self.elm = Project.objects.create(name='Elm Court', aliases=['Elm'])
+
+    def test_exact_name_then_single_alias(self):
+        self.assertEqual(Project.match_name('Oak Street'), self.oak_street)
+        self.assertEqual(Project.match_name('elm court'), self.elm)
+        self.assertEqual(Project.match_name(' ELM '), self.elm)
+
+    def test_partial_and_ambiguous_text_is_not_resolved(self):
+        self.assertIsNone(Project.match_name('Oak'))
+        self.assertIsNone(Project.match_name('Elm Co'))
+        # Both projects list this alias
+        self.assertIsNone(Project.match_name('Oak St'))
+
+    def test_superintendent_inbox_uses_exact_project(self):
+        superintendent = User.objects.create_user('super', password='password')
+        self.oak_street.superintendents.add(superintendent)
+        uploader = User.objects.create_user('uploader', password='password')
+        files = [
+            File.objects.create(name=f'{project}.pdf', uploaded_by=uploader, project=project, vendor='Acme', invoice_number='1', total='$5.00')
+            for project in ['Oak Street', 'Oak']
+        ]
+        for file_obj in files:
+            file_obj.resolve_references()
+            file_obj.save()
+        ApprovalInboxEntry.refresh_files([file_obj.id for file_obj in files])
+
+        self.assertTrue(ApprovalInboxEntry.can_approve(superintendent, files[0]))
+        self.assertFalse(ApprovalInboxEntry.can_approve(superintendent, files[1]))
+
+
+class ProjectRenameResolutionTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Project.objects.all().delete()
+        self.project = Project.objects.create(name='Oak Street')
+        self.files = {
+            text: File.objects.create(name=f'{text}.pdf', uploaded_by=self.admin, project=text, vendor='Acme', invoice_number='1', total='$5.00')
+            for text in ['Oak Street', 'oak st ', 'Maple']
+        }
+        File.resolve_all_references()
+
+    def test_rename_re_resolves_only_files_matching_old_or_new_names(self):
+        with mock.patch.object(File, 'resolve_all_references', wraps=File.resolve_all_references) as resolve:
+            response = self.client.post(
+                f'/projects/update/{self.project.id}/',
+                {'name': 'Oak St', 'address': '', 'aliases': []}, content_type='application/json'
+            )
+        self.assertTrue(response.json()['success'])
+        checked = resolve.call_args.args[0]
+        self.assertEqual(set(checked.values_list('project', flat=True)), {'Oak Street', 'oak st '})
+        refs = {text: File.objects.get(id=file_obj.id).project_ref_id for text, file_obj in self.files.items()}
+        self.assertEqual(refs, {'Oak Street': None, 'oak st ': self.project.id, 'Maple': None})
+
+    def test_delete_re_resolves_files_to_a_matching_alias(self):
+        other = Project.objects.create(name='Oak Avenue', aliases=['Oak Street'])
+        File.resolve_all_references()
+        self.assertTrue(self.client.post(f'/projects/delete/{self.project.id}/').json()['success'])
+        self.assertEqual(File.objects.get(id=self.files['Oak Street'].id).project_ref_id, other.id)
+
+
+class BulkCreateBillsTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Transaction.objects.all().delete()
+        self.files = [
+            File.objects.create(
+                name=f'bill-{number}.pdf', uploaded_by=self.admin, project='Oak Street', vendor='Acme',
+                invoice_number=str(number), total='$10.00', approval_status='approved'
+            )
+            for number in range(3)
+        ]
+        self.transaction = Transaction.objects.create(date=date(2025, 1, 1), description='Acme', amount=Decimal('10.00'))
+
+    def bulk_create(self, entries):
+        return self.client.post('/api/bills/bulk-create/', {'entries': entries, 'mark_as_paid': True}, content_type='application/json').json()
+
+    def test_paid_bill_is_rejected(self):
+        File.objects.filter(id=self.files[0].id).update(is_paid=True, payment_method='check')
+        result = self.bulk_create([{'file_id': self.files[0].id, 'transaction_id': self.transaction.id}])
+        self.assertFalse(result['success'])
+        self.assertEqual(result['results'][0]['message'], 'Bill is already paid')
+        self.assertFalse(BillPayment.objects.exists())
+        self.assertEqual(Transaction.objects.get(id=self.transaction.id).status, 'UNMATCHED')
+
+    def test_transaction_matched_to_another_bill_is_rejected(self):
+        first = self.bulk_create([{'file_id': self.files[0].id, 'transaction_id': self.transaction.id}])
+        self.assertTrue(first['success'])
+        # Again in a later request, and twice in one request
+        later = self.bulk_create([{'file_id': self.files[1].id, 'transaction_id': self.transaction.id}])
+        self.assertEqual(later['results'][0]['message'], 'Transaction is already matched to another bill')
+        BillPayment.objects.all().delete()
+        Transaction.objects.filter(id=self.transaction.id).update(status='UNMATCHED')
+        File.objects.filter(id=self.files[0].id).update(attached_transaction=None, is_paid=False)
+        same = self.bulk_create([
+            {'file_id': self.files[1].id, 'transaction_id': self.transaction.id},
+            {'file_id': self.files[2].id, 'transaction_id': self.transaction.id},
+        ])
+        self.assertEqual([row['success'] for row in same['results']], [True, False])
+        self.assertEqual(same['results'][1]['message'], 'Transaction is used by another entry')
+        self.assertEqual(list(BillPayment.objects.values_list('file_id', flat=True)), [self.files[1].id])
+
+    def test_matched_bill_is_paid_with_its_own_transaction(self):
+        matched = self.bulk_create([{'file_id': self.files[0].id, 'transaction_id': self.transaction.id}])
+        self.assertTrue(matched['success'])
+        other = Transaction.objects.create(date=date(2025, 1, 2), description='Acme', amount=Decimal('10.00'))
+        
+        # With the bill's own transaction, as the bills page sends it, and without one
+        for entry in [{'transaction_id': self.transaction.id, 'payment_method': 'credit_card'}, {'payment_method': 'credit_card'}]:
+            with self.subTest(entry=entry):
+                File.objects.filter(id=self.files[0].id).update(is_paid=False)
+                result = self.bulk_create([{'file_id': self.files[0].id, **entry}])
+                self.assertTrue(result['success'])
+                self.assertEqual(result['results'][0]['transaction_id'], self.transaction.id)
+                self.assertTrue(File.objects.get(id=self.files[0].id).is_paid)
+        File.objects.filter(id=self.files[0].id).update(is_paid=False)
+        # A different transaction is still refused
+        result = self.bulk_create([{'file_id': self.files[0].id, 'transaction_id': other.id}])
+        self.assertEqual(result['results'][0]['message'], 'Bill is already matched to a different transaction')
+        self.assertEqual(BillPayment.objects.count(), 1)
+
+    def test_valid_entries_are_paid_and_the_rest_reported(self):
+        result = self.bulk_create([
+            {'file_id': self.files[0].id, 'payment_method': 'check'},
+            {'file_id': self.files[1].id, 'payment_method': 'check'},
+            {'file_id': self.files[1].id, 'payment_method': 'check'},
+            {'file_id': self.files[2].id, 'payment_method': 'cash'},
+            {'file_id': 999999, 'payment_method': 'check'},
+        ])
+        self.assertTrue(result['success'])
+        self.assertEqual((result['processed_count'], result['failed_count']), (2, 3))
+        self.assertEqual([row['message'] for row in result['results'][2:]], [
+            'Duplicate entry for this file', 'Unknown payment method: cash', 'File not found'
+        ])
+        self.assertEqual(
+            set(File.objects.filter(is_paid=True, payment_method='check').values_list('id', flat=True)), {self.files[0].id, self.files[1].id}
+        )
+        self.assertEqual(BillSummary.objects.filter(is_paid=True).count(), 2)
+
+class BulkFileApprovalTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.selected_class = Class.objects.create(name='Framing Test')
+        self.pending = File.objects.create(
+            name='pending.pdf', uploaded_by=self.admin, project='Oak Street', vendor='Acme', invoice_number='1', total='$5.00'
+        )
+        self.approved = File.objects.create(
+            name='approved.pdf', uploaded_by=self.admin, project='Oak Street', vendor='Acme', invoice_number='2', total='$5.00',
+            approval_status='approved'
+        )
+
+    def bulk_update(self, status, comment=''):
+        return self.client.post('/api/approvals/bulk-update/', {
+            'file_ids': [self.pending.id, self.approved.id], 'approval_status': status,
+            'selected_class_id': self.selected_class.id, 'approval_comment': comment
+        }, content_type='application/json').json()
+
+    def test_staff_can_only_update_files_awaiting_approval(self):
+        result = self.bulk_update('rejected', comment='Wrong vendor')
+        self.assertEqual([row['success'] for row in result['results']], [True, False])
+        self.assertEqual(File.objects.get(id=self.pending.id).approval_status, 'rejected')
+        self.assertEqual(File.objects.get(id=self.approved.id).approval_status, 'approved')
+
+    def test_update_retires_cached_files_page(self):
+        with mock.patch('core.views.bump') as bump:
+            self.bulk_update('approved')
+        bump.assert_called_once_with('files')
+
+
+class LiveUpdateTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.bill = File.objects.create(
+            name='bill.pdf', uploaded_by=self.admin, vendor='Acme', invoice_number='1', total='$5.00', approval_status='approved'
+        )
+        BillSummary.refresh_files([self.bill.id])
+
+    def stream(self, last_event_id, count, serialize_events=serialize_bill_events):
+        async def take():
+            stream = event_stream(last_event_id, serialize_events)
+            items = []
+            async for item in stream:
+                items.append(item)
+                if len(items) == count:
+                    break
+            await stream.aclose()
+            return items
+        return async_to_sync(take)()
+
+    def test_events_are_recorded_once_the_transaction_commits(self):
+        start = latest_event_id()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            files_changed.send(sender=File, kind='paid', file_ids=[self.bill.id])
+            self.assertEqual(latest_event_id(), start)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(list(ChangeEvent.objects.filter(id__gt=start).values_list('kind', 'file_id')), [('paid', self.bill.id)])
+
+    @override_settings(LIVE_UPDATE_POLL_SECONDS=0.01)
+    def test_stream_sends_events_after_the_last_seen_id(self):
+        start = latest_event_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            files_changed.send(sender=File, kind='paid', file_ids=[self.bill.id])
+        retry, paid = self.stream(start, 2)
+        self.assertEqual(retry, 'retry: 10\n\n')
+        event_id, data = paid.split('\n')[:2]
+        self.assertEqual(event_id, f'id: {start + 1}')
+        self.assertEqual(json.loads(data.removeprefix('data: '))['bill']['id'], self.bill.id)
+
+        # Once deleted, the bill is reported as gone from the page
+        bill_id = self.bill.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bill.delete()
+        _, deleted = self.stream(start + 1, 2)
+        self.assertTrue(deleted.startswith(f'id: {start + 2}\n'))
+        self.assertEqual(json.loads(deleted.split('\n')[1].removeprefix('data: ')), {'file_id': bill_id, 'kind': 'deleted', 'bill': None})
+
+    def test_endpoint_is_not_streamed_under_wsgi(self):
+        self.assertEqual(self.client.get('/api/events/', {'page': 'bills'}).status_code, 204)
+
+class MatchingFixturesMixin:
+    def setUp(self):
+        Transaction.objects.all().delete()
+        self.uploader = User.objects.create_user('uploader', password='password')
+
+    def bill(self, amount, vendor='Acme Supply', invoice_date=date(2025, 3, 1), **fields):
+        return File.objects.create(
+            name=f'{vendor}-{amount}.pdf', uploaded_by=self.uploader, project='Oak Street', vendor=vendor,
+            invoice_number=str(amount), total=f'${amount}', amount=Decimal(amount), invoice_date=invoice_date,
+            approval_status='approved', **fields
+        )
+
+    def charge(self, amount, description='ACME SUPPLY 0001', charge_date=date(2025, 3, 2), **fields):
+        return Transaction.objects.create(date=charge_date, description=description, amount=Decimal(amount), **fields)
+
+
+class MatchingEngineTests(MatchingFixturesMixin, TestCase):
+    def candidate(self, file_id, transaction_id, score):
+        return Candidate(SimpleNamespace(id=file_id), SimpleNamespace(id=transaction_id), score, {})
+
+    def test_score_combines_amount_date_vendor_and_card_holder(self):
+        context = MatchContext(bills=[])
+        bill = self.bill('50.00')
+        exact = score_pair(context, bill, 5000, bill.invoice_date, self.charge('50.00', card_user=self.uploader))
+        self.assertEqual(exact[0], round(0.4 + 0.25 * (1 - 1 / 30) + 0.25 + 0.1, 4))
+        self.assertEqual(exact[1]['days_apart'], 1)
+        off_by_a_cent = score_pair(context, bill, 5000, bill.invoice_date, self.charge('50.01', description='OTHER'))
+        self.assertEqual(off_by_a_cent[1]['amount'], 0.8)
+        self.assertEqual(off_by_a_cent[1]['vendor'], 0.0)
+        self.assertIsNone(score_pair(context, bill, 5000, bill.invoice_date, self.charge('50.00', charge_date=date(2025, 6, 1))))
+
+    def test_assignment_maximizes_total_score(self):
+        candidates = [self.candidate(1, 1, 0.9), self.candidate(1, 2, 0.8), self.candidate(2, 1, 0.85)]
+        assigned = {(c.file.id, c.transaction.id) for c in assign_candidates(candidates)}
+        self.assertEqual(assigned, {(1, 2), (2, 1)})
+        # Components too large to solve exactly are assigned greedily
+        with mock.patch('core.matching.EXACT_ASSIGNMENT_LIMIT', 0):
+            assigned = {(c.file.id, c.transaction.id) for c in assign_candidates(candidates)}
+        self.assertEqual(assigned, {(1, 1)})
+
+    def test_run_matching_suggests_and_auto_accepts(self):
+        strong = self.bill('50.00')
+        weak = self.bill('75.00', vendor='Zeta Lumber', invoice_date=None)
+        strong_charge = self.charge('50.00', card_user=self.uploader)
+        weak_charge = self.charge('75.00', description='UNKNOWN MERCHANT')
+
+        result = run_matching(auto_accept_threshold=0.9)
+
+        self.assertEqual(result.accepted_count, 1)
+        self.assertEqual({(c.file.id, c.transaction.id) for c in result.suggestions}, {(strong.id, strong_charge.id), (weak.id, weak_charge.id)})
+        strong.refresh_from_db()
+        self.assertEqual(strong.attached_transaction, strong_charge)
+        self.assertEqual(Transaction.objects.get(id=strong_charge.id).status, 'MATCHED')
+        self.assertTrue(BillSummary.objects.get(file=strong).is_matched)
+        self.assertTrue(MatchSuggestion.objects.filter(file=weak, transaction=weak_charge, status='suggested').exists())
+
+    def test_rejected_pairs_are_not_suggested_again(self):
+        bill = self.bill('50.00')
+        charge = self.charge('50.00')
+        MatchSuggestion.objects.create(file=bill, transaction=charge, score=0.9, details={}, status='rejected')
+        self.assertEqual(run_matching().suggestions, [])
+
+
+class SplitMatchingTests(MatchingFixturesMixin, TestCase):
+    def test_subset_sum_prefers_the_closest_total_then_fewest_parts(self):
+        self.assertEqual(find_subset_sum([500, 300, 200, 700], 1000), [1, 3])
+        self.assertEqual(find_subset_sum([400, 601], 1000), [0, 1])
+        self.assertIsNone(find_subset_sum([400, 700], 1000))
+        # A single amount is not a split
+        self.assertIsNone(find_subset_sum([1000, 5], 1000))
+        self.assertIsNone(find_subset_sum([100] * 10, 1000, max_parts=6))
+
+    def test_search_stops_at_the_deadline(self):
+        with self.assertRaises(SplitMatchTimeout):
+            find_subset_sum([100, 200, 300], 500, deadline=time.monotonic() - 1)
+
+    def test_one_charge_paying_two_bills_is_matched_as_a_group(self):
+        first, second = self.bill('60.00'), self.bill('40.00')
+        self.bill('25.00', vendor='Zeta Lumber')
+        charge = self.charge('100.00', charge_date=date(2025, 3, 1))
+
+        result = run_matching(auto_accept_threshold=0.9, include_splits=True)
+
+        self.assertEqual(result.split_count, 1)
+        group = [c for c in result.suggestions if c.group_key]
+        self.assertEqual({c.file.id for c in group}, {first.id, second.id})
+        self.assertEqual(len({c.group_key for c in group}), 1)
+        self.assertEqual(
+            dict(BillPayment.objects.filter(transaction=charge).values_list('file_id', 'amount')),
+            {first.id: Decimal('60.00'), second.id: Decimal('40.00')}
+        )
+
+    def test_one_bill_paid_by_two_charges(self):
+        bill = self.bill('90.00')
+        charges = [self.charge('50.00'), self.charge('40.00')]
+        result = run_matching(include_splits=True)
+        self.assertEqual({c.transaction.id for c in result.suggestions if c.file.id == bill.id}, {c.id for c in charges})
+
+
+class IncrementalMatchingTests(TestCase):
+    def setUp(self):
+        Transaction.objects.all().delete()
+        self.superintendent = User.objects.create_user('super', password='password')
+        self.project = Project.objects.create(name='Match Street')
+        self.project.superintendents.add(self.superintendent)
+        Project.objects.create(name='Unrelated Project').superintendents.add(self.superintendent)
+        self.vendor = Vendor.objects.create(name='Matchco Lumber', aliases=['MLC Yard'])
+        Vendor.objects.create(name='Unrelated Vendor')
+        self.bill = File.objects.create(
+            name='bill.pdf', uploaded_by=self.superintendent, project='Match Street', vendor='matchco lumber',
+            invoice_number='7', total='$42.00', amount=Decimal('42.00'), invoice_date=date(2025, 2, 1),
+            approval_status='approved'
+        )
+        self.bill.resolve_references()
+        self.bill.save()
+
+    def test_context_loads_only_the_bills_vendors_and_projects(self):
+        context = MatchContext(bills=[self.bill])
+        self.assertEqual(list(context.vendor_names), ['MATCHCO LUMBER'])
+        self.assertEqual(list(context.project_superintendents), ['Match Street'])
+
+    def test_new_transaction_is_scored_with_vendor_alias(self):
+        transaction = Transaction.objects.create(
+            date=date(2025, 2, 2), description='MLC YARD 0042', amount=Decimal('42.00'), card_user=self.superintendent
+        )
+        result = match_new_transactions([transaction.id])
+        self.assertEqual(len(result.suggestions), 1)
+        self.assertEqual(result.suggestions[0].details['vendor'], 1.0)
+        self.assertEqual(result.suggestions[0].details['card_holder'], 1.0)
+        self.assertTrue(MatchSuggestion.objects.filter(file=self.bill, transaction=transaction, status='suggested').exists())
+
+    def test_only_bills_in_the_amount_and_date_window_are_loaded(self):
+        File.objects.create(
+            name='old.pdf', uploaded_by=self.superintendent, project='Match Street', vendor='matchco lumber',
+            invoice_number='8', total='$42.00', amount=Decimal('42.00'), invoice_date=date(2024, 1, 1), approval_status='approved'
+        )
+        File.objects.create(
+            name='other.pdf', uploaded_by=self.superintendent, project='Match Street', vendor='matchco lumber',
+            invoice_number='9', total='$43.00', amount=Decimal('43.00'), invoice_date=date(2025, 2, 1), approval_status='approved'
+        )
+        transaction = Transaction.objects.create(date=date(2025, 2, 2), description='MATCHCO LUMBER', amount=Decimal('42.01'))
+        result = match_new_transactions([transaction.id])
+        self.assertEqual(result.bill_count, 1)
+        self.assertEqual([c.file for c in result.suggestions], [self.bill])
+
+    def test_earlier_suggestions_are_kept(self):
+        first = Transaction.objects.create(date=date(2025, 2, 2), description='MATCHCO LUMBER', amount=Decimal('42.00'))
+        match_new_transactions([first.id])
+        second = Transaction.objects.create(date=date(2025, 2, 3), description='MATCHCO LUMBER', amount=Decimal('42.00'))
+        match_new_transactions([second.id])
+        self.assertEqual(
+            set(MatchSuggestion.objects.filter(file=self.bill).values_list('transaction_id', flat=True)), {first.id, second.id}
+        )
+
+
+class SuperintendentInboxTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Counts are cached by user id, which the test database reuses
+        cache.clear()
+        Project.objects.all().delete()
+        self.superintendent = User.objects.create_user('super', password='password')
+        self.superintendent.groups.add(Group.objects.get_or_create(name='Superintendent')[0])
+        self.oak, self.elm = [Project.objects.create(name=name) for name in ['Oak Street', 'Elm Court']]
+        self.oak_file, self.elm_file = [
+            File.objects.create(name=f'{project}.pdf', uploaded_by=self.admin, project=project, vendor='Acme', invoice_number='1', total='$5.00')
+            for project in ['Oak Street', 'Elm Court']
+        ]
+        File.resolve_all_references()
+
+    def assign(self, project, users):
+        return self.client.post(
+            f'/api/projects/{project.id}/assign-superintendents/',
+            {'superintendent_ids': [user.id for user in users]}, content_type='application/json'
+        ).json()
+
+    def test_assignment_refreshes_only_that_projects_files(self):
+        self.assertTrue(self.assign(self.oak, [self.superintendent])['success'])
+        self.assertEqual(list(ApprovalInboxEntry.files_for(self.superintendent)), [self.oak_file])
+        with mock.patch.object(ApprovalInboxEntry, 'rebuild') as rebuild:
+            self.assign(self.elm, [self.superintendent])
+        rebuild.assert_not_called()
+        self.assertEqual(set(ApprovalInboxEntry.files_for(self.superintendent)), {self.oak_file, self.elm_file})
+
+    def test_pending_count_is_cached_until_the_inbox_changes(self):
+        self.assertEqual(ApprovalInboxEntry.pending_count(self.superintendent), 0)
+        with self.assertNumQueries(0):
+            ApprovalInboxEntry.pending_count(self.superintendent)
+        self.assign(self.oak, [self.superintendent])
+        self.assertEqual(ApprovalInboxEntry.pending_count(self.superintendent), 1)
+        self.assertEqual(ApprovalInboxEntry.pending_count(self.admin), 2)
+        File.objects.create(name='new.pdf', uploaded_by=self.admin, project='Elm Court', vendor='Acme', invoice_number='2', total='$5.00')
+        self.assertEqual(ApprovalInboxEntry.pending_count(self.admin), 3)
+
+    def test_superintendent_approves_only_inbox_files_which_then_leave_it(self):
+        self.assign(self.oak, [self.superintendent])
+        selected_class = Class.objects.create(name='Framing Test')
+        self.client.force_login(self.superintendent)
+        result = self.client.post('/api/approvals/bulk-update/', {
+            'file_ids': [self.oak_file.id, self.elm_file.id], 'approval_status': 'approved', 'selected_class_id': selected_class.id
+        }, content_type='application/json').json()
+        self.assertEqual([row['success'] for row in result['results']], [True, False])
+        self.assertEqual(File.objects.get(id=self.elm_file.id).approval_status, 'pending')
+        self.assertEqual(list(ApprovalInboxEntry.files_for(self.superintendent)), [])
+        self.assertEqual(ApprovalInboxEntry.pending_count(self.superintendent), 0)
+
+class BulkVendorClassTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.framing, self.roofing = [Class.objects.create(name=name) for name in ['Framing Test', 'Roofing Test']]
+        self.lumber_a, self.lumber_b = [Vendor.objects.create(name=name, category='Lumber') for name in ['Lumberco A', 'Lumberco B']]
+        self.shingles = Vendor.objects.create(name='Shingleco', category='Roofing')
+        self.lumber_b.classes.add(self.roofing)
+
+    def assign(self, **payload):
+        return self.client.post('/api/vendors/bulk-assign-classes/', payload, content_type='application/json').json()
+
+    def classes(self, vendor):
+        return set(vendor.classes.values_list('name', flat=True))
+
+    def test_assignments_replace_or_add_classes(self):
+        result = self.assign(assignments={self.lumber_b.id: [self.framing.id], 999999: [self.framing.id]})
+        self.assertEqual((result['vendor_ids'], result['unknown_vendor_ids']), ([self.lumber_b.id], [999999]))
+        self.assertEqual(self.classes(self.lumber_b), {'Framing Test'})
+        self.assign(assignments={self.lumber_b.id: [self.roofing.id]}, mode='add')
+        self.assertEqual(self.classes(self.lumber_b), {'Framing Test', 'Roofing Test'})
+        # The cached class tree sees the new assignments
+        self.assertEqual(next(node for node in Class.cached_tree() if node['id'] == self.framing.id)['vendor_count'], 1)
+
+    def test_category_rules_can_skip_vendors_with_classes(self):
+        result = self.assign(rules=[{'category': 'lumber', 'class_ids': [self.framing.id]}], only_unassigned=True)
+        self.assertEqual(result['vendor_ids'], [self.lumber_a.id])
+        self.assertEqual(self.classes(self.lumber_a), {'Framing Test'})
+        self.assertEqual(self.classes(self.lumber_b), {'Roofing Test'})
+        self.assertEqual(self.classes(self.shingles), set())
+
+    def test_unknown_classes_and_modes_change_nothing(self):
+        self.assertEqual(self.assign(assignments={self.lumber_a.id: [999999]})['message'], 'Unknown class ids: 999999')
+        self.assertFalse(self.assign(assignments={self.lumber_a.id: [self.framing.id]}, mode='merge')['success'])
+        self.assertEqual(self.classes(self.lumber_a), set())
+
+class ClassSuggestionRecordTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.vendor = Vendor.objects.create(name='Suggestco')
+        self.framing, self.roofing = [Class.objects.create(name=name) for name in ['Framing Test', 'Roofing Test']]
+        self.file = File.objects.create(
+            name='invoice.pdf', uploaded_by=self.admin, project='Nowhere', vendor='Suggestco', invoice_number='1', total='$5.00'
+        )
+        self.file.resolve_references()
+        self.file.save()
+
+    def approve(self, selected_class):
+        return self.client.post('/api/approvals/update/', {
+            'file_id': self.file.id, 'approval_status': 'approved', 'selected_class_id': selected_class.id
+        }, content_type='application/json').json()
+
+    def counts(self):
+        return dict(ClassSuggestion.objects.values_list('selected_class__name', 'count'))
+
+    def test_reapproving_counts_only_a_changed_class(self):
+        self.assertTrue(self.approve(self.framing)['success'])
+        self.approve(self.framing)
+        self.assertEqual(self.counts(), {'Framing Test': 1})
+        self.approve(self.roofing)
+        self.assertEqual(self.counts(), {'Framing Test': 1, 'Roofing Test': 1})
+
+    def test_rows_without_a_project_are_unique(self):
+        ClassSuggestion.objects.create(vendor=self.vendor, selected_class=self.framing, count=1, last_used=timezone.now())
+        with self.assertRaises(IntegrityError):
+            ClassSuggestion.objects.create(vendor=self.vendor, selected_class=self.framing, count=1, last_used=timezone.now())
+
+
+class ClassSuggestionTests(TestCase):
+    def setUp(self):
+        self.uploader = User.objects.create_user('uploader')
+        self.oak, self.elm = [Project.objects.create(name=name) for name in ['Oak Test', 'Elm Test']]
+        self.vendor = Vendor.objects.create(name='Suggestco')
+        self.framing, self.roofing, self.retired = [
+            Class.objects.create(name=name, is_active=name != 'Retired Test') for name in ['Framing Test', 'Roofing Test', 'Retired Test']
+        ]
+
+    def file(self, project, vendor=None):
+        return File.objects.create(name='bill.pdf', uploaded_by=self.uploader, project_ref=project, vendor_ref=vendor or self.vendor)
+
+    def history(self, project, class_obj, count):
+        ClassSuggestion.objects.create(vendor=self.vendor, project=project, selected_class=class_obj, count=count, last_used=timezone.now())
+
+    def test_project_history_wins_over_the_vendors_overall_history(self):
+        self.history(self.oak, self.roofing, 1)
+        self.history(self.elm, self.framing, 3)
+        self.history(self.elm, self.retired, 9)
+        oak_file, elm_file, new_project_file = self.file(self.oak), self.file(self.elm), self.file(None)
+        # The vendor has history, so its assigned classes are not looked up
+        with self.assertNumQueries(1):
+            suggestions = ClassSuggestion.suggest([oak_file, elm_file, new_project_file])
+        self.assertEqual(suggestions, {oak_file.id: self.roofing.id, elm_file.id: self.framing.id, new_project_file.id: self.framing.id})
+
+    def test_vendor_without_history_falls_back_to_its_only_class(self):
+        single = Vendor.objects.create(name='Singleco')
+        single.classes.add(self.framing, self.retired)
+        double = Vendor.objects.create(name='Doubleco')
+        double.classes.add(self.framing, self.roofing)
+        single_file, double_file = self.file(self.oak, single), self.file(self.oak, double)
+        self.assertEqual(ClassSuggestion.suggest([single_file, double_file]), {single_file.id: self.framing.id})
+
+class ClassTreeCacheTests(TestCase):
+    def setUp(self):
+        # Tree versions live in the cache, which outlasts each test's database
+        cache.clear()
+        Class.objects.all().delete()
+        self.materials = Class.objects.create(name='Materials')
+        self.lumber = Class.objects.create(name='Lumber', parent=self.materials)
+        self.vendor = Vendor.objects.create(name='Treeco')
+
+    def node(self, class_obj):
+        return next(node for node in Class.cached_tree() if node['id'] == class_obj.id)
+
+    def test_tree_carries_counts_and_names_and_is_served_from_cache(self):
+        self.vendor.classes.add(self.lumber)
+        lumber = self.node(self.lumber)
+        self.assertEqual((lumber['vendor_count'], lumber['parent_name'], lumber['full_name']), (1, 'Materials', 'Materials - Lumber'))
+        self.assertEqual((self.node(self.materials)['is_parent'], self.node(self.materials)['children_count']), (True, 1))
+        with self.assertNumQueries(0):
+            Class.cached_tree()
+
+    def test_class_and_vendor_changes_replace_the_cached_tree(self):
+        Class.cached_tree()
+        self.lumber.name = 'Framing Lumber'
+        self.lumber.save()
+        self.assertEqual(self.node(self.lumber)['name'], 'Framing Lumber')
+        self.vendor.classes.add(self.lumber)
+        self.assertEqual(self.node(self.lumber)['vendor_count'], 1)
+        self.vendor.delete()
+        self.assertEqual(self.node(self.lumber)['vendor_count'], 0)
+        self.lumber.delete()
+        self.assertEqual([node['name'] for node in Class.cached_tree()], ['Materials'])
+
+class ClassPathTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Class.objects.all().delete()
+        self.materials = Class.objects.create(name='Materials')
+        self.lumber = Class.objects.create(name='Lumber', parent=self.materials)
+        self.studs = Class.objects.create(name='Studs', parent=self.lumber)
+        self.labor = Class.objects.create(name='Labor')
+
+    def bill(self, class_obj, amount, invoice_date=date(2025, 6, 1)):
+        file_obj = File.objects.create(
+            name='bill.pdf', uploaded_by=self.admin, vendor='Acme', invoice_number='1', total=f'${amount}', amount=Decimal(amount),
+            invoice_date=invoice_date, selected_class=class_obj, approval_status='approved'
+        )
+        BillSummary.refresh_files([file_obj.id])
+
+    def test_moving_a_class_rewrites_its_descendants(self):
+        self.studs.refresh_from_db()
+        self.assertEqual(self.studs.path, Class.path_segment(self.materials.id) + Class.path_segment(self.lumber.id) + Class.path_segment(self.studs.id))
+        self.assertEqual(self.studs.depth, 2)
+
+        self.lumber.parent = self.labor
+        self.lumber.save()
+        self.studs.refresh_from_db()
+        self.assertEqual(Class.path_ids(self.studs.path), [self.labor.id, self.lumber.id, self.studs.id])
+        self.assertEqual(set(self.labor.subtree().values_list('name', flat=True)), {'Labor', 'Lumber', 'Studs'})
+
+    def test_a_class_cannot_move_under_its_own_subclass(self):
+        self.materials.parent = self.studs
+        with self.assertRaises(ValueError):
+            self.materials.save()
+        response = self.client.post('/api/classes/update/', {
+            'class_id': self.materials.id, 'name': 'Materials', 'parent_id': self.studs.id
+        }, content_type='application/json').json()
+        self.assertFalse(response['success'])
+        self.assertIsNone(Class.objects.get(id=self.materials.id).parent_id)
+
+    def test_rebuild_paths_after_bulk_writes(self):
+        Class.objects.filter(id=self.lumber.id).update(parent=self.labor)
+        Class.rebuild_paths()
+        self.assertEqual(Class.path_ids(Class.objects.get(id=self.studs.id).path), [self.labor.id, self.lumber.id, self.studs.id])
+
+    def test_rollup_sums_each_subtree(self):
+        self.bill(self.materials, '10.00')
+        self.bill(self.lumber, '20.00')
+        self.bill(self.studs, '5.00', invoice_date=date(2025, 7, 1))
+        self.bill(self.labor, '100.00')
+
+        response = self.client.get('/api/classes/rollup/').json()
+        totals = {row['full_name']: (row['total'], row['bill_count'], row['direct_total']) for row in response['classes']}
+        self.assertEqual(totals, {
+            'Materials': ('35.00', 3, '10.00'),
+            'Materials - Lumber': ('25.00', 2, '20.00'),
+            'Materials - Lumber - Studs': ('5.00', 1, '5.00'),
+            'Labor': ('100.00', 1, '100.00'),
+        })
+        response = self.client.get('/api/classes/rollup/', {'class_id': self.lumber.id, 'date_to': '2025-06-30'}).json()
+        self.assertEqual([(row['name'], row['total']) for row in response['classes']], [('Lumber', '20.00'), ('Studs', '0.00')])
+
+class BulkUpsertTests(TestCase):
+    def setUp(self):
+        Project.objects.all().delete()
+        self.oak = Project.objects.create(name='Oak Street', address='1 Oak', builders_fee=Decimal('5.00'))
+        self.elm = Project.objects.create(name='Elm Court', address='2 Elm')
+
+    def records(self):
+        return {
+            'Oak Street': {'builders_fee': '5.0'},
+            'Elm Court': {'address': '22 Elm'},
+            'Pine Road': {'address': '3 Pine'},
+        }
+
+    def test_upsert_creates_updates_and_skips_unchanged_rows(self):
+        stamp = Project.objects.get(id=self.elm.id).updated_at
+        result = upsert(Project, 'name', self.records(), defaults={'usage_count': 3})
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 1))
+        self.assertEqual(result.changes, [
+            ('update', 'Elm Court', {'address': ('2 Elm', '22 Elm')}),
+            ('create', 'Pine Road', {'address': (None, '3 Pine')}),
+        ])
+        elm = Project.objects.get(id=self.elm.id)
+        self.assertEqual((elm.address, elm.usage_count), ('22 Elm', 0))
+        self.assertGreater(elm.updated_at, stamp)
+        self.assertEqual(Project.objects.get(name='Pine Road').usage_count, 3)
+        self.assertEqual(result.objects['Pine Road'].pk, Project.objects.get(name='Pine Road').pk)
+
+    def test_dry_run_reports_without_writing(self):
+        result = upsert(Project, 'name', self.records(), dry_run=True)
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 1))
+        self.assertFalse(Project.objects.filter(name='Pine Road').exists())
+        self.assertEqual(Project.objects.get(id=self.elm.id).address, '2 Elm')
+
+        out = StringIO()
+        write_report(OutputWrapper(out), 'Projects', result, dry_run=True, limit=1)
+        self.assertEqual(out.getvalue().splitlines(), [
+            'Projects (dry run): 1 to create, 1 to update, 1 unchanged',
+            "  ~ Elm Court: address '2 Elm' -> '22 Elm'",
+            '  ... and 1 more (use -v 2 to list all)',
+        ])
+
+    def test_catalog_import_resolves_file_references(self):
+        Vendor.objects.filter(name='Catalogco').delete()
+        uploader = User.objects.create_user('uploader')
+        file_obj = File.objects.create(name='bill.pdf', uploaded_by=uploader, vendor='CATCO', total='$1.00')
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as catalog:
+            json.dump({'vendors': [{'name': 'Catalogco', 'aliases': ['Catco'], 'category': 'Lumber'}, {'category': 'Unnamed'}]}, catalog)
+        self.addCleanup(os.remove, catalog.name)
+
+        out = StringIO()
+        call_command('import_catalog', vendors=catalog.name, dry_run=True, stdout=out)
+        self.assertIn('Vendors (dry run): 1 to create', out.getvalue())
+        self.assertFalse(Vendor.objects.filter(name='Catalogco').exists())
+
+        call_command('import_catalog', vendors=catalog.name, stdout=StringIO())
+        self.assertEqual(File.objects.get(id=file_obj.id).vendor_ref, Vendor.objects.get(name='Catalogco'))
+
+class UserListTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        # The payload is cached under a fixed key that outlasts each test's database
+        cache.clear()
+        super().setUp()
+        self.foreman = User.objects.create_user('foreman', first_name='Fay', last_name='Oak')
+        self.foreman.groups.add(Group.objects.get_or_create(name='Superintendent')[0])
+
+    def row(self, user):
+        return next(row for row in UserProfile.user_list() if row['id'] == user.id)
+
+    def test_every_user_gets_a_profile(self):
+        self.assertTrue(UserProfile.objects.filter(user=self.foreman).exists())
+        response = self.client.post('/api/users/create/', {
+            'username': 'clerk', 'email': 'clerk@example.com', 'password': 'password'
+        }, content_type='application/json').json()
+        self.assertTrue(response['success'])
+        self.assertTrue(UserProfile.objects.filter(user__username='clerk').exists())
+
+    def test_payload_is_cached_until_users_profiles_or_groups_change(self):
+        self.assertEqual((self.row(self.foreman)['full_name'], self.row(self.foreman)['all_roles']), ('Fay Oak', ['Superintendent']))
+        with self.assertNumQueries(0):
+            UserProfile.user_list()
+
+        self.foreman.profile.card_number = '4321'
+        self.foreman.profile.save()
+        self.assertEqual(self.row(self.foreman)['card_number'], '4321')
+        self.foreman.groups.clear()
+        self.assertEqual(self.row(self.foreman)['primary_role'], 'No Role')
+
+    def test_users_page_lists_roles(self):
+        response = self.client.get('/users/')
+        rows = {row['username']: row for row in response.context['user_profiles']}
+        self.assertEqual(rows['foreman']['primary_role'], 'Superintendent')
+        self.assertContains(response, 'Fay Oak')
+
+class RolesTests(TestCase):
+    def setUp(self):
+        # Roles are cached by user id, which the test database reuses
+        cache.clear()
+        self.user = User.objects.create_user('foreman', password='password')
+        self.superintendents = Group.objects.get_or_create(name='Superintendent')[0]
+
+    def test_roles_are_cached_until_the_users_groups_change(self):
+        self.assertEqual(get_roles(self.user).groups, [])
+        with self.assertNumQueries(0):
+            get_roles(self.user)
+        self.user.groups.add(self.superintendents)
+        self.assertTrue(get_roles(self.user).is_superintendent)
+        # From the group's side, and for changes that touch every member
+        self.superintendents.user_set.remove(self.user)
+        self.assertEqual(get_roles(self.user).primary_role, 'No Role')
+        self.user.groups.add(self.superintendents)
+        get_roles(self.user)
+        self.superintendents.name = 'Site Lead'
+        self.superintendents.save()
+        self.assertEqual(get_roles(self.user).groups, ['Site Lead'])
+
+    def test_has_perm_matches_the_model_backend(self):
+        self.superintendents.permissions.add(Permission.objects.get(codename='view_file'))
+        self.user.groups.add(self.superintendents)
+        roles = get_roles(self.user)
+        user = User.objects.get(id=self.user.id)
+        for perm in ['core.view_file', 'core.change_file']:
+            self.assertEqual(roles.has_perm(perm), user.has_perm(perm), perm)
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        invalidate_roles(self.user.id)
+        self.assertFalse(get_roles(User.objects.get(id=self.user.id)).has_perm('core.view_file'))
+
+    def test_request_roles_drive_page_access(self):
+        self.user.groups.add(self.superintendents)
+        self.client.force_login(self.user)
+        response = self.client.get('/bills/')
+        self.assertRedirects(response, '/approvals/', fetch_redirect_response=False)
+        self.assertTrue(response.wsgi_request.roles.is_superintendent)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/bills/').status_code, 200)
+
+class VersionedCacheTests(AdminClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        reset_stats()
+        self.read = CachedRead('test_vendor_names', ['vendors'])
+        self.addCleanup(CachedRead.registry.pop, 'test_vendor_names')
+        self.builds = 0
+
+    def vendor_names(self):
+        def build():
+            self.builds += 1
+            return sorted(Vendor.objects.values_list('name', flat=True))
+        return self.read.get(build, 'all')
+
+    def test_bump_retires_only_its_namespaces(self):
+        vendors_key = versioned_key('page', ['vendors'], 'search text')
+        files_key = versioned_key('page', ['files'])
+        self.assertEqual(versioned_key('page', ['vendors'], 'search text'), vendors_key)
+        self.assertNotEqual(versioned_key('page', ['vendors'], 'other text'), vendors_key)
+        bump('vendors')
+        self.assertNotEqual(versioned_key('page', ['vendors'], 'search text'), vendors_key)
+        self.assertEqual(versioned_key('page', ['files']), files_key)
+
+    def test_reads_are_rebuilt_after_model_writes(self):
+        self.vendor_names()
+        self.vendor_names()
+        self.assertEqual(self.builds, 1)
+        vendor = Vendor.objects.create(name='Cacheco')
+        self.assertIn('Cacheco', self.vendor_names())
+        vendor.delete()
+        self.assertNotIn('Cacheco', self.vendor_names())
+        self.assertEqual(self.builds, 3)
+        # Writes to other models leave the entry alone
+        Project.objects.create(name='Cache Street')
+        self.vendor_names()
+        self.assertEqual(self.builds, 3)
+
+    def test_hits_and_misses_are_reported_and_reset(self):
+        self.vendor_names()
+        self.vendor_names()
+        self.vendor_names()
+        response = self.client.get('/api/cache/stats/').json()
+        self.assertEqual(response['reads']['test_vendor_names'], {'namespaces': ['vendors'], 'hits': 2, 'misses': 1, 'hit_rate': 0.667})
+        self.assertTrue(self.client.post('/api/cache/stats/reset/').json()['success'])
+        self.assertEqual(read_stats()['test_vendor_names']['hit_rate'], None)
+
+class ImportClassesDryRunTests(TestCase):
+    def setUp(self):
+        Class.objects.all().delete()
+        self.parent = Class.objects.create(name='OLD PARENT')
+        Class.objects.create(name='Drywall', parent=self.parent)
+        Class.objects.create(name='Paint')
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'FINISHES': ['Drywall', 'Paint', 'Tile']}, f)
+        self.addCleanup(os.remove, self.path)
+
+    def dry_run(self, *args):
+        out = StringIO()
+        call_command('import_classes', '--file', self.path, '--dry-run', *args, stdout=out)
+        return out.getvalue()
+
+    def test_children_moving_to_a_new_parent_report_its_name(self):
+        output = self.dry_run()
+        self.assertIn("~ Drywall: parent 'OLD PARENT' -> 'FINISHES'", output)
+        self.assertIn("~ Paint: parent None -> 'FINISHES'", output)
+        self.assertIn('+ Tile', output)
+        self.assertEqual(Class.objects.get(name='Drywall').parent, self.parent)
+        self.assertFalse(Class.objects.filter(name='FINISHES').exists())
+
+    def test_clear_is_reflected_and_rolled_back(self):
+        output = self.dry_run('--clear')
+        self.assertIn('Would delete 3 existing classes', output)
+        self.assertIn('Child classes (dry run): 3 to create, 0 to update', output)
+        self.assertEqual(Class.objects.count(), 3)
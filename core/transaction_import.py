@@ -0,0 +1,273 @@
+"""Background import of QuickBooks CSV statements into Transaction rows.
+
+Uploads are stored on an ImportBatch and processed outside the request,
+either by the ``process_transaction_imports`` worker command or, when
+``TRANSACTION_IMPORT_MODE`` is ``'thread'``, by a thread in the web process.
+Each step's new transactions are matched against open bills as they land.
+
+A running import reports a heartbeat with every step. If the process running
+it exits mid-import the heartbeat stops, and recover_stale_imports() marks the
+batch failed so it can be rolled back and uploaded again. The worker calls
+it on every poll; the import list and rollback views, and uploads in
+'thread' mode, call it too.
+"""
+import csv
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ImportBatch, Transaction, UserProfile
+from .matching import match_new_transactions, get_import_auto_accept_threshold
+
+# Number of CSV rows parsed, checked for duplicates and inserted per step
+CSV_IMPORT_BATCH_SIZE = 500
+
+DATE_FORMATS = ['%m/%d/%y', '%m/%d/%Y', '%Y-%m-%d', '%m-%d-%Y', '%d/%m/%Y']
+
+# Largest amount Transaction.amount can store
+_amount_field = Transaction._meta.get_field('amount')
+MAX_AMOUNT = Decimal(10) ** (_amount_field.max_digits - _amount_field.decimal_places) - Decimal(10) ** -_amount_field.decimal_places
+
+# Seconds without a heartbeat after which a processing import is treated as abandoned
+STALE_IMPORT_SECONDS = 600
+
+
+def parse_csv_row(row):
+    """Map one QuickBooks CSV row to Transaction field values.
+
+    Returns None for rows that should be skipped silently (blank lines, rows
+    without an amount) and raises ValueError for rows that are malformed.
+    """
+    # Handle the specific format: Date, DESCRIPTION, Payee, Categorize or match, SPENT, RECEIVED
+    # Try different possible column names (including BOM variants)
+    date_str = (row.get('Date') or row.get('\ufeffDate') or row.get('date') or '').strip()
+    description = (row.get('DESCRIPTION') or row.get('description') or '').strip()
+    payee = (row.get('Payee') or row.get('payee') or '').strip()
+    category = (row.get('Categorize or match') or row.get('category') or '').strip()
+    spent_str = (row.get('SPENT') or row.get('spent') or '').strip()
+    received_str = (row.get('RECEIVED') or row.get('received') or '').strip()
+
+    # Skip empty rows
+    if not date_str or not description:
+        return None
+
+    # SPENT amounts are charges, RECEIVED amounts are credits
+    if spent_str:
+        amount_str = spent_str
+        transaction_type = 'CHARGE'
+    elif received_str:
+        amount_str = received_str
+        transaction_type = 'CREDIT'
+    else:
+        return None
+
+    date_obj = None
+    for date_format in DATE_FORMATS:
+        try:
+            date_obj = datetime.strptime(date_str, date_format).date()
+            break
+        except ValueError:
+            continue
+
+    if not date_obj:
+        raise ValueError(f"Invalid date format '{date_str}'")
+
+    try:
+        amount = Decimal(amount_str.replace('$', '').replace(',', '').strip())
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError(f"Invalid amount format '{amount_str}'")
+    # Decimal() also accepts 'NaN' and 'Infinity', which cannot be stored
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount format '{amount_str}'")
+    if abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"Amount '{amount_str}' is larger than {MAX_AMOUNT:,}")
+
+    return {
+        'date': date_obj,
+        'amount': amount,
+        'description': description,
+        'transaction_type': transaction_type,
+        'card_holder': payee or 'Unknown',
+        'tags': [category] if category else [],
+    }
+
+
+def run_import(import_batch):
+    """Import every row of a stored CSV, updating the batch's progress as it goes"""
+    import_batch.status = 'processing'
+    import_batch.started_at = import_batch.heartbeat_at = timezone.now()
+    import_batch.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+
+    try:
+        with import_batch.source_file.open('rb') as f:
+            decoded_file = f.read().decode('utf-8-sig')  # Handle BOM
+        rows = list(csv.DictReader(decoded_file.splitlines()))
+
+        import_batch.total_rows = len(rows)
+        import_batch.save(update_fields=['total_rows'])
+
+        card_map = UserProfile.card_user_map()
+        auto_accept_threshold = get_import_auto_accept_threshold()
+        occurrences = {}
+        errors = []
+        processed_rows = 0
+        inserted_count = 0
+        skipped_count = 0
+        matched_count = 0
+        suggested_count = 0
+
+        for start in range(0, len(rows), CSV_IMPORT_BATCH_SIZE):
+            pending_transactions = []
+            for row_num, row in enumerate(rows[start:start + CSV_IMPORT_BATCH_SIZE], start=start + 2):  # Row 1 is the header
+                try:
+                    values = parse_csv_row(row)
+                except ValueError as e:
+                    errors.append(f"Row {row_num}: {e}")
+                    continue
+                if values is None:
+                    continue
+
+                # Identical rows within one statement are numbered so they stay distinct
+                fingerprint_args = (values['date'], values['amount'], values['description'], values['card_holder'], values['transaction_type'])
+                occurrence_key = Transaction.compute_fingerprint(*fingerprint_args)
+                occurrence = occurrences.get(occurrence_key, 0)
+                occurrences[occurrence_key] = occurrence + 1
+
+                transaction = Transaction(
+                    status='UNMATCHED',
+                    fingerprint=Transaction.compute_fingerprint(*fingerprint_args, occurrence),
+                    import_batch=import_batch,
+                    **values
+                )
+                transaction.assign_card(card_map)
+                pending_transactions.append(transaction)
+
+            # One query per step to find rows that were already imported
+            existing = set(Transaction.objects.filter(
+                fingerprint__in=[transaction.fingerprint for transaction in pending_transactions]
+            ).values_list('fingerprint', flat=True))
+            new_transactions = [t for t in pending_transactions if t.fingerprint not in existing]
+
+            # ignore_conflicts covers a concurrent import of the same statement
+            Transaction.objects.bulk_create(new_transactions, ignore_conflicts=True)
+
+            # Rows a concurrent import inserted first were dropped by ignore_conflicts,
+            # so the step's inserted rows are read back instead of counted
+            new_ids = []
+            if new_transactions:
+                new_ids = list(Transaction.objects.filter(
+                    import_batch=import_batch,
+                    fingerprint__in=[transaction.fingerprint for transaction in new_transactions]
+                ).values_list('id', flat=True))
+
+            # Match this step's new rows against open bills while they are fresh
+            if new_ids:
+                try:
+                    match_result = match_new_transactions(new_ids, auto_accept_threshold)
+                    matched_count += match_result.accepted_count
+                    suggested_count += len(match_result.suggestions) - match_result.accepted_count
+                except Exception as e:
+                    errors.append(f"Bill matching failed for rows {start + 2}-{start + CSV_IMPORT_BATCH_SIZE + 1}: {e}")
+
+            processed_rows = min(start + CSV_IMPORT_BATCH_SIZE, len(rows))
+            inserted_count += len(new_ids)
+            skipped_count += len(pending_transactions) - len(new_ids)
+            still_running = ImportBatch.objects.filter(id=import_batch.id, status='processing').update(
+                processed_rows=processed_rows,
+                inserted_count=inserted_count,
+                skipped_count=skipped_count,
+                error_count=len(errors),
+                matched_count=matched_count,
+                suggested_count=suggested_count,
+                heartbeat_at=timezone.now()
+            )
+            if not still_running:
+                # recover_stale_imports() gave up on this import; leave the batch as it is
+                import_batch.refresh_from_db()
+                Transaction.invalidate_stats()
+                return import_batch
+
+        import_batch.status = 'completed'
+        import_batch.processed_rows = processed_rows
+        import_batch.inserted_count = inserted_count
+        import_batch.skipped_count = skipped_count
+        import_batch.error_count = len(errors)
+        import_batch.errors = errors[:50]
+        import_batch.matched_count = matched_count
+        import_batch.suggested_count = suggested_count
+    except Exception as e:
+        import_batch.refresh_from_db(fields=['processed_rows', 'inserted_count', 'skipped_count', 'error_count', 'matched_count', 'suggested_count'])
+        import_batch.status = 'failed'
+        import_batch.errors = [f'Import failed: {str(e)}']
+
+    import_batch.finished_at = timezone.now()
+    import_batch.save()
+    Transaction.invalidate_stats()
+    return import_batch
+
+
+def claim_batch(batch_id):
+    """Mark a pending import as processing; False if another runner claimed it first"""
+    return bool(ImportBatch.objects.filter(id=batch_id, status='pending').update(status='processing', heartbeat_at=timezone.now()))
+
+
+def claim_next_batch():
+    """Mark the oldest pending import as processing and return it, or None if the queue is empty.
+
+    The conditional UPDATE makes the claim safe when several workers poll at once.
+    """
+    for batch_id in ImportBatch.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:5]:
+        if claim_batch(batch_id):
+            return ImportBatch.objects.get(id=batch_id)
+    return None
+
+
+def recover_stale_imports():
+    """Fail processing imports whose heartbeat stopped, and restart lost pending ones in 'thread' mode.
+
+    Rows an abandoned import already inserted stay on its batch, so they can be
+    rolled back. Returns the number of imports marked failed.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=STALE_IMPORT_SECONDS)
+    failed_count = ImportBatch.objects.filter(status='processing').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff)
+    ).update(
+        status='failed',
+        finished_at=now,
+        errors=['Import failed: it stopped before finishing, probably because the server restarted. Roll it back and upload the file again.']
+    )
+    if import_mode() == 'thread':
+        # Uploads whose thread never started (the process exited first)
+        for batch_id in ImportBatch.objects.filter(status='pending', created_at__lt=cutoff).values_list('id', flat=True):
+            _start_import_thread(batch_id)
+    return failed_count
+
+
+def import_mode():
+    return getattr(settings, 'TRANSACTION_IMPORT_MODE', 'thread')
+
+
+def _run_import_in_thread(batch_id):
+    try:
+        if claim_batch(batch_id):
+            run_import(ImportBatch.objects.get(id=batch_id))
+    finally:
+        connection.close()
+
+
+def _start_import_thread(batch_id):
+    threading.Thread(target=_run_import_in_thread, args=(batch_id,), daemon=True).start()
+
+
+def enqueue_import(import_batch):
+    """Hand a stored upload to the configured background runner"""
+    if import_mode() == 'thread':
+        recover_stale_imports()
+        _start_import_thread(import_batch.id)
+    # In 'worker' mode the batch stays pending until process_transaction_imports claims it
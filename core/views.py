@@ -3,28 +3,40 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User, Group
 from django.contrib import messages
 from django.core.files.storage import default_storage
-from django.http import HttpResponse, Http404, JsonResponse, FileResponse
+from django.http import HttpResponse, Http404, JsonResponse, FileResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.views.decorators.clickjacking import xframe_options_exempt
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import Paginator
-from django.db import models
+from django.db import models, connection
+from django.db import transaction as db_transaction
+from django.db.models.functions import Lower
 from functools import wraps
+from asgiref.sync import sync_to_async
 import json
 import os
-import csv
+import hashlib
+from collections import defaultdict
 from decimal import Decimal
-from datetime import datetime
-from .models import File, Project, Vendor, Transaction, UserProfile, Class
+from datetime import date
+from urllib.parse import urlencode, quote
+from .models import File, Project, Vendor, Transaction, UserProfile, Class, ImportBatch, MatchSuggestion, BillPayment, BillSummary, ApprovalInboxEntry, ClassSuggestion
+from .transaction_import import enqueue_import, recover_stale_imports
+from .roles import invalidate_roles, set_request_roles
+from .caching import CachedRead, bump, read_stats, reset_stats, backend_name
+from .events import files_changed, latest_event_id, event_stream
+from .bill_export import generate_bill_number, claim_export_batch, iter_csv, iter_iif
+from .matching import run_matching, accept_candidates, group_candidates, get_auto_accept_threshold
 
 def admin_or_staff_required(view_func):
     """Decorator to restrict access to admin/staff users only. Redirects superintendents to approvals page."""
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_staff:
+        if not request.roles.is_staff:
             # Check if user is a superintendent
-            if request.user.groups.filter(name='Superintendent').exists():
+            if request.roles.is_superintendent:
                 messages.info(request, 'You only have access to the Approvals page.')
                 return redirect('approvals_list')
             else:
@@ -36,20 +48,19 @@ def admin_or_staff_required(view_func):
 @login_required
 def dashboard(request):
     # Redirect superintendents to approvals page
-    if not request.user.is_staff and request.user.groups.filter(name='Superintendent').exists():
+    if not request.roles.is_staff and request.roles.is_superintendent:
         return redirect('approvals_list')
     return render(request, "dashboard.html")
 
-@login_required
-@admin_or_staff_required
-def file_manager(request):
-    all_files = File.objects.all()
-    
+# The invoices page lists every file, so its payload is cached until files change
+FILES_PAGE_READ = CachedRead('files_page', ['files'])
+
+def files_page_payload():
     # Separate files into processed and unprocessed
     unprocessed_files = []
     processed_files = []
     
-    for file in all_files:
+    for file in File.objects.all():
         # A file is considered "processed" if it has at least project, vendor, or date filled
         is_processed = bool(file.project or file.vendor or file.date)
         
@@ -74,13 +85,21 @@ def file_manager(request):
         else:
             unprocessed_files.append(file_data)
     
-    # Convert to JSON for JavaScript
-    files_json = unprocessed_files + processed_files
-    
+    return {
+        'unprocessed': unprocessed_files,
+        'processed': processed_files,
+        # Convert to JSON for JavaScript
+        'files_json': json.dumps(unprocessed_files + processed_files)
+    }
+
+@login_required
+@admin_or_staff_required
+def file_manager(request):
+    files = FILES_PAGE_READ.get(files_page_payload)
     return render(request, "file_manager.html", {
-        "unprocessed_files": unprocessed_files,
-        "processed_files": processed_files,
-        "files_json": json.dumps(files_json)
+        "unprocessed_files": files['unprocessed'],
+        "processed_files": files['processed'],
+        "files_json": files['files_json']
     })
 
 @login_required
@@ -209,12 +228,23 @@ def rename_file(request):
             file_obj.date = date
             file_obj.invoice_number = invoice_number
             file_obj.total = total
+            file_obj.amount = File.parse_amount(total)
+            file_obj.invoice_date = File.parse_date(date)
+            file_obj.resolve_references()
             file_obj.save()
+            BillSummary.refresh_files([file_obj.id])
+            ApprovalInboxEntry.refresh_files([file_obj.id])
+            files_changed.send(sender=File, kind='updated', file_ids=[file_obj.id])
+            
+            message = f'File renamed to "{new_name}"'
+            if date and file_obj.invoice_date is None:
+                message += f'. The date "{date}" was not recognized, use MM-DD-YYYY'
             
             return JsonResponse({
                 'success': True,
-                'message': f'File renamed to "{new_name}"',
-                'new_name': new_name
+                'message': message,
+                'new_name': new_name,
+                'date_recognized': not date or file_obj.invoice_date is not None
             })
         else:
             return JsonResponse({
@@ -239,6 +269,7 @@ def save_notes(request):
         file_obj = get_object_or_404(File, id=file_id)
         file_obj.description = notes
         file_obj.save()
+        BillSummary.refresh_files([file_obj.id])
         
         return JsonResponse({
             'success': True,
@@ -256,7 +287,8 @@ def save_notes(request):
 def projects_list(request):
     """List all projects with search and pagination"""
     search_query = request.GET.get('search', '')
-    projects = Project.objects.all()
+    # Each row lists the project's superintendents
+    projects = Project.objects.prefetch_related('superintendents')
     
     if search_query:
         projects = projects.filter(
@@ -273,7 +305,7 @@ def projects_list(request):
     return render(request, "projects.html", {
         'page_obj': page_obj,
         'search_query': search_query,
-        'total_projects': projects.count()
+        'total_projects': paginator.count
     })
 
 @login_required
@@ -306,6 +338,9 @@ def create_project(request):
             aliases=aliases,
             builders_fee=builders_fee
         )
+        # The new name can change which project files resolve to
+        file_ids = File.resolve_references_for_names('project', [name, *aliases])
+        ApprovalInboxEntry.refresh_files(file_ids)
         
         return JsonResponse({
             'success': True,
@@ -353,11 +388,14 @@ def update_project(request, project_id):
                 'message': f'Project "{name}" already exists'
             })
         
+        old_names = [project.name, *project.aliases]
         project.name = name
         project.address = address
         project.aliases = aliases
         project.builders_fee = builders_fee
         project.save()
+        file_ids = File.resolve_references_for_names('project', [*old_names, name, *aliases], ref=project)
+        ApprovalInboxEntry.refresh_files(file_ids)
         
         return JsonResponse({
             'success': True,
@@ -386,7 +424,11 @@ def delete_project(request, project_id):
     try:
         project = get_object_or_404(Project, id=project_id)
         project_name = project.name
+        old_names = [project.name, *project.aliases]
         project.delete()
+        # Files of the deleted project may match another project's alias
+        file_ids = File.resolve_references_for_names('project', old_names)
+        ApprovalInboxEntry.refresh_files(file_ids)
         
         return JsonResponse({
             'success': True,
@@ -399,14 +441,7 @@ def delete_project(request, project_id):
             'message': f'Error deleting project: {str(e)}'
         })
 
-@login_required
-@admin_or_staff_required
-def vendors_list(request):
-    """List all vendors with search and pagination"""
-    search_query = request.GET.get('search', '')
-    category_filter = request.GET.get('category', '')
-    vendors = Vendor.objects.prefetch_related('classes').all()
-    
+def filter_vendors(vendors, search_query, category_filter):
     if search_query:
         vendors = vendors.filter(
             models.Q(name__icontains=search_query) |
@@ -415,24 +450,30 @@ def vendors_list(request):
     
     if category_filter:
         vendors = vendors.filter(category=category_filter)
-    
+    return vendors
+
+# Vendor list payloads, keyed by search and category; vendor class badges also depend on classes
+VENDORS_PAGE_READ = CachedRead('vendors_page', ['vendors', 'classes'])
+
+def vendors_page_payload(vendors):
     # Get unique categories for filter dropdown
-    categories = Vendor.objects.values_list('category', flat=True).distinct().order_by('category')
+    categories = list(Vendor.objects.values_list('category', flat=True).distinct().order_by('category'))
     
-    # Get all classes for assignment dropdown
-    all_classes = Class.objects.filter(is_active=True).order_by('parent__name', 'name')
+    # Every class, for vendor class badges and the assignment dropdown
+    class_tree = {node['id']: node for node in Class.cached_tree()}
     
     # Convert vendors to JSON for JavaScript
     vendors_json = []
     for vendor in vendors:
         vendor_classes = []
         for class_obj in vendor.classes.all():
+            node = class_tree[class_obj.id]
             vendor_classes.append({
-                'id': class_obj.id,
-                'name': class_obj.name,
-                'full_name': class_obj.full_name,
-                'color': class_obj.color,
-                'parent_name': class_obj.parent.name if class_obj.parent else None
+                'id': node['id'],
+                'name': node['name'],
+                'full_name': node['full_name'],
+                'color': node['color'],
+                'parent_name': node['parent_name']
             })
         
         vendors_json.append({
@@ -447,19 +488,25 @@ def vendors_list(request):
         })
     
     # Convert classes to JSON for JavaScript
-    classes_json = []
-    for class_obj in all_classes:
-        classes_json.append({
-            'id': class_obj.id,
-            'name': class_obj.name,
-            'full_name': class_obj.full_name,
-            'color': class_obj.color,
-            'parent_id': class_obj.parent.id if class_obj.parent else None,
-            'parent_name': class_obj.parent.name if class_obj.parent else None,
-            'is_parent': class_obj.is_parent,
-            'is_child': class_obj.is_child,
-            'display_name': class_obj.display_name
-        })
+    classes_json = [node for node in class_tree.values() if node['is_active']]
+    
+    return {
+        'categories': categories,
+        'total_vendors': len(vendors_json),
+        'vendors_json': json.dumps(vendors_json),
+        'classes_json': json.dumps(classes_json)
+    }
+
+@login_required
+@admin_or_staff_required
+def vendors_list(request):
+    """List all vendors with search and pagination"""
+    search_query = request.GET.get('search', '')
+    category_filter = request.GET.get('category', '')
+    vendors = filter_vendors(Vendor.objects.prefetch_related('classes'), search_query, category_filter)
+    
+    # The JSON payloads cover every matching vendor, so they are cached per search
+    payload = VENDORS_PAGE_READ.get(lambda: vendors_page_payload(vendors), search_query, category_filter)
     
     # Pagination
     paginator = Paginator(vendors, 20)  # Show 20 vendors per page
@@ -470,10 +517,10 @@ def vendors_list(request):
         'page_obj': page_obj,
         'search_query': search_query,
         'category_filter': category_filter,
-        'categories': categories,
-        'total_vendors': vendors.count(),
-        'vendors_json': json.dumps(vendors_json),
-        'classes_json': json.dumps(classes_json)
+        'categories': payload['categories'],
+        'total_vendors': payload['total_vendors'],
+        'vendors_json': payload['vendors_json'],
+        'classes_json': payload['classes_json']
     })
 
 @login_required
@@ -504,6 +551,8 @@ def create_vendor(request):
             category=category,
             aliases=aliases
         )
+        # Files whose vendor text matches the new name or aliases now point at it
+        File.resolve_references_for_names('vendor', [name, *aliases])
         
         return JsonResponse({
             'success': True,
@@ -549,10 +598,12 @@ def update_vendor(request, vendor_id):
                 'message': f'Vendor "{name}" already exists'
             })
         
+        old_names = [vendor.name, *vendor.aliases]
         vendor.name = name
         vendor.category = category
         vendor.aliases = aliases
         vendor.save()
+        File.resolve_references_for_names('vendor', [*old_names, name, *aliases], ref=vendor)
         
         return JsonResponse({
             'success': True,
@@ -580,7 +631,9 @@ def delete_vendor(request, vendor_id):
     try:
         vendor = get_object_or_404(Vendor, id=vendor_id)
         vendor_name = vendor.name
+        old_names = [vendor.name, *vendor.aliases]
         vendor.delete()
+        File.resolve_references_for_names('vendor', old_names)
         
         return JsonResponse({
             'success': True,
@@ -593,6 +646,10 @@ def delete_vendor(request, vendor_id):
             'message': f'Error deleting vendor: {str(e)}'
         })
 
+# Autocomplete runs on every keystroke, so suggestions are cached per query until projects or vendors change
+PROJECT_SUGGESTIONS_READ = CachedRead('project_suggestions', ['projects'], timeout=300)
+VENDOR_SUGGESTIONS_READ = CachedRead('vendor_suggestions', ['vendors'], timeout=300)
+
 @login_required
 def autocomplete_projects(request):
     """API endpoint for project autocomplete suggestions"""
@@ -600,24 +657,23 @@ def autocomplete_projects(request):
     if len(query) < 2:
         return JsonResponse({'suggestions': []})
     
-    projects = Project.objects.filter(
-        models.Q(name__icontains=query) |
-        models.Q(address__icontains=query) |
-        models.Q(aliases__icontains=query)
-    )[:10]  # Limit to 10 suggestions
-    
-    suggestions = []
-    for project in projects:
-        suggestions.append({
+    def build():
+        projects = Project.objects.filter(
+            models.Q(name__icontains=query) |
+            models.Q(address__icontains=query) |
+            models.Q(aliases__icontains=query)
+        )[:10]  # Limit to 10 suggestions
+        
+        return [{
             'id': project.id,
             'name': project.name,
             'address': project.address,
             'aliases': project.aliases,
             'builders_fee': float(project.builders_fee) if project.builders_fee else None,
             'usage_count': project.usage_count
-        })
+        } for project in projects]
     
-    return JsonResponse({'suggestions': suggestions})
+    return JsonResponse({'suggestions': PROJECT_SUGGESTIONS_READ.get(build, query.lower())})
 
 @login_required
 def autocomplete_vendors(request):
@@ -626,47 +682,175 @@ def autocomplete_vendors(request):
     if len(query) < 2:
         return JsonResponse({'suggestions': []})
     
-    vendors = Vendor.objects.filter(
-        models.Q(name__icontains=query) |
-        models.Q(aliases__icontains=query)
-    )[:10]  # Limit to 10 suggestions
-    
-    suggestions = []
-    for vendor in vendors:
-        suggestions.append({
+    def build():
+        vendors = Vendor.objects.filter(
+            models.Q(name__icontains=query) |
+            models.Q(aliases__icontains=query)
+        )[:10]  # Limit to 10 suggestions
+        
+        return [{
             'id': vendor.id,
             'name': vendor.name,
             'category': vendor.category,
             'aliases': vendor.aliases,
             'usage_count': vendor.usage_count
-        })
+        } for vendor in vendors]
+    
+    return JsonResponse({'suggestions': VENDOR_SUGGESTIONS_READ.get(build, query.lower())})
+
+def parse_decimal(value):
+    """Parse a finite number; Decimal() alone also accepts 'inf' and 'NaN', which no amount lookup can use"""
+    number = Decimal(value)
+    if not number.is_finite():
+        raise ValueError(f'Not a finite number: {value}')
+    return number
+
+# Sortable transaction columns and how their keyset cursor values are parsed
+TRANSACTION_SORT_FIELDS = {
+    'date': date.fromisoformat,
+    'amount': parse_decimal,
+    'transaction_type': str,
+}
+
+def keyset_paginate(queryset, sort_field, descending, after=None, before=None, page_size=25):
+    """Return one page of a queryset ordered by (sort_field, id) without using OFFSET.
+    
+    ``after``/``before`` are cursors from a previous page. Returns the page items
+    plus cursors for the next and previous pages (None at either end).
+    """
+    parse_value = TRANSACTION_SORT_FIELDS[sort_field]
+    
+    def decode(cursor):
+        value, _, pk = cursor.rpartition('|')
+        return parse_value(value), int(pk)
+    
+    def encode(obj):
+        return f"{getattr(obj, sort_field)}|{obj.pk}"
+    
+    # Walking backwards flips the comparison and the ordering
+    backwards = bool(before) and not after
+    forward_desc = descending != backwards
+    lookup = 'lt' if forward_desc else 'gt'
+    direction = '-' if forward_desc else ''
+    queryset = queryset.order_by(f'{direction}{sort_field}', f'{direction}id')
+    
+    cursor = after or before
+    if cursor:
+        value, pk = decode(cursor)
+        queryset = queryset.filter(
+            models.Q(**{f'{sort_field}__{lookup}': value}) |
+            models.Q(**{sort_field: value, f'id__{lookup}': pk})
+        )
+    
+    items = list(queryset[:page_size + 1])
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    
+    if backwards:
+        items.reverse()
+        next_cursor = encode(items[-1]) if items else None
+        prev_cursor = encode(items[0]) if items and has_more else None
+    else:
+        next_cursor = encode(items[-1]) if items and has_more else None
+        prev_cursor = encode(items[0]) if items and cursor else None
     
-    return JsonResponse({'suggestions': suggestions})
+    return items, next_cursor, prev_cursor
 
 @login_required
 @admin_or_staff_required
 def transactions_list(request):
-    """Display list of transactions with simple search"""
+    """Display list of transactions with filters, sorting and keyset pagination"""
     transactions = Transaction.objects.all()
     
-    # Simple search functionality
-    search_query = request.GET.get('search', '')
+    filters = {
+        'search': request.GET.get('search', '').strip(),
+        'date_from': request.GET.get('date_from', '').strip(),
+        'date_to': request.GET.get('date_to', '').strip(),
+        'amount_min': request.GET.get('amount_min', '').strip(),
+        'amount_max': request.GET.get('amount_max', '').strip(),
+        'status': request.GET.get('status', '').strip(),
+        'type': request.GET.get('type', '').strip(),
+        'card_holder': request.GET.get('card_holder', '').strip(),
+        'tag': request.GET.get('tag', '').strip(),
+    }
+    
+    # Search matches description/card holder text, or an exact amount when the query is numeric
+    search_query = filters['search']
     if search_query:
-        transactions = transactions.filter(
-            models.Q(description__icontains=search_query) |
-            models.Q(amount__icontains=search_query) |
-            models.Q(card_holder__icontains=search_query)
+        search_filter = models.Q(description__icontains=search_query) | models.Q(card_holder__icontains=search_query)
+        try:
+            search_filter |= models.Q(amount=parse_decimal(search_query.replace('$', '').replace(',', '')))
+        except (ValueError, ArithmeticError):
+            pass
+        transactions = transactions.filter(search_filter)
+    
+    try:
+        if filters['date_from']:
+            transactions = transactions.filter(date__gte=date.fromisoformat(filters['date_from']))
+        if filters['date_to']:
+            transactions = transactions.filter(date__lte=date.fromisoformat(filters['date_to']))
+    except ValueError:
+        messages.error(request, 'Invalid date filter.')
+    
+    try:
+        if filters['amount_min']:
+            transactions = transactions.filter(amount__gte=parse_decimal(filters['amount_min']))
+        if filters['amount_max']:
+            transactions = transactions.filter(amount__lte=parse_decimal(filters['amount_max']))
+    except (ValueError, ArithmeticError):
+        messages.error(request, 'Invalid amount filter.')
+    
+    if filters['status']:
+        transactions = transactions.filter(status=filters['status'])
+    if filters['type']:
+        transactions = transactions.filter(transaction_type=filters['type'])
+    if filters['card_holder']:
+        transactions = transactions.filter(card_holder=filters['card_holder'])
+    if filters['tag']:
+        if connection.features.supports_json_field_contains:
+            transactions = transactions.filter(tags__contains=[filters['tag']])
+        else:
+            transactions = transactions.filter(tags__icontains=filters['tag'])
+    
+    # Sorting
+    sort = request.GET.get('sort', '-date')
+    sort_field = sort.lstrip('-')
+    if sort_field not in TRANSACTION_SORT_FIELDS:
+        sort, sort_field = '-date', 'date'
+    descending = sort.startswith('-')
+    
+    try:
+        page_items, next_cursor, prev_cursor = keyset_paginate(
+            transactions, sort_field, descending,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=25  # 25 transactions per page
         )
+    except (ValueError, ArithmeticError):
+        # Malformed cursor - start from the first page
+        page_items, next_cursor, prev_cursor = keyset_paginate(transactions, sort_field, descending, page_size=25)
     
-    # Pagination
-    paginator = Paginator(transactions, 25)  # 25 transactions per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Query string shared by sort and pagination links
+    active_filters = {key: value for key, value in filters.items() if value}
+    filter_query = urlencode(active_filters)
+    base_query = urlencode({**active_filters, 'sort': sort})
+    
+    stats = Transaction.cached_stats()
     
     context = {
-        'transactions': page_obj,
+        'transactions': page_items,
         'search_query': search_query,
-        'total_count': Transaction.objects.count(),
+        'filters': filters,
+        'filter_query': filter_query,
+        'sort': sort,
+        'next_query': f"{base_query}&after={quote(next_cursor)}" if next_cursor else '',
+        'prev_query': f"{base_query}&before={quote(prev_cursor)}" if prev_cursor else '',
+        'total_count': stats['total_count'],
+        # Only count matches when filtering; the unfiltered total comes from the cache
+        'filtered_count': transactions.count() if active_filters else stats['total_count'],
+        'card_holders': stats['card_holders'],
+        'status_choices': Transaction.STATUS_CHOICES,
+        'type_choices': Transaction.TRANSACTION_TYPE_CHOICES,
     }
     
     return render(request, 'transactions.html', context)
@@ -678,7 +862,7 @@ def create_transaction(request):
     try:
         data = json.loads(request.body)
         
-        transaction = Transaction.objects.create(
+        transaction = Transaction(
             date=data.get('date'),
             amount=data.get('amount'),
             description=data.get('description', ''),
@@ -688,6 +872,9 @@ def create_transaction(request):
             status=data.get('status', 'UNMATCHED'),
             tags=data.get('tags', [])
         )
+        transaction.assign_card()
+        transaction.save()
+        Transaction.invalidate_stats()
         
         return JsonResponse({
             'success': True,
@@ -726,7 +913,10 @@ def update_transaction(request, transaction_id):
         transaction.due_date = data.get('due_date') if data.get('due_date') else None
         transaction.status = data.get('status', transaction.status)
         transaction.tags = data.get('tags', transaction.tags)
+        transaction.assign_card()
         transaction.save()
+        Transaction.invalidate_stats()
+        BillSummary.refresh_transactions([transaction.id])
         
         return JsonResponse({
             'success': True,
@@ -755,7 +945,12 @@ def delete_transaction(request, transaction_id):
     """Delete a transaction"""
     try:
         transaction = get_object_or_404(Transaction, id=transaction_id)
+        linked_file_ids = list(File.objects.filter(
+            models.Q(attached_transaction=transaction) | models.Q(payments__transaction=transaction)
+        ).values_list('id', flat=True))
         transaction.delete()
+        Transaction.invalidate_stats()
+        BillSummary.refresh_files(linked_file_ids)
         
         return JsonResponse({
             'success': True,
@@ -774,6 +969,8 @@ def clear_all_transactions(request):
     try:
         count = Transaction.objects.count()
         Transaction.objects.all().delete()
+        Transaction.invalidate_stats()
+        BillSummary.rebuild()
         
         return JsonResponse({
             'success': True,
@@ -792,6 +989,8 @@ def clear_all_matches(request):
     try:
         count = Transaction.objects.filter(status='MATCHED').count()
         Transaction.objects.filter(status='MATCHED').delete()
+        Transaction.invalidate_stats()
+        BillSummary.rebuild()
         
         return JsonResponse({
             'success': True,
@@ -805,11 +1004,7 @@ def clear_all_matches(request):
 
 @login_required
 def upload_csv_transactions(request):
-    """Upload and process CSV file from QuickBooks"""
-    print(f"Upload CSV view called. Method: {request.method}")
-    print(f"Request.FILES: {request.FILES}")
-    print(f"Request.POST: {request.POST}")
-    
+    """Store an uploaded QuickBooks CSV and queue it for background import"""
     if request.method != 'POST':
         return JsonResponse({
             'success': False,
@@ -824,7 +1019,6 @@ def upload_csv_transactions(request):
             })
         
         csv_file = request.FILES['csv_file']
-        print(f"CSV file received: {csv_file.name}, size: {csv_file.size}")
         
         # Check file extension
         if not csv_file.name.lower().endswith('.csv'):
@@ -833,184 +1027,322 @@ def upload_csv_transactions(request):
                 'message': 'Please upload a valid CSV file'
             })
         
-        # Read and process CSV
-        decoded_file = csv_file.read().decode('utf-8-sig')  # Handle BOM
-        csv_reader = csv.DictReader(decoded_file.splitlines())
-        
-        # Debug: Print CSV headers to see what columns we have
-        print(f"CSV Headers: {csv_reader.fieldnames}")
+        file_hash = hashlib.sha256()
+        for chunk in csv_file.chunks():
+            file_hash.update(chunk)
         
-        imported_count = 0
-        errors = []
+        # Record the upload so it can be processed, reviewed or rolled back later
+        import_batch = ImportBatch.objects.create(
+            file_name=csv_file.name,
+            file_hash=file_hash.hexdigest(),
+            source_file=csv_file,
+            uploaded_by=request.user
+        )
+        enqueue_import(import_batch)
         
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is header
-            try:
-                # Debug: Print row data
-                print(f"Row {row_num}: {row}")
-                
-                # Map CSV columns to our model fields
-                # Handle the specific format: Date, DESCRIPTION, Payee, Categorize or match, SPENT, RECEIVED
-                # Try different possible column names (including BOM variants)
-                date_str = (row.get('Date') or row.get('\ufeffDate') or row.get('date', '')).strip()
-                description = row.get('DESCRIPTION', row.get('description', '')).strip()
-                payee = row.get('Payee', row.get('payee', '')).strip()
-                category = row.get('Categorize or match', row.get('category', '')).strip()
-                spent_str = row.get('SPENT', row.get('spent', '')).strip()
-                received_str = row.get('RECEIVED', row.get('received', '')).strip()
-                
-                print(f"Row {row_num} mapped values: date='{date_str}', description='{description}', spent='{spent_str}', received='{received_str}'")
-                
-                # Skip empty rows
-                if not date_str or not description:
-                    print(f"Row {row_num} skipped: missing date or description")
-                    continue
-                
-                # Determine amount and transaction type from SPENT/RECEIVED columns
-                amount = None
-                transaction_type = 'CHARGE'
-                
-                if spent_str and spent_str != '':
-                    # This is a SPENT transaction (expense/charge)
-                    amount_str = spent_str
-                    transaction_type = 'CHARGE'
-                elif received_str and received_str != '':
-                    # This is a RECEIVED transaction (income/credit)
-                    amount_str = received_str
-                    transaction_type = 'CREDIT'
-                else:
-                    # Skip rows with no amount
-                    continue
-                
-                # Parse date (try multiple formats including MM/DD/YY)
-                date_obj = None
-                for date_format in ['%m/%d/%y', '%m/%d/%Y', '%Y-%m-%d', '%m-%d-%Y', '%d/%m/%Y']:
-                    try:
-                        date_obj = datetime.strptime(date_str, date_format).date()
-                        break
-                    except ValueError:
-                        continue
-                
-                if not date_obj:
-                    errors.append(f"Row {row_num}: Invalid date format '{date_str}'")
-                    continue
-                
-                # Parse amount
-                try:
-                    # Remove currency symbols and commas
-                    amount_clean = amount_str.replace('$', '').replace(',', '').strip()
-                    amount = Decimal(amount_clean)
-                except (ValueError, TypeError):
-                    errors.append(f"Row {row_num}: Invalid amount format '{amount_str}'")
-                    continue
-                
-                # Validate transaction type
-                valid_types = ['CHARGE', 'CREDIT', 'PAYMENT', 'REFUND']
-                if transaction_type not in valid_types:
-                    transaction_type = 'CHARGE'  # Default to CHARGE
-                
-                # Create transaction
-                print(f"Creating transaction: date={date_obj}, amount={amount}, description={description}, type={transaction_type}")
-                transaction = Transaction.objects.create(
-                    date=date_obj,
-                    amount=amount,
-                    description=description,
-                    transaction_type=transaction_type,
-                    card_holder=payee or 'Unknown',
-                    status='UNMATCHED',
-                    tags=[category] if category else []
-                )
-                
-                imported_count += 1
-                print(f"Transaction created successfully: {transaction.id}")
-                
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
-                continue
+        return JsonResponse({
+            'success': True,
+            'message': f'{csv_file.name} uploaded. Importing transactions...',
+            'import_batch_id': import_batch.id
+        })
         
-        # Prepare response message
-        print(f"Import complete: {imported_count} transactions imported, {len(errors)} errors")
-        if imported_count > 0:
-            message = f"Successfully imported {imported_count} transactions"
-            if errors:
-                message += f". {len(errors)} rows had errors."
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error processing CSV file: {str(e)}'
+        })
+
+@login_required
+def import_batch_progress(request, batch_id):
+    """API endpoint reporting progress of a background CSV import"""
+    import_batch = get_object_or_404(ImportBatch, id=batch_id)
+    
+    message = ''
+    if import_batch.status == 'completed':
+        if import_batch.inserted_count > 0:
+            message = f"Successfully imported {import_batch.inserted_count} transactions"
+            if import_batch.skipped_count:
+                message += f". {import_batch.skipped_count} already imported rows were skipped"
+            if import_batch.error_count:
+                message += f". {import_batch.error_count} rows had errors."
+            if import_batch.matched_count:
+                message += f". {import_batch.matched_count} were matched to bills automatically"
+            if import_batch.suggested_count:
+                message += f". {import_batch.suggested_count} possible bill matches are waiting for review"
+        elif import_batch.skipped_count:
+            message = f"All {import_batch.skipped_count} transactions in this file were already imported."
         else:
             message = "No transactions were imported. Please check your CSV format."
+    elif import_batch.status == 'failed':
+        message = import_batch.errors[0] if import_batch.errors else 'Import failed'
+    
+    return JsonResponse({
+        'success': True,
+        'id': import_batch.id,
+        'status': import_batch.status,
+        'is_finished': import_batch.is_finished,
+        'total_rows': import_batch.total_rows,
+        'processed_rows': import_batch.processed_rows,
+        'inserted_count': import_batch.inserted_count,
+        'skipped_count': import_batch.skipped_count,
+        'error_count': import_batch.error_count,
+        'matched_count': import_batch.matched_count,
+        'suggested_count': import_batch.suggested_count,
+        'errors': import_batch.errors[:10],  # Limit errors to first 10
+        'message': message
+    })
+
+@login_required
+@admin_or_staff_required
+def import_batches_list(request):
+    """API endpoint listing recent CSV imports with their row counts and throughput"""
+    recover_stale_imports()
+    batches = ImportBatch.objects.select_related('uploaded_by')[:50]
+    
+    batches_data = []
+    for batch in batches:
+        duration = batch.duration_seconds
+        rows_per_second = batch.rows_per_second
+        batches_data.append({
+            'id': batch.id,
+            'file_name': batch.file_name,
+            'file_hash': batch.file_hash,
+            'uploaded_by': (batch.uploaded_by.get_full_name() or batch.uploaded_by.username) if batch.uploaded_by else '',
+            'status': batch.status,
+            'total_rows': batch.total_rows,
+            'inserted_count': batch.inserted_count,
+            'skipped_count': batch.skipped_count,
+            'error_count': batch.error_count,
+            'matched_count': batch.matched_count,
+            'suggested_count': batch.suggested_count,
+            'errors': batch.errors,
+            'created_at': batch.created_at.strftime('%b %d, %Y %I:%M %p'),
+            'processed_rows': batch.processed_rows,
+            'duration_seconds': round(duration, 2) if duration is not None else None,
+            'rows_per_second': round(rows_per_second, 1) if rows_per_second is not None else None,
+            'rolled_back_at': batch.rolled_back_at.strftime('%b %d, %Y %I:%M %p') if batch.rolled_back_at else ''
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'batches': batches_data
+    })
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["POST"])
+def rollback_import_batch(request, batch_id):
+    """Delete every transaction created by one CSV import"""
+    try:
+        # An import abandoned by a restart becomes failed, and so can be rolled back
+        recover_stale_imports()
+        import_batch = get_object_or_404(ImportBatch, id=batch_id)
+        
+        if import_batch.status == 'rolled_back':
+            return JsonResponse({
+                'success': False,
+                'message': 'This import has already been rolled back'
+            })
         
-        response_data = {
+        with db_transaction.atomic():
+            # Claim the batch only if its import has finished, so rows still being
+            # inserted by the import thread or worker cannot outlive the rollback
+            claimed = ImportBatch.objects.filter(
+                id=import_batch.id, status__in=ImportBatch.FINISHED_STATUSES
+            ).update(status='rolled_back', rolled_back_at=timezone.now())
+            if not claimed:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'This import is still running. Wait for it to finish before rolling it back.'
+                })
+            
+            batch_transactions = Transaction.objects.filter(import_batch=import_batch)
+            
+            # Bills matched to these transactions, directly or through a split payment
+            linked_file_ids = list(File.objects.filter(
+                models.Q(attached_transaction__import_batch=import_batch) | models.Q(payments__transaction__import_batch=import_batch)
+            ).values_list('id', flat=True).distinct())
+            detached_ids = list(File.objects.filter(attached_transaction__import_batch=import_batch).values_list('id', flat=True))
+            # Deleting cascades to their payments and clears attached_transaction
+            _, deleted_per_model = batch_transactions.delete()
+            deleted_count = deleted_per_model.get(Transaction._meta.label, 0)
+            
+            # Point detached bills at the largest split payment they still have
+            remaining = {}
+            for file_id, transaction_id in BillPayment.objects.filter(file_id__in=detached_ids).order_by('file_id', '-transaction__amount').values_list('file_id', 'transaction_id'):
+                remaining.setdefault(file_id, transaction_id)
+            for file_id, transaction_id in remaining.items():
+                File.objects.filter(id=file_id).update(attached_transaction_id=transaction_id)
+            unlinked_count = len(detached_ids) - len(remaining)
+            BillSummary.refresh_files(linked_file_ids)
+            if linked_file_ids:
+                files_changed.send(sender=File, kind='unmatched', file_ids=linked_file_ids)
+        Transaction.invalidate_stats()
+        
+        message = f'Rolled back {import_batch.file_name}: deleted {deleted_count} transactions'
+        if unlinked_count:
+            message += f' and unlinked {unlinked_count} bills'
+        
+        return JsonResponse({
             'success': True,
             'message': message,
-            'imported_count': imported_count,
-            'errors': errors[:10]  # Limit errors to first 10
-        }
-        print(f"Response: {response_data}")
-        return JsonResponse(response_data)
+            'deleted_count': deleted_count,
+            'unlinked_count': unlinked_count
+        })
         
     except Exception as e:
         return JsonResponse({
             'success': False,
-            'message': f'Error processing CSV file: {str(e)}'
+            'message': f'Error rolling back import: {str(e)}'
         })
 
+BILL_SORT_FIELDS = ['-uploaded_at', 'amount', '-amount', 'invoice_date', '-invoice_date']
+
+def filter_bill_summaries(params):
+    """Apply the bills page filters and sort from request parameters to BillSummary rows"""
+    bills = BillSummary.objects.all()
+    filters = {
+        'search': params.get('search', '').strip(),
+        'vendor': params.get('vendor', '').strip(),
+        'project': params.get('project', '').strip(),
+        'amount_min': params.get('amount_min', '').strip(),
+        'amount_max': params.get('amount_max', '').strip(),
+        'date_from': params.get('date_from', '').strip(),
+        'date_to': params.get('date_to', '').strip(),
+        'paid': params.get('paid', '').strip(),
+        'matched': params.get('matched', '').strip(),
+    }
+    
+    if filters['search']:
+        bills = bills.filter(
+            models.Q(name__icontains=filters['search']) |
+            models.Q(vendor__icontains=filters['search']) |
+            models.Q(invoice_number__icontains=filters['search'])
+        )
+    if filters['vendor']:
+        bills = bills.filter(vendor=filters['vendor'])
+    if filters['project']:
+        bills = bills.filter(project=filters['project'])
+    
+    # Amount and date ranges run on the indexed numeric and date columns
+    if File.parse_amount(filters['amount_min']) is not None:
+        bills = bills.filter(amount__gte=File.parse_amount(filters['amount_min']))
+    if File.parse_amount(filters['amount_max']) is not None:
+        bills = bills.filter(amount__lte=File.parse_amount(filters['amount_max']))
+    if File.parse_date(filters['date_from']):
+        bills = bills.filter(invoice_date__gte=File.parse_date(filters['date_from']))
+    if File.parse_date(filters['date_to']):
+        bills = bills.filter(invoice_date__lte=File.parse_date(filters['date_to']))
+    
+    if filters['paid'] in ['true', 'false']:
+        bills = bills.filter(is_paid=filters['paid'] == 'true')
+    if filters['matched'] in ['true', 'false']:
+        bills = bills.filter(is_matched=filters['matched'] == 'true')
+    
+    sort = params.get('sort', '-uploaded_at')
+    if sort not in BILL_SORT_FIELDS:
+        sort = '-uploaded_at'
+    filters['sort'] = sort
+    
+    return bills.order_by(sort, '-uploaded_at', '-file_id'), filters
+
 @login_required
 @admin_or_staff_required
 def bills_list(request):
     """Display bills page with file list and bill entry tool"""
-    files = File.objects.filter(
-        project__isnull=False,
-        vendor__isnull=False,
-        invoice_number__isnull=False,
-        total__isnull=False,
-        approval_status='approved'  # Only show approved files
-    ).exclude(project='', vendor='', invoice_number='', total='$0.00').order_by('-uploaded_at')
-    
-    # Convert files to JSON for JavaScript
-    files_json = []
-    for file in files:
-        # Get attached transaction info
-        attached_transaction = None
-        if file.attached_transaction:
-            attached_transaction = {
-                'id': file.attached_transaction.id,
-                'date': file.attached_transaction.date.strftime('%m/%d/%Y'),
-                'amount': file.attached_transaction.amount_display,
-                'description': file.attached_transaction.description,
-                'card_holder': file.attached_transaction.card_holder,
-                'status': file.attached_transaction.status
-            }
+    # Live updates continue from the last change included in this page
+    last_event_id = latest_event_id()
+    bills, filters = filter_bill_summaries(request.GET)
+    total_amount = bills.aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
+    
+    paginator = Paginator(bills, 100)  # Show 100 bills per page
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    # Keep the filters on the page links
+    filter_query = urlencode({key: value for key, value in filters.items() if value and key != 'sort'} | {'sort': filters['sort']})
+    
+    return render(request, "bills.html", {
+        "files": page_obj,
+        "page_obj": page_obj,
+        "files_json": json.dumps([bill.as_json() for bill in page_obj]),
+        "total_amount": f"${total_amount:,.2f}",
+        "total_count": paginator.count,
+        "filter_query": filter_query,
+        "last_event_id": last_event_id,
+        # New bills can be added live only where they would appear: the first, unfiltered, newest-first page
+        "live_insert": page_obj.number == 1 and filters['sort'] == '-uploaded_at' and not any(
+            value for key, value in filters.items() if key != 'sort'
+        ),
+        **filters
+    })
+
+@login_required
+@admin_or_staff_required
+def bills_api(request):
+    """Paginated, filterable JSON list of bills"""
+    try:
+        bills, filters = filter_bill_summaries(request.GET)
         
-        # Get class information
-        class_info = None
-        if file.selected_class:
-            class_info = {
-                'id': file.selected_class.id,
-                'name': file.selected_class.name,
-                'color': file.selected_class.color
-            }
+        try:
+            page_size = min(max(int(request.GET.get('page_size', 50)), 1), 200)
+        except ValueError:
+            page_size = 50
         
-        files_json.append({
-            'id': file.id,
-            'name': file.name,
-            'file_type': file.file_type,
-            'file_size_display': file.file_size_display,
-            'uploaded_at': file.uploaded_at.strftime('%b %d, %Y'),
-            'description': file.description or '',
-            'file': file.file.name if file.file else '',
-            'project': file.project or '',
-            'vendor': file.vendor or '',
-            'date': file.date or '',
-            'invoice_number': file.invoice_number or '',
-            'total': file.total or '$0.00',
-            'is_paid': file.is_paid,
-            'payment_method': file.payment_method or '',
-            'paid_at': file.paid_at.strftime('%b %d, %Y') if file.paid_at else '',
-            'attached_transaction': attached_transaction,
-            'selected_class': class_info
+        paginator = Paginator(bills, page_size)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        
+        return JsonResponse({
+            'success': True,
+            'bills': [bill.as_json() for bill in page_obj],
+            'page': page_obj.number,
+            'num_pages': paginator.num_pages,
+            'total_count': paginator.count,
+            'filters': filters
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error loading bills: {str(e)}'
+        })
+
+EXPORT_FORMATS = {
+    'iif': (iter_iif, 'application/octet-stream'),
+    'csv': (iter_csv, 'text/csv'),
+}
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["GET", "POST"])
+def export_bills(request):
+    """Stream approved bills as a QuickBooks IIF or CSV import file.
+
+    POST claims every bill not exported yet into a new export batch and
+    downloads it; GET with ?batch= downloads an earlier batch again.
+    """
+    export_format = request.POST.get('format') or request.GET.get('format') or 'iif'
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({
+            'success': False,
+            'message': f'Unknown export format: {export_format}'
         })
     
-    return render(request, "bills.html", {
-        "files": files,
-        "files_json": json.dumps(files_json)
-    })
+    if request.method == 'POST':
+        export_batch, count = claim_export_batch()
+        if not count:
+            messages.info(request, 'No new approved bills to export.')
+            return redirect('bills_list')
+    else:
+        export_batch = request.GET.get('batch', '')
+        if not export_batch or not File.objects.filter(export_batch=export_batch).exists():
+            raise Http404("Export batch not found")
+    
+    generate_rows, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(generate_rows(export_batch), content_type=content_type)
+    filename = f"bills_{timezone.now().strftime('%Y%m%d')}_{export_batch[:8]}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Export-Batch'] = export_batch
+    return response
 
 @login_required
 @require_http_methods(["POST"])
@@ -1028,11 +1360,8 @@ def get_matching_transactions(request):
         
         file_obj = get_object_or_404(File, id=file_id)
         
-        # Extract amount from file total
-        total_str = file_obj.total.replace('$', '').replace(',', '').strip()
-        try:
-            file_amount = Decimal(total_str)
-        except (ValueError, TypeError):
+        file_amount = file_obj.amount
+        if file_amount is None:
             return JsonResponse({
                 'success': False,
                 'message': 'Invalid amount in file'
@@ -1043,28 +1372,28 @@ def get_matching_transactions(request):
         matching_transactions = Transaction.objects.filter(
             amount__gte=file_amount - tolerance,
             amount__lte=file_amount + tolerance
-        ).order_by('-date')
+        ).select_related('card_user').prefetch_related('attached_files', 'bills').order_by('-date')
+        
+        # Scores from the last matching run, so the best candidates are listed first
+        suggestion_scores = dict(MatchSuggestion.objects.filter(
+            file=file_obj, status='suggested'
+        ).values_list('transaction_id', 'score'))
         
         transactions_data = []
         for transaction in matching_transactions:
-            # Try to extract card number from description and find matching user
+            # Card holder resolved from the card number at import time
             user_name = None
-            if transaction.description:
-                # Look for 4-digit numbers in the description
-                import re
-                card_matches = re.findall(r'\b\d{4}\b', transaction.description)
-                for card_match in card_matches:
-                    user = get_user_by_card_number(card_match)
-                    if user:
-                        user_name = user.get_full_name() or user.username
-                        break
+            if transaction.card_user:
+                user_name = transaction.card_user.get_full_name() or transaction.card_user.username
             
             # Get attached file info if transaction is matched
             attached_file_info = None
             if transaction.status == 'MATCHED':
-                attached_files = transaction.attached_files.all()
-                if attached_files.exists():
-                    attached_file = attached_files.first()
+                # A split charge can pay several bills; report this bill if it is one of them
+                attached_files = list(transaction.bills.all()) or list(transaction.attached_files.all())
+                attached_files.sort(key=lambda f: f.id != file_obj.id)
+                if attached_files:
+                    attached_file = attached_files[0]
                     attached_file_info = {
                         'id': attached_file.id,
                         'name': attached_file.name,
@@ -1082,12 +1411,24 @@ def get_matching_transactions(request):
                 'card_holder': user_name or transaction.card_holder,  # Use actual user name if found, fallback to transaction card_holder
                 'status': transaction.status,
                 'user_name': user_name,
-                'attached_file': attached_file_info
+                'attached_file': attached_file_info,
+                'suggestion_score': suggestion_scores.get(transaction.id)
             })
         
+        transactions_data.sort(key=lambda t: t['suggestion_score'] or 0, reverse=True)
+        
+        # Split payments never share the bill's exact amount, so list them separately
+        split_suggestions = [
+            serialize_match_suggestion_group(group)
+            for group in group_match_suggestions(open_match_suggestions().filter(
+                group_key__in=MatchSuggestion.objects.filter(file=file_obj, status='suggested').exclude(group_key='').values('group_key')
+            ))
+        ]
+        
         return JsonResponse({
             'success': True,
             'transactions': transactions_data,
+            'split_suggestions': split_suggestions,
             'file_amount': f"${file_amount:,.2f}"
         })
         
@@ -1116,19 +1457,27 @@ def unmatch_transaction(request):
         transaction = get_object_or_404(Transaction, id=transaction_id)
         
         # Verify the transaction is actually attached to this file
-        if file_obj.attached_transaction != transaction:
+        payments = BillPayment.objects.filter(file=file_obj, transaction=transaction)
+        if file_obj.attached_transaction != transaction and not payments.exists():
             return JsonResponse({
                 'success': False,
                 'message': 'Transaction is not attached to this file'
             })
         
-        # Unmatch the transaction
-        file_obj.attached_transaction = None
-        file_obj.save()
+        # Unmatch the transaction, keeping any other split payment on the bill
+        payments.delete()
+        if file_obj.attached_transaction == transaction:
+            remaining = file_obj.payments.select_related('transaction').order_by('-transaction__amount').first()
+            file_obj.attached_transaction = remaining.transaction if remaining else None
+            file_obj.save()
         
-        # Update transaction status back to UNMATCHED
-        transaction.status = 'UNMATCHED'
-        transaction.save()
+        # Update transaction status back to UNMATCHED unless it still pays another bill
+        if not transaction.bill_payments.exists() and not transaction.attached_files.exists():
+            transaction.status = 'UNMATCHED'
+            transaction.save()
+        BillSummary.refresh_transactions([transaction.id])
+        BillSummary.refresh_files([file_obj.id])
+        files_changed.send(sender=File, kind='unmatched', file_ids=[file_obj.id])
         
         return JsonResponse({
             'success': True,
@@ -1158,10 +1507,10 @@ def create_bill(request):
                 'message': 'No file selected'
             })
         
-        file_obj = get_object_or_404(File, id=file_id)
+        file_obj = get_object_or_404(File.objects.select_related('project_ref'), id=file_id)
         
         # Generate bill number
-        bill_number = generate_bill_number(file_obj.invoice_number, file_obj.project)
+        bill_number = generate_bill_number(file_obj)
         
         # If transaction is matched, update its status and attach to file
         if transaction_id:
@@ -1172,6 +1521,13 @@ def create_bill(request):
             # Attach transaction to file
             file_obj.attached_transaction = transaction
             file_obj.save()
+            
+            bill_amount = file_obj.amount
+            BillPayment.objects.get_or_create(
+                file=file_obj,
+                transaction=transaction,
+                defaults={'amount': transaction.amount if bill_amount is None else min(bill_amount, transaction.amount)}
+            )
         
         # Mark file as paid if requested
         if mark_as_paid:
@@ -1183,6 +1539,8 @@ def create_bill(request):
             message = f'Bill marked as paid: {bill_number}'
         else:
             message = f'Bill created successfully: {bill_number}'
+        BillSummary.refresh_files([file_obj.id])
+        files_changed.send(sender=File, kind='paid' if mark_as_paid else 'matched' if transaction_id else 'updated', file_ids=[file_obj.id])
         
         return JsonResponse({
             'success': True,
@@ -1204,37 +1562,380 @@ def create_bill(request):
             'message': f'Error creating bill: {str(e)}'
         })
 
-def generate_bill_number(invoice_number, project_name):
-    """Generate bill number from invoice number and project address"""
-    # Find project by name to get address
-    try:
-        project = Project.objects.get(name=project_name)
-        address = project.address
-    except Project.DoesNotExist:
-        address = project_name  # Fallback to project name if not found
-    
-    # Clean address - remove directional indicators (N, S, E, W, NE, NW, SE, SW)
-    import re
-    
-    # Split address into words and remove directional indicators
-    words = address.split()
-    cleaned_words = []
-    
-    for word in words:
-        # Remove common directional indicators (case insensitive)
-        if word.upper() not in ['N', 'S', 'E', 'W', 'NE', 'NW', 'SE', 'SW', 'NORTH', 'SOUTH', 'EAST', 'WEST', 'NORTHEAST', 'NORTHWEST', 'SOUTHEAST', 'SOUTHWEST']:
-            cleaned_words.append(word)
-    
-    # Join the cleaned words
-    cleaned_address = ' '.join(cleaned_words)
-    
-    # Clean up extra spaces
-    cleaned_address = ' '.join(cleaned_address.split())
+BULK_BILL_LIMIT = 500
+PAYMENT_METHODS = ('check', 'credit_card')
+
+def validate_bill_entries(entries):
+    """Check bulk bill entries against the database in a few queries.
+
+    Returns (valid, results): valid is a list of (entry_index, file, transaction
+    or None, payment_method) and results holds one outcome dict per entry,
+    already filled in for entries that failed validation.
+    """
+    results = [{'file_id': entry.get('file_id') if isinstance(entry, dict) else None, 'success': False} for entry in entries]
+    parsed = []
+    seen_files = set()
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            results[index]['message'] = 'Invalid entry'
+            continue
+        try:
+            file_id = int(entry.get('file_id'))
+            transaction_id = int(entry['transaction_id']) if entry.get('transaction_id') else None
+        except (TypeError, ValueError):
+            results[index]['message'] = 'Invalid file or transaction id'
+            continue
+        payment_method = entry.get('payment_method') or ('credit_card' if transaction_id else 'check')
+        if payment_method not in PAYMENT_METHODS:
+            results[index]['message'] = f'Unknown payment method: {payment_method}'
+            continue
+        if file_id in seen_files:
+            results[index]['message'] = 'Duplicate entry for this file'
+            continue
+        seen_files.add(file_id)
+        parsed.append((index, file_id, transaction_id, payment_method))
     
-    # Create bill number: invoice_number - address
-    bill_number = f"{invoice_number} - {cleaned_address}"
+    file_ids = [file_id for _, file_id, _, _ in parsed]
+    transaction_ids = [transaction_id for _, _, transaction_id, _ in parsed if transaction_id]
+    files = File.objects.select_related('project_ref').in_bulk(file_ids)
+    transactions = Transaction.objects.in_bulk(transaction_ids)
+    # Transactions already linked to each bill, and transactions that already pay a bill
+    linked_transactions = defaultdict(set)
+    for file_id, transaction_id in BillPayment.objects.filter(file_id__in=file_ids).values_list('file_id', 'transaction_id'):
+        linked_transactions[file_id].add(transaction_id)
+    for file_obj in files.values():
+        if file_obj.attached_transaction_id:
+            linked_transactions[file_obj.id].add(file_obj.attached_transaction_id)
+    taken_transactions = set(BillPayment.objects.filter(transaction_id__in=transaction_ids).values_list('transaction_id', flat=True))
+    taken_transactions.update(File.objects.filter(attached_transaction_id__in=transaction_ids).values_list('attached_transaction_id', flat=True))
     
-    return bill_number
+    valid = []
+    used_transactions = set()
+    for index, file_id, transaction_id, payment_method in parsed:
+        file_obj = files.get(file_id)
+        transaction = transactions.get(transaction_id)
+        if not file_obj:
+            results[index]['message'] = 'File not found'
+        elif file_obj.approval_status != 'approved':
+            results[index]['message'] = 'File is not approved'
+        elif file_obj.is_paid:
+            results[index]['message'] = 'Bill is already paid'
+        elif not transaction_id or transaction_id in linked_transactions[file_id]:
+            # No transaction, or the one the bill is already matched to: only mark it paid
+            valid.append((index, file_obj, None, payment_method))
+        elif linked_transactions[file_id]:
+            results[index]['message'] = 'Bill is already matched to a different transaction'
+        elif not transaction:
+            results[index]['message'] = 'Transaction not found'
+        elif transaction.status == 'MATCHED' or transaction_id in taken_transactions:
+            results[index]['message'] = 'Transaction is already matched to another bill'
+        elif transaction_id in used_transactions:
+            results[index]['message'] = 'Transaction is used by another entry'
+        else:
+            used_transactions.add(transaction_id)
+            valid.append((index, file_obj, transaction, payment_method))
+    return valid, results
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["POST"])
+def bulk_create_bills(request):
+    """Create or pay many bills at once.
+
+    Takes {"entries": [{"file_id", "transaction_id"?, "payment_method"}, ...],
+    "mark_as_paid": true}. Entries are validated together and the valid ones
+    are written with a few set-based UPDATEs in one database transaction;
+    the response has one outcome with its bill number per entry.
+    """
+    try:
+        data = json.loads(request.body)
+        entries = data.get('entries') or []
+        mark_as_paid = data.get('mark_as_paid', True)
+        
+        if not isinstance(entries, list) or not entries:
+            return JsonResponse({
+                'success': False,
+                'message': 'No bills selected'
+            })
+        if len(entries) > BULK_BILL_LIMIT:
+            return JsonResponse({
+                'success': False,
+                'message': f'At most {BULK_BILL_LIMIT} bills can be processed at once'
+            })
+        
+        with db_transaction.atomic():
+            # Validated inside the transaction so a concurrent payment cannot slip in between
+            valid, results = validate_bill_entries(entries)
+            matched = [(file_obj, transaction) for _, file_obj, transaction, _ in valid if transaction]
+            paid_ids = {method: [file_obj.id for _, file_obj, _, entry_method in valid if entry_method == method] for method in PAYMENT_METHODS}
+            
+            if matched:
+                Transaction.objects.filter(id__in={transaction.id for _, transaction in matched}).update(status='MATCHED')
+                for file_obj, transaction in matched:
+                    file_obj.attached_transaction = transaction
+                File.objects.bulk_update([file_obj for file_obj, _ in matched], ['attached_transaction'], batch_size=500)
+                BillPayment.objects.bulk_create([
+                    BillPayment(
+                        file=file_obj,
+                        transaction=transaction,
+                        amount=transaction.amount if file_obj.amount is None else min(file_obj.amount, transaction.amount)
+                    )
+                    for file_obj, transaction in matched
+                ], ignore_conflicts=True)
+            
+            if mark_as_paid:
+                paid_at = timezone.now()
+                for payment_method, file_ids in paid_ids.items():
+                    if file_ids:
+                        File.objects.filter(id__in=file_ids).update(is_paid=True, payment_method=payment_method, paid_at=paid_at)
+            
+            BillSummary.refresh_files([file_obj.id for _, file_obj, _, _ in valid])
+            files_changed.send(
+                sender=File,
+                kind='paid' if mark_as_paid else 'matched',
+                file_ids=[file_obj.id for _, file_obj, transaction, _ in valid if mark_as_paid or transaction]
+            )
+        
+        if matched:
+            Transaction.invalidate_stats()
+        
+        for index, file_obj, transaction, payment_method in valid:
+            bill_number = generate_bill_number(file_obj)
+            results[index].update({
+                'success': True,
+                'message': f'Bill marked as paid: {bill_number}' if mark_as_paid else f'Bill created successfully: {bill_number}',
+                'bill_number': bill_number,
+                'payment_method': payment_method,
+                'transaction_id': transaction.id if transaction else file_obj.attached_transaction_id
+            })
+        
+        failed_count = len(results) - len(valid)
+        message = f'{len(valid)} bill{"s" if len(valid) != 1 else ""} {"marked as paid" if mark_as_paid else "created"}'
+        if failed_count:
+            message += f', {failed_count} failed'
+        
+        return JsonResponse({
+            'success': bool(valid),
+            'message': message,
+            'processed_count': len(valid),
+            'failed_count': failed_count,
+            'results': results
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error creating bills: {str(e)}'
+        })
+
+def serialize_match_suggestion_group(suggestions):
+    """JSON representation of one match suggestion, or of all pairs of a split match"""
+    files, transactions = {}, {}
+    for suggestion in suggestions:
+        file_obj = suggestion.file
+        files[file_obj.id] = {
+            'id': file_obj.id,
+            'name': file_obj.name,
+            'project': file_obj.project,
+            'vendor': file_obj.vendor,
+            'date': file_obj.date,
+            'invoice_number': file_obj.invoice_number,
+            'total': file_obj.total
+        }
+        transaction = suggestion.transaction
+        card_holder = transaction.card_holder
+        if transaction.card_user:
+            card_holder = transaction.card_user.get_full_name() or transaction.card_user.username
+        transactions[transaction.id] = {
+            'id': transaction.id,
+            'date': transaction.date.strftime('%m/%d/%Y'),
+            'amount': transaction.amount_display,
+            'description': transaction.description,
+            'card_holder': card_holder
+        }
+    first = suggestions[0]
+    return {
+        'id': first.id,
+        'score': round(first.score, 4),
+        'details': first.details,
+        'status': first.status,
+        'group_key': first.group_key,
+        'is_split': bool(first.group_key),
+        'files': list(files.values()),
+        'transactions': list(transactions.values())
+    }
+
+def group_match_suggestions(suggestions):
+    """Collect split-match pairs under their group key, keeping the incoming order"""
+    groups = {}
+    for suggestion in suggestions:
+        groups.setdefault(suggestion.group_key or f'pair-{suggestion.id}', []).append(suggestion)
+    return list(groups.values())
+
+def open_match_suggestions():
+    return MatchSuggestion.objects.filter(
+        status='suggested',
+        file__attached_transaction__isnull=True,
+        transaction__status='UNMATCHED'
+    ).select_related('file', 'transaction', 'transaction__card_user')
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["POST"])
+def run_bill_matching(request):
+    """Match all open bills against unmatched transactions and store ranked suggestions"""
+    try:
+        data = json.loads(request.body) if request.body else {}
+        threshold = None
+        if data.get('auto_accept'):
+            threshold = float(data.get('threshold') or get_auto_accept_threshold())
+        
+        result = run_matching(
+            auto_accept_threshold=threshold,
+            include_splits=bool(data.get('include_splits')),
+            vendor=data.get('vendor') or None
+        )
+        if result.accepted_count:
+            Transaction.invalidate_stats()
+        
+        message = f'Found {len(group_candidates(result.suggestions))} matches for {result.bill_count} open bills'
+        if result.split_count:
+            message += f' ({result.split_count} split payments)'
+        if result.accepted_count:
+            message += f', {result.accepted_count} accepted automatically'
+        if result.timed_out:
+            message += '. Split search stopped at its time limit'
+        
+        return JsonResponse({
+            'success': True,
+            'message': message,
+            'suggestion_count': len(result.suggestions),
+            'split_count': result.split_count,
+            'accepted_count': result.accepted_count,
+            'bill_count': result.bill_count,
+            'transaction_count': result.transaction_count,
+            'timed_out': result.timed_out,
+            'elapsed_seconds': round(result.elapsed_seconds, 3)
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error matching bills: {str(e)}'
+        })
+
+@login_required
+@admin_or_staff_required
+def match_suggestions_list(request):
+    """List pending match suggestions, best first, with split matches grouped"""
+    try:
+        suggestions = open_match_suggestions()
+        
+        min_score = request.GET.get('min_score')
+        if min_score:
+            suggestions = suggestions.filter(score__gte=float(min_score))
+        
+        groups = group_match_suggestions(suggestions[:500])
+        
+        return JsonResponse({
+            'success': True,
+            'suggestions': [serialize_match_suggestion_group(group) for group in groups[:200]],
+            'auto_accept_threshold': get_auto_accept_threshold()
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error loading match suggestions: {str(e)}'
+        })
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["POST"])
+def accept_match_suggestion(request):
+    """Link the suggested transactions to their bills; split matches are accepted as a whole"""
+    try:
+        data = json.loads(request.body)
+        suggestion_ids = [s for s in (data.get('suggestion_ids') or [data.get('suggestion_id')]) if s]
+        
+        selected = MatchSuggestion.objects.filter(id__in=suggestion_ids)
+        group_keys = [key for key in selected.values_list('group_key', flat=True) if key]
+        suggestions = list(open_match_suggestions().filter(
+            models.Q(id__in=suggestion_ids) | models.Q(group_key__in=group_keys)
+        ))
+        
+        if not suggestions:
+            return JsonResponse({
+                'success': False,
+                'message': 'No open suggestions to accept'
+            })
+        
+        # A transaction or bill can only be used once, even if several suggestions name it
+        accepted = []
+        accepted_groups = 0
+        used_files, used_transactions = set(), set()
+        for group in sorted(group_match_suggestions(suggestions), key=lambda g: g[0].score, reverse=True):
+            if any(s.file_id in used_files or s.transaction_id in used_transactions for s in group):
+                continue
+            accepted.extend(group)
+            accepted_groups += 1
+            used_files.update(s.file_id for s in group)
+            used_transactions.update(s.transaction_id for s in group)
+        
+        with db_transaction.atomic():
+            accept_candidates(accepted)
+            MatchSuggestion.objects.filter(id__in=[s.id for s in accepted]).update(status='accepted')
+        Transaction.invalidate_stats()
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Accepted {accepted_groups} match(es) covering {len(used_files)} bill(s)',
+            'accepted_count': accepted_groups
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error accepting match: {str(e)}'
+        })
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["POST"])
+def reject_match_suggestion(request):
+    """Reject a suggestion so the matcher does not propose the pair (or split match) again"""
+    try:
+        data = json.loads(request.body)
+        suggestion_id = data.get('suggestion_id')
+        
+        if not suggestion_id:
+            return JsonResponse({
+                'success': False,
+                'message': 'Suggestion ID is required'
+            })
+        
+        suggestion = MatchSuggestion.objects.filter(id=suggestion_id, status='suggested').first()
+        if not suggestion:
+            return JsonResponse({
+                'success': False,
+                'message': 'Suggestion not found'
+            })
+        
+        if suggestion.group_key:
+            MatchSuggestion.objects.filter(group_key=suggestion.group_key, status='suggested').update(status='rejected')
+        else:
+            MatchSuggestion.objects.filter(id=suggestion.id).update(status='rejected')
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Suggestion rejected'
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error rejecting match: {str(e)}'
+        })
 
 @login_required
 @admin_or_staff_required
@@ -1244,27 +1945,8 @@ def users_list(request):
         messages.error(request, 'Access denied. Admin privileges required.')
         return redirect('dashboard')
     
-    users = User.objects.all().order_by('username')
-    
-    # Get or create user profiles
-    user_profiles = []
-    for user in users:
-        profile, created = UserProfile.objects.get_or_create(user=user)
-        user_profiles.append({
-            'id': user.id,
-            'username': user.username,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'email': user.email,
-            'is_staff': user.is_staff,
-            'is_superuser': user.is_superuser,
-            'is_active': user.is_active,
-            'date_joined': user.date_joined.strftime('%Y-%m-%d'),
-            'card_number': profile.card_number or '',
-            'profile_id': profile.id,
-            'primary_role': profile.primary_role,
-            'all_roles': profile.all_roles
-        })
+    # Cached payload of every user with their profile and roles
+    user_profiles = UserProfile.user_list()
     
     # Get all available groups
     available_groups = Group.objects.all().order_by('name')
@@ -1296,7 +1978,7 @@ def update_user_card(request):
             })
         
         user = get_object_or_404(User, id=user_id)
-        profile, created = UserProfile.objects.get_or_create(user=user)
+        profile = user.profile
         
         # Validate card number if provided
         if card_number:
@@ -1306,9 +1988,15 @@ def update_user_card(request):
                     'message': 'Card number must be exactly 4 digits'
                 })
         
+        old_card_number = profile.card_number
         profile.card_number = card_number if card_number else None
         profile.save()
         
+        if old_card_number != profile.card_number:
+            UserProfile.invalidate_card_map()
+            Transaction.reassign_card_user(old_card_number, None)
+            Transaction.reassign_card_user(profile.card_number, user)
+        
         return JsonResponse({
             'success': True,
             'message': f'Card number updated for {user.get_full_name() or user.username}',
@@ -1391,8 +2079,7 @@ def create_user(request):
             groups = Group.objects.filter(id__in=group_ids)
             user.groups.set(groups)
         
-        # Create user profile
-        UserProfile.objects.create(user=user)
+        # The user's profile is created by a post_save signal
         
         return JsonResponse({
             'success': True,
@@ -1516,6 +2203,7 @@ def assign_project_superintendents(request, project_id):
         
         # Assign superintendents to project
         project.superintendents.set(superintendents)
+        ApprovalInboxEntry.refresh_project(project)
         
         return JsonResponse({
             'success': True,
@@ -1528,137 +2216,139 @@ def assign_project_superintendents(request, project_id):
             'message': f'Error assigning superintendents: {str(e)}'
         })
 
+def approval_file_json(file, suggested_class_id=None):
+    """JSON representation of a pending file for the approvals page, with the class to pre-select"""
+    # Get attached transaction info
+    attached_transaction = None
+    if file.attached_transaction:
+        attached_transaction = {
+            'id': file.attached_transaction.id,
+            'date': file.attached_transaction.date.strftime('%m/%d/%Y'),
+            'amount': file.attached_transaction.amount_display,
+            'description': file.attached_transaction.description,
+            'card_holder': file.attached_transaction.card_holder,
+            'status': file.attached_transaction.status
+        }
+    
+    return {
+        'id': file.id,
+        'name': file.name,
+        'file_type': file.file_type,
+        'file_size_display': file.file_size_display,
+        'uploaded_at': file.uploaded_at.strftime('%b %d, %Y'),
+        'description': file.description or '',
+        'file': file.file.name if file.file else '',
+        'file_url': file.file.url if file.file else '',
+        'project': file.project or '',
+        'project_id': file.project_ref_id,
+        'vendor': file.vendor or '',
+        'vendor_id': file.vendor_ref_id,
+        'date': file.date or '',
+        'invoice_number': file.invoice_number or '',
+        'total': file.total or '$0.00',
+        'is_paid': file.is_paid,
+        'payment_method': file.payment_method or '',
+        'paid_at': file.paid_at.strftime('%b %d, %Y') if file.paid_at else '',
+        'attached_transaction': attached_transaction,
+        'approval_status': file.approval_status,
+        'approval_comment': file.approval_comment or '',
+        'approved_by': file.approved_by.get_full_name() if file.approved_by else '',
+        'approved_at': file.approved_at.strftime('%b %d, %Y %I:%M %p') if file.approved_at else '',
+        'selected_class_id': file.selected_class_id,
+        'suggested_class_id': suggested_class_id
+    }
+
 @login_required
 def approvals_list(request):
     """Display approvals page with files that need approval"""
-    # Get files that the user has access to based on their role and project assignments
-    # Only show files that are pending approval
-    files = File.objects.filter(
-        project__isnull=False,
-        vendor__isnull=False,
-        invoice_number__isnull=False,
-        total__isnull=False,
-        approval_status='pending'  # Only show files pending approval
-    ).exclude(project='', vendor='', invoice_number='', total='$0.00')
-    
-    # Filter files based on user access
-    accessible_files = []
-    
-    # Check if user is admin/staff (full access)
-    if request.user.is_staff:
-        accessible_files = list(files)
-        print(f"DEBUG: Admin user {request.user.username} - showing all {len(accessible_files)} files")
-    else:
-        # For non-admin users, check project assignments
-        for file in files:
-            has_access = False
-            
-            # Check if user is assigned to the project as superintendent
-            if file.project and file.project.strip():
-                try:
-                    # Try exact match first
-                    project = Project.objects.get(name=file.project)
-                    if request.user in project.superintendents.all():
-                        has_access = True
-                        print(f"DEBUG: User {request.user.username} has access to project '{file.project}' (exact match)")
-                except Project.DoesNotExist:
-                    # Try case-insensitive match
-                    try:
-                        project = Project.objects.get(name__iexact=file.project)
-                        if request.user in project.superintendents.all():
-                            has_access = True
-                            print(f"DEBUG: User {request.user.username} has access to project '{file.project}' (case-insensitive match)")
-                    except Project.DoesNotExist:
-                        # Try partial match with aliases
-                        try:
-                            project = Project.objects.filter(
-                                models.Q(name__icontains=file.project) |
-                                models.Q(aliases__icontains=file.project)
-                            ).first()
-                            if project and request.user in project.superintendents.all():
-                                has_access = True
-                                print(f"DEBUG: User {request.user.username} has access to project '{file.project}' (alias match)")
-                        except:
-                            pass
-                
-                if not has_access:
-                    print(f"DEBUG: User {request.user.username} NO ACCESS to project '{file.project}'")
-            
-            if has_access:
-                accessible_files.append(file)
-    
-    # Convert files to JSON for JavaScript
-    print(f"DEBUG: Found {len(accessible_files)} accessible files")
-    files_json = []
-    for file in accessible_files:
-        # Get attached transaction info
-        attached_transaction = None
-        if file.attached_transaction:
-            attached_transaction = {
-                'id': file.attached_transaction.id,
-                'date': file.attached_transaction.date.strftime('%m/%d/%Y'),
-                'amount': file.attached_transaction.amount_display,
-                'description': file.attached_transaction.description,
-                'card_holder': file.attached_transaction.card_holder,
-                'status': file.attached_transaction.status
-            }
-        
-        file_data = {
-            'id': file.id,
-            'name': file.name,
-            'file_type': file.file_type,
-            'file_size_display': file.file_size_display,
-            'uploaded_at': file.uploaded_at.strftime('%b %d, %Y'),
-            'description': file.description or '',
-            'file': file.file.name if file.file else '',
-            'file_url': file.file.url if file.file else '',
-            'project': file.project or '',
-            'vendor': file.vendor or '',
-            'date': file.date or '',
-            'invoice_number': file.invoice_number or '',
-            'total': file.total or '$0.00',
-            'is_paid': file.is_paid,
-            'payment_method': file.payment_method or '',
-            'paid_at': file.paid_at.strftime('%b %d, %Y') if file.paid_at else '',
-            'attached_transaction': attached_transaction,
-            'approval_status': file.approval_status,
-            'approval_comment': file.approval_comment or '',
-            'approved_by': file.approved_by.get_full_name() if file.approved_by else '',
-            'approved_at': file.approved_at.strftime('%b %d, %Y %I:%M %p') if file.approved_at else ''
-        }
-        print(f"DEBUG: Adding file {file.id}: {file.name}")
-        files_json.append(file_data)
+    # Staff see every pending file; superintendents see their approval inbox,
+    # which holds the pending files of the projects they are assigned to
+    last_event_id = latest_event_id()
+    accessible_files = list(
+        ApprovalInboxEntry.files_for(request.user).select_related('attached_transaction', 'approved_by')
+    )
+    
+    # Convert files to JSON for JavaScript, with the class each file is likely to get
+    suggestions = ClassSuggestion.suggest(accessible_files)
+    files_json = [approval_file_json(file, suggestions.get(file.id)) for file in accessible_files]
     
-    # Get user's assigned projects for debugging
+    # Get user's assigned projects
     user_projects = []
     if not request.user.is_staff:
         user_projects = Project.objects.filter(superintendents=request.user).values_list('name', flat=True)
-        print(f"DEBUG: User {request.user.username} is assigned to projects: {list(user_projects)}")
     
     # Get all classes for selection
-    all_classes = Class.objects.filter(is_active=True).order_by('parent__name', 'name')
-    classes_json = []
-    for class_obj in all_classes:
-        classes_json.append({
-            'id': class_obj.id,
-            'name': class_obj.name,
-            'full_name': class_obj.full_name,
-            'color': class_obj.color,
-            'parent_id': class_obj.parent.id if class_obj.parent else None,
-            'parent_name': class_obj.parent.name if class_obj.parent else None,
-            'is_parent': class_obj.is_parent,
-            'is_child': class_obj.is_child,
-            'display_name': class_obj.display_name
-        })
+    classes_json = Class.active_tree()
     
     return render(request, "approvals.html", {
         "pending_files": accessible_files,  # Changed from "files" to "pending_files"
         "files_json": json.dumps(files_json),
         "user_projects": list(user_projects),
         "is_admin": request.user.is_staff,
-        "classes_json": json.dumps(classes_json)
+        "classes_json": json.dumps(classes_json),
+        "last_event_id": last_event_id
     })
 
+def serialize_bill_events(events):
+    """Bills page events: the bill's current summary, or None once it has left the bills page"""
+    summaries = BillSummary.objects.in_bulk({event.file_id for event in events})
+    return [
+        (event, {
+            'file_id': event.file_id,
+            'kind': event.kind,
+            'bill': summaries[event.file_id].as_json() if event.file_id in summaries else None
+        })
+        for event in events
+    ]
+
+def serialize_approval_events(user, events):
+    """Approvals page events: the file when it is pending for this user, otherwise None"""
+    pending = {
+        file.id: file
+        for file in ApprovalInboxEntry.files_for(user).filter(
+            id__in={event.file_id for event in events}
+        ).select_related('attached_transaction', 'approved_by')
+    }
+    suggestions = ClassSuggestion.suggest(pending.values())
+    return [
+        (event, {
+            'file_id': event.file_id,
+            'kind': event.kind,
+            'file': approval_file_json(pending[event.file_id], suggestions.get(event.file_id)) if event.file_id in pending else None
+        })
+        for event in events
+    ]
+
+@login_required
+async def live_updates(request):
+    """Server-sent event stream of file changes for the approvals (?page=approvals) or bills (?page=bills) page.
+
+    Needs the ASGI application in config/asgi.py; under WSGI it answers 204,
+    which tells EventSource not to reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    
+    user = await request.auser()
+    page = request.GET.get('page', 'approvals')
+    if page == 'bills':
+        if not user.is_staff:
+            return JsonResponse({'success': False, 'message': 'Access denied. Admin privileges required.'}, status=403)
+        serialize_events = serialize_bill_events
+    else:
+        serialize_events = lambda events: serialize_approval_events(user, events)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        last_event_id = await sync_to_async(latest_event_id)()
+    
+    response = StreamingHttpResponse(event_stream(last_event_id, serialize_events), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
 @login_required
 @require_http_methods(["POST"])
 def update_file_approval(request):
@@ -1694,23 +2384,16 @@ def update_file_approval(request):
         file_obj = get_object_or_404(File, id=file_id)
         
         # Check if user has access to this file
-        has_access = False
-        if request.user.is_staff:
-            has_access = True
-        elif hasattr(file_obj, 'project') and file_obj.project:
-            try:
-                project = Project.objects.get(name=file_obj.project)
-                if request.user in project.superintendents.all():
-                    has_access = True
-            except Project.DoesNotExist:
-                pass
-        
-        if not has_access:
+        if not ApprovalInboxEntry.can_approve(request.user, file_obj):
             return JsonResponse({
                 'success': False,
                 'message': 'Access denied. You do not have permission to approve this file.'
             })
         
+        # Re-approving with the same class must not count the class again
+        newly_approved = file_obj.approval_status != 'approved'
+        previous_class_id = file_obj.selected_class_id
+        
         # Update approval status
         file_obj.approval_status = approval_status
         file_obj.approval_comment = approval_comment
@@ -1731,6 +2414,11 @@ def update_file_approval(request):
                 })
         
         file_obj.save()
+        BillSummary.refresh_files([file_obj.id])
+        ApprovalInboxEntry.refresh_files([file_obj.id])
+        if approval_status == 'approved' and (newly_approved or file_obj.selected_class_id != previous_class_id):
+            ClassSuggestion.record([file_obj])
+        files_changed.send(sender=File, kind=approval_status, file_ids=[file_obj.id])
         
         return JsonResponse({
             'success': True,
@@ -1743,16 +2431,129 @@ def update_file_approval(request):
             'message': f'Error updating approval status: {str(e)}'
         })
 
+BULK_APPROVAL_LIMIT = 500
+APPROVAL_STATUSES = [status for status, _ in File._meta.get_field('approval_status').choices]
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_update_file_approval(request):
+    """Approve, hold or reject many files at once.
+
+    Takes {"file_ids": [...], "approval_status", "selected_class_id",
+    "approval_comment"}. Access is checked for the whole set in one query and
+    the allowed files are updated with a single UPDATE; the response has one
+    result per file.
+    """
+    try:
+        data = json.loads(request.body)
+        file_ids = data.get('file_ids') or []
+        approval_status = data.get('approval_status')
+        approval_comment = data.get('approval_comment', '')
+        selected_class_id = data.get('selected_class_id')
+        
+        if not isinstance(file_ids, list) or not file_ids:
+            return JsonResponse({
+                'success': False,
+                'message': 'No files selected'
+            })
+        if len(file_ids) > BULK_APPROVAL_LIMIT:
+            return JsonResponse({
+                'success': False,
+                'message': f'At most {BULK_APPROVAL_LIMIT} files can be updated at once'
+            })
+        if approval_status not in APPROVAL_STATUSES:
+            return JsonResponse({
+                'success': False,
+                'message': 'A valid approval status is required'
+            })
+        
+        # Class selection is required for all approval actions
+        if not selected_class_id:
+            return JsonResponse({
+                'success': False,
+                'message': 'Class selection is required for all approval actions'
+            })
+        
+        # Comment is required for hold/reject actions
+        if approval_status in ['on_hold', 'rejected'] and not approval_comment:
+            return JsonResponse({
+                'success': False,
+                'message': 'Comment is required for Hold/Reject actions'
+            })
+        
+        try:
+            selected_class = Class.objects.get(id=int(selected_class_id))
+        except (Class.DoesNotExist, ValueError, TypeError):
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid class selected'
+            })
+        
+        requested_ids = []
+        results = []
+        for file_id in file_ids:
+            try:
+                requested_ids.append(int(file_id))
+                results.append({'file_id': int(file_id)})
+            except (TypeError, ValueError):
+                results.append({'file_id': file_id, 'success': False, 'message': 'Invalid file id'})
+        
+        allowed_ids = ApprovalInboxEntry.approvable_ids(request.user, requested_ids)
+        
+        with db_transaction.atomic():
+            File.objects.filter(id__in=allowed_ids).update(
+                approval_status=approval_status,
+                approval_comment=approval_comment,
+                approved_by=request.user,
+                approved_at=timezone.now(),
+                selected_class=selected_class
+            )
+            BillSummary.refresh_files(allowed_ids)
+            ApprovalInboxEntry.refresh_files(allowed_ids)
+            # Only pending files are allowed, so each one is newly approved
+            if approval_status == 'approved':
+                ClassSuggestion.record(File.objects.filter(id__in=allowed_ids).only('id', 'vendor_ref', 'project_ref', 'selected_class'))
+            files_changed.send(sender=File, kind=approval_status, file_ids=allowed_ids)
+        # The UPDATE sends no signals
+        bump('files')
+        
+        for result in results:
+            if 'success' in result:
+                continue
+            if result['file_id'] in allowed_ids:
+                result.update({'success': True, 'message': f'File approval status updated to {approval_status}'})
+            else:
+                result.update({'success': False, 'message': 'File not found, not awaiting approval, or access denied'})
+        
+        updated_count = len(allowed_ids)
+        failed_count = sum(1 for result in results if not result['success'])
+        message = f'{updated_count} file{"s" if updated_count != 1 else ""} updated to {approval_status}'
+        if failed_count:
+            message += f', {failed_count} failed'
+        
+        return JsonResponse({
+            'success': bool(updated_count),
+            'message': message,
+            'updated_count': updated_count,
+            'failed_count': failed_count,
+            'results': results
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error updating approval status: {str(e)}'
+        })
+
 def get_user_by_card_number(card_number):
     """Helper function to get user by card number"""
     if not card_number or len(card_number) != 4:
         return None
     
-    try:
-        profile = UserProfile.objects.get(card_number=card_number)
-        return profile.user
-    except UserProfile.DoesNotExist:
+    user_id = UserProfile.card_user_map().get(card_number)
+    if user_id is None:
         return None
+    return User.objects.filter(id=user_id).first()
 
 @login_required
 @require_http_methods(["POST"])
@@ -1793,6 +2594,7 @@ def delete_user(request):
         
         # Delete the user (this will cascade to related objects)
         user.delete()
+        UserProfile.invalidate_card_map()
         
         return JsonResponse({
             'success': True,
@@ -1834,13 +2636,18 @@ def impersonate_user(request):
         
         user = get_object_or_404(User, id=user_id)
         
-        # Store the original admin user ID in session for later restoration
-        request.session['impersonated_by'] = request.user.id
-        request.session['impersonated_user_id'] = user.id
+        admin_user_id = request.user.id
         
-        # Log in as the impersonated user
+        # Log in as the impersonated user, with their roles resolved fresh
         from django.contrib.auth import login
         login(request, user)
+        invalidate_roles(user.id)
+        set_request_roles(request)
+        
+        # Store the original admin user ID in session for later restoration.
+        # Set after login(), which starts a new session when the user changes.
+        request.session['impersonated_by'] = admin_user_id
+        request.session['impersonated_user_id'] = user.id
         
         return JsonResponse({
             'success': True,
@@ -1870,10 +2677,12 @@ def stop_impersonation(request):
         # Log back in as the admin user
         from django.contrib.auth import login
         login(request, admin_user)
+        invalidate_roles(admin_user.id)
+        set_request_roles(request)
         
-        # Clear impersonation session data
-        del request.session['impersonated_by']
-        del request.session['impersonated_user_id']
+        # Clear impersonation session data (login() normally started a fresh session already)
+        request.session.pop('impersonated_by', None)
+        request.session.pop('impersonated_user_id', None)
         
         return JsonResponse({
             'success': True,
@@ -1892,34 +2701,14 @@ def stop_impersonation(request):
 def classes_list(request):
     """Display classes page with CRUD functionality"""
     search_query = request.GET.get('search', '')
-    classes = Class.objects.all()
     
+    # The cached class tree already has the hierarchy and vendor counts
+    classes_json = Class.cached_tree()
     if search_query:
-        classes = classes.filter(name__icontains=search_query)
-    
-    # Convert classes to JSON for JavaScript with hierarchical structure
-    classes_json = []
-    for class_obj in classes:
-        classes_json.append({
-            'id': class_obj.id,
-            'name': class_obj.name,
-            'description': class_obj.description,
-            'color': class_obj.color,
-            'is_active': class_obj.is_active,
-            'vendor_count': class_obj.vendor_count,
-            'created_at': class_obj.created_at.strftime('%b %d, %Y'),
-            'updated_at': class_obj.updated_at.strftime('%b %d, %Y'),
-            'parent_id': class_obj.parent.id if class_obj.parent else None,
-            'parent_name': class_obj.parent.name if class_obj.parent else None,
-            'is_parent': class_obj.is_parent,
-            'is_child': class_obj.is_child,
-            'full_name': class_obj.full_name,
-            'display_name': class_obj.display_name,
-            'children_count': class_obj.children.count() if class_obj.is_parent else 0
-        })
+        classes_json = [node for node in classes_json if search_query.lower() in node['name'].lower()]
     
     return render(request, "classes.html", {
-        "classes": classes,
+        "classes": classes_json,
         "classes_json": json.dumps(classes_json),
         "search_query": search_query
     })
@@ -2020,11 +2809,11 @@ def update_class(request):
         if parent_id:
             try:
                 parent = Class.objects.get(id=parent_id)
-                # Prevent setting self as parent
-                if parent.id == class_id:
+                # Prevent a cycle: the new parent cannot be this class or one of its subclasses
+                if parent.path.startswith(class_obj.path):
                     return JsonResponse({
                         'success': False,
-                        'message': 'A class cannot be its own parent.'
+                        'message': 'A class cannot be moved under itself or one of its subclasses.'
                     })
             except Class.DoesNotExist:
                 return JsonResponse({
@@ -2039,6 +2828,7 @@ def update_class(request):
         class_obj.is_active = is_active
         class_obj.parent = parent
         class_obj.save()
+        BillSummary.objects.filter(selected_class=class_obj).update(class_name=class_obj.name, class_color=class_obj.color)
         
         return JsonResponse({
             'success': True,
@@ -2051,6 +2841,41 @@ def update_class(request):
             'message': f'Error updating class: {str(e)}'
         })
 
+@login_required
+@admin_or_staff_required
+def class_spend_rollup(request):
+    """Approved bill spend per class including subclasses, optionally for an invoice date range and one subtree"""
+    try:
+        start = request.GET.get('date_from', '').strip()
+        end = request.GET.get('date_to', '').strip()
+        class_id = request.GET.get('class_id')
+        
+        root = get_object_or_404(Class, id=class_id) if class_id else None
+        classes = Class.spend_rollup(start=File.parse_date(start), end=File.parse_date(end), root=root)
+        full_names = {node['id']: node['full_name'] for node in Class.cached_tree()}
+        
+        return JsonResponse({
+            'success': True,
+            'date_from': start,
+            'date_to': end,
+            'classes': [{
+                'id': class_obj.id,
+                'name': class_obj.name,
+                'full_name': full_names.get(class_obj.id, class_obj.name),
+                'parent_id': class_obj.parent_id,
+                'depth': class_obj.depth,
+                'total': f'{class_obj.subtree_total:.2f}',
+                'bill_count': class_obj.subtree_bills,
+                'direct_total': f'{class_obj.direct_total:.2f}'
+            } for class_obj in classes]
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error computing class spend: {str(e)}'
+        })
+
 @login_required
 @admin_or_staff_required
 @require_http_methods(["POST"])
@@ -2114,16 +2939,9 @@ def update_vendor_classes(request):
         
         vendor = get_object_or_404(Vendor, id=vendor_id)
         
-        # Clear existing class assignments
-        vendor.classes.clear()
-        
-        # Add new class assignments
-        for class_id in class_ids:
-            try:
-                class_obj = Class.objects.get(id=class_id)
-                vendor.classes.add(class_obj)
-            except Class.DoesNotExist:
-                continue
+        # Replace the vendor's classes with the ones that exist
+        valid_class_ids = Class.objects.filter(id__in=class_ids).values_list('id', flat=True)
+        Vendor.assign_classes({vendor.id: valid_class_ids})
         
         return JsonResponse({
             'success': True,
@@ -2136,6 +2954,84 @@ def update_vendor_classes(request):
             'message': f'Error updating vendor classes: {str(e)}'
         })
 
+VENDOR_CLASS_MODES = ['replace', 'add']
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["POST"])
+def bulk_assign_vendor_classes(request):
+    """Assign classes to many vendors in one request.
+
+    Takes either {"assignments": {vendor_id: [class_ids]}} or
+    {"rules": [{"category", "class_ids"}]}, which applies to every vendor in
+    the category (only those without classes when "only_unassigned" is set),
+    plus "mode": "replace" (default) or "add". Class and vendor ids are
+    checked with one query each.
+    """
+    try:
+        data = json.loads(request.body)
+        assignments = data.get('assignments')
+        rules = data.get('rules')
+        mode = data.get('mode', 'replace')
+        
+        if mode not in VENDOR_CLASS_MODES:
+            return JsonResponse({
+                'success': False,
+                'message': 'Mode must be "replace" or "add".'
+            })
+        if not assignments and not rules:
+            return JsonResponse({
+                'success': False,
+                'message': 'Provide vendor class assignments or category rules.'
+            })
+        
+        try:
+            if assignments:
+                requested = {int(vendor_id): {int(class_id) for class_id in class_ids} for vendor_id, class_ids in assignments.items()}
+            else:
+                category_classes = defaultdict(set)
+                for rule in rules:
+                    category_classes[rule['category'].strip().lower()].update(int(class_id) for class_id in rule['class_ids'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return JsonResponse({
+                'success': False,
+                'message': 'Vendor and class ids must be numbers, and each rule needs a category and class_ids.'
+            })
+        
+        requested_class_ids = set().union(*(requested.values() if assignments else category_classes.values()))
+        unknown_class_ids = requested_class_ids - set(Class.objects.filter(id__in=requested_class_ids).values_list('id', flat=True))
+        if unknown_class_ids:
+            return JsonResponse({
+                'success': False,
+                'message': f'Unknown class ids: {", ".join(str(class_id) for class_id in sorted(unknown_class_ids))}'
+            })
+        
+        unknown_vendor_ids = []
+        if assignments:
+            existing_ids = set(Vendor.objects.filter(id__in=requested).values_list('id', flat=True))
+            unknown_vendor_ids = sorted(set(requested) - existing_ids)
+            requested = {vendor_id: class_ids for vendor_id, class_ids in requested.items() if vendor_id in existing_ids}
+        else:
+            vendors = Vendor.objects.annotate(category_key=Lower('category')).filter(category_key__in=category_classes)
+            if data.get('only_unassigned'):
+                vendors = vendors.filter(classes__isnull=True)
+            requested = {vendor_id: category_classes[category_key] for vendor_id, category_key in vendors.values_list('id', 'category_key')}
+        
+        Vendor.assign_classes(requested, replace=mode == 'replace')
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Classes updated for {len(requested)} vendor{"s" if len(requested) != 1 else ""}',
+            'vendor_ids': sorted(requested),
+            'unknown_vendor_ids': unknown_vendor_ids
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error updating vendor classes: {str(e)}'
+        })
+
 @login_required
 @admin_or_staff_required
 @require_http_methods(["POST"])
@@ -2259,6 +3155,9 @@ def send_back_for_review(request):
         file_obj.approved_by = None  # Clear the previous approver
         file_obj.approved_at = None  # Clear the approval timestamp
         file_obj.save()
+        BillSummary.refresh_files([file_obj.id])
+        ApprovalInboxEntry.refresh_files([file_obj.id])
+        files_changed.send(sender=File, kind='sent_back', file_ids=[file_obj.id])
         
         return JsonResponse({
             'success': True,
@@ -2286,5 +3185,28 @@ def settings_list(request):
         'user': request.user,
         'user_count': user_count,
         'active_users': active_users,
-        'current_time': current_time
+        'current_time': current_time,
+        'cache_backend': backend_name(),
+        'cache_stats': read_stats()
+    })
+
+@login_required
+@admin_or_staff_required
+def cache_stats(request):
+    """Hit and miss counts of each cached read, to check the cache is doing its job"""
+    return JsonResponse({
+        'success': True,
+        'backend': backend_name(),
+        'reads': read_stats()
+    })
+
+@login_required
+@admin_or_staff_required
+@require_http_methods(["POST"])
+def reset_cache_stats(request):
+    """Start the hit and miss counts over"""
+    reset_stats()
+    return JsonResponse({
+        'success': True,
+        'message': 'Cache statistics reset'
     })
\ No newline at end of file